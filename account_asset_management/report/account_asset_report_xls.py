@@ -1,9 +1,11 @@
 # Copyright 2009-2019 Noviat
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+from collections import defaultdict
 
 from odoo import models
 from odoo.exceptions import UserError
+from odoo.tools import SQL
 
 from odoo.addons.report_xlsx_helper.report.report_xlsx_format import (
     FORMATS,
@@ -18,6 +20,25 @@ class AssetReportXlsx(models.AbstractModel):
     _description = "Dynamic XLS asset report generator"
     _inherit = "report.report_xlsx.abstract"
 
+    def _get_report_cache_key_values(self, docids, data):
+        wiz = self.with_context(
+            active_model="wiz.account.asset.report"
+        )._get_objs_for_report(docids, data)
+        # Without the id, as a new wizard is created for each export
+        values = wiz.read(
+            ["asset_group_id", "date_from", "date_to", "draft", "company_id"],
+            load=None,
+        )[0]
+        return {k: v for k, v in values.items() if k != "id"}
+
+    def _get_report_cache_dependencies(self, docids, data):
+        return [
+            ("account.asset", None),
+            ("account.asset.line", None),
+            ("account.asset.group", None),
+            ("account.asset.profile", None),
+        ]
+
     def _get_ws_params(self, wb, data, wiz):
         self._get_assets(wiz, data)
         s1 = self._get_acquisition_ws_params(wb, data, wiz)
@@ -386,145 +407,228 @@ class AssetReportXlsx(models.AbstractModel):
         ]
 
         parent_group = wiz.asset_group_id
+        groups = self.env["account.asset.group"]
         if parent_group:
-
-            def _child_get(parent):
-                groups = [parent]
-                children = parent.child_ids
-                children = children.sorted(lambda r: r.code or r.name)
-                for child in children:
-                    if child in groups:
-                        raise UserError(
-                            self.env._(
-                                "Inconsistent reporting structure."
-                                "\nPlease correct Asset Group '{group}' (id {id})"
-                            ).format(group=child.name, id=child.id)
-                        )
-                    groups.extend(_child_get(child))
-                return groups
-
-            groups = _child_get(parent_group)
-            dom.append(("group_ids", "in", [x.id for x in groups]))
+            # parent_store guarantees a consistent, acyclic hierarchy
+            groups = groups.search([("id", "child_of", parent_group.id)])
+            dom.append(("group_ids", "in", groups.ids))
 
         if not wiz.draft:
             dom.append(("state", "!=", "draft"))
         assets = self.env["account.asset"].search(dom)
-        grouped_assets = {}
-        self._group_assets(assets, parent_group, grouped_assets)
+        assets = assets.sorted(lambda r: (r.date_start or "", r.code or "", r.name))
+        group_children = {group.id: [] for group in groups}
+        for group in groups:
+            if group != parent_group:
+                group_children[group.parent_id.id].append(group)
+        asset_values, group_assets = self._get_asset_values(wiz, assets, groups)
         data.update(
             {
                 "assets": assets,
-                "grouped_assets": grouped_assets,
+                "asset_values": asset_values,
+                "group_assets": group_assets,
+                "group_children": group_children,
+                "group_totals": self._get_group_totals(wiz, assets, groups),
             }
         )
 
-    @staticmethod
-    def acquisition_filter(wiz, asset):
-        return asset.date_start >= wiz.date_from
+    def _get_report_type_conditions(self, wiz):
+        """Return the SQL condition selecting the assets of each report
+        section, evaluated on the ``asset_value`` table expression."""
+        return {
+            "acquisition": SQL("asset_value.date_start >= %s", wiz.date_from),
+            "active": SQL("TRUE"),
+            "removal": SQL(
+                "asset_value.date_remove BETWEEN %s AND %s",
+                wiz.date_from,
+                wiz.date_to,
+            ),
+        }
+
+    def _get_report_type_values_sql(self, wiz):
+        return SQL(", ").join(
+            SQL("(%s, %s)", report_type, condition)
+            for report_type, condition in self._get_report_type_conditions(wiz).items()
+        )
 
-    @staticmethod
-    def active_filter(wiz, asset):
-        return True
+    def _get_asset_value_sql(self, wiz, assets):
+        """Table expression with the amounts reported for every asset.
+
+        The period start and end values are derived from the last
+        depreciation line on or before the boundaries of the period.
+        """
+        self.env["account.asset"].flush_model()
+        self.env["account.asset.line"].flush_model()
+        self.env["account.asset.group"].flush_model()
+
+        def last_depreciation(date):
+            return SQL(
+                """
+                SELECT COALESCE(line.depreciated_value, 0.0) + line.amount
+                    AS value_depreciated
+                FROM account_asset_line line
+                WHERE line.asset_id = asset.id
+                    AND line.type = 'depreciate'
+                    AND line.line_date <= %s
+                ORDER BY line.line_date DESC, line.id DESC
+                LIMIT 1
+                """,
+                date,
+            )
 
-    @staticmethod
-    def removal_filter(wiz, asset):
-        return (
-            asset.date_remove
-            and asset.date_remove >= wiz.date_from
-            and asset.date_remove <= wiz.date_to
+        return SQL(
+            """
+            SELECT
+                asset.id AS asset_id,
+                asset.date_start,
+                asset.date_remove,
+                COALESCE(asset.purchase_value, 0.0) AS purchase_value,
+                COALESCE(asset.depreciation_base, 0.0) AS depreciation_base,
+                COALESCE(asset.salvage_value, 0.0) AS salvage_value,
+                COALESCE(asset.depreciation_base, 0.0)
+                    - COALESCE(start_line.value_depreciated, 0.0)
+                    AS period_start_value,
+                COALESCE(asset.depreciation_base, 0.0)
+                    - COALESCE(end_line.value_depreciated, 0.0)
+                    AS period_end_value,
+                EXISTS (
+                    SELECT 1
+                    FROM account_asset_line line
+                    WHERE line.asset_id = asset.id AND line.type = 'depreciate'
+                ) AS has_table
+            FROM account_asset asset
+            LEFT JOIN LATERAL (%s) start_line ON TRUE
+            LEFT JOIN LATERAL (%s) end_line ON TRUE
+            WHERE asset.id = ANY(%s)
+            """,
+            last_depreciation(wiz.date_from),
+            last_depreciation(wiz.date_to),
+            assets.ids,
         )
 
-    def _group_assets(self, assets, group, grouped_assets):
-        if group:
-            group_assets = assets.filtered(lambda r: group in r.group_ids)
+    def _get_asset_values(self, wiz, assets, groups):
+        """Return the per asset amounts and, per report section, the assets
+        directly attached to every group of the report, in report order."""
+        self.env.cr.execute(
+            SQL(
+                """
+                WITH asset_value AS (%s)
+                SELECT
+                    asset_value.asset_id,
+                    asset_value.period_start_value,
+                    asset_value.period_end_value,
+                    asset_value.has_table,
+                    ARRAY(
+                        SELECT section.report_type
+                        FROM (VALUES %s) AS section(report_type, selected)
+                        WHERE section.selected
+                    ) AS report_types,
+                    ARRAY(
+                        SELECT rel.group_id
+                        FROM account_asset_group_rel rel
+                        WHERE rel.asset_id = asset_value.asset_id
+                            AND rel.group_id = ANY(%s)
+                    ) AS group_ids
+                FROM asset_value
+                """,
+                self._get_asset_value_sql(wiz, assets),
+                self._get_report_type_values_sql(wiz),
+                groups.ids,
+            )
+        )
+        rows = {row["asset_id"]: row for row in self.env.cr.dictfetchall()}
+        asset_values = {}
+        group_assets = defaultdict(lambda: defaultdict(list))
+        for asset in assets:
+            row = rows[asset.id]
+            asset_values[asset.id] = {
+                "_period_start_value": row["period_start_value"],
+                "_period_end_value": row["period_end_value"],
+                "has_table": row["has_table"],
+            }
+            # without a root group, all assets are reported in a single block
+            group_ids = row["group_ids"] if groups else [False]
+            for report_type in row["report_types"]:
+                for group_id in group_ids:
+                    group_assets[report_type][group_id].append(asset)
+        return asset_values, group_assets
+
+    def _get_group_totals(self, wiz, assets, groups):
+        """Return, per report section, the totals of every group with
+        assets in its subtree.
+
+        An asset is accounted for in every ancestor of the groups it is
+        attached to, as resolved through ``parent_path``.
+        """
+        if groups:
+            group_join = SQL(
+                """
+                JOIN account_asset_group_rel rel
+                    ON rel.asset_id = asset_value.asset_id
+                JOIN account_asset_group grp ON grp.id = rel.group_id
+                JOIN account_asset_group ancestor
+                    ON grp.parent_path LIKE ancestor.parent_path || '%%'
+                    AND ancestor.id = ANY(%s)
+                """,
+                groups.ids,
+            )
+            group_key = SQL("ancestor.id")
         else:
-            group_assets = assets
-        group_assets = group_assets.sorted(
-            lambda r: (r.date_start or "", r.code or "", r.name)
+            group_join = SQL()
+            group_key = SQL("NULL::integer")
+        self.env.cr.execute(
+            SQL(
+                """
+                WITH asset_value AS (%(asset_value)s)
+                SELECT
+                    section.report_type,
+                    %(group_key)s AS group_id,
+                    SUM(asset_value.purchase_value) AS _purchase_value,
+                    SUM(asset_value.depreciation_base) AS _depreciation_base,
+                    SUM(asset_value.salvage_value) AS _salvage_value,
+                    SUM(asset_value.period_start_value) AS _period_start_value,
+                    SUM(asset_value.period_end_value) AS _period_end_value
+                FROM asset_value
+                %(group_join)s
+                CROSS JOIN LATERAL (VALUES %(sections)s)
+                    AS section(report_type, selected)
+                WHERE section.selected
+                GROUP BY section.report_type, %(group_key)s
+                """,
+                asset_value=self._get_asset_value_sql(wiz, assets),
+                group_key=group_key,
+                group_join=group_join,
+                sections=self._get_report_type_values_sql(wiz),
+            )
         )
-        grouped_assets[group] = {"assets": group_assets}
-        for child in group.child_ids:
-            self._group_assets(assets, child, grouped_assets[group])
+        group_totals = defaultdict(dict)
+        for row in self.env.cr.dictfetchall():
+            report_type = row.pop("report_type")
+            group_totals[report_type][row.pop("group_id") or False] = row
+        return group_totals
 
-    def _create_report_entries(
-        self, ws_params, wiz, entries, group, group_val, error_dict
-    ):
+    def _create_report_entries(self, ws_params, wiz, entries, group, data, error_dict):
         report = ws_params["report_type"]
-
-        def asset_filter(asset):
-            filt = getattr(self, f"{report}_filter")
-            return filt(wiz, asset)
-
-        def _has_assets(group, group_val):
-            assets = group_val.get("assets")
-            assets = assets.filtered(asset_filter)
-            if assets:
-                return True
-            for child in group.child_ids:
-                if _has_assets(child, group_val[child]):
-                    return True
-            return False
-
-        assets = group_val.get("assets")
-        assets = assets.filtered(asset_filter)
-
+        totals = data["group_totals"][report].get(group.id)
         # remove empty entries
-        if not _has_assets(group, group_val):
+        if not totals:
             return
 
-        asset_entries = []
-        group_entry = {
-            "_purchase_value": 0.0,
-            "_depreciation_base": 0.0,
-            "_salvage_value": 0.0,
-            "_period_start_value": 0.0,
-            "_period_end_value": 0.0,
-            "group": group,
-        }
-        for asset in assets:
-            asset_entry = {"asset": asset}
-            group_entry["_purchase_value"] += asset.purchase_value
-            group_entry["_depreciation_base"] += asset.depreciation_base
-            group_entry["_salvage_value"] += asset.salvage_value
-            dls_all = asset.depreciation_line_ids.filtered(
-                lambda r: r.type == "depreciate"
-            )
-            dls_all = dls_all.sorted(key=lambda r: r.line_date)
-            if not dls_all and asset.method_number:
+        entries.append(dict(totals, group=group))
+        for asset in data["group_assets"][report][group.id]:
+            asset_values = data["asset_values"][asset.id]
+            if not asset_values["has_table"] and asset.method_number:
                 error_dict["no_table"] += asset
-            # period_start_value
-            dls = dls_all.filtered(lambda r: r.line_date <= wiz.date_from)
-            if dls:
-                value_depreciated = dls[-1].depreciated_value + dls[-1].amount
-            else:
-                value_depreciated = 0.0
-            asset_entry["_period_start_value"] = (
-                asset.depreciation_base - value_depreciated
-            )
-            group_entry["_period_start_value"] += asset_entry["_period_start_value"]
-            # period_end_value
-            dls = dls_all.filtered(lambda r: r.line_date <= wiz.date_to)
-            if dls:
-                value_depreciated = dls[-1].depreciated_value + dls[-1].amount
-            else:
-                value_depreciated = 0.0
-            asset_entry["_period_end_value"] = (
-                asset.depreciation_base - value_depreciated
+            entries.append(
+                {
+                    "asset": asset,
+                    "_period_start_value": asset_values["_period_start_value"],
+                    "_period_end_value": asset_values["_period_end_value"],
+                }
             )
-            group_entry["_period_end_value"] += asset_entry["_period_end_value"]
-
-            asset_entries.append(asset_entry)
-
-        todos = []
-        for g in group.child_ids:
-            if _has_assets(g, group_val[g]):
-                todos.append(g)
-
-        entries.append(group_entry)
-        entries.extend(asset_entries)
-        for todo in todos:
+        for child in data["group_children"].get(group.id, []):
             self._create_report_entries(
-                ws_params, wiz, entries, todo, group_val[todo], error_dict
+                ws_params, wiz, entries, child, data, error_dict
             )
 
     def _asset_report(self, workbook, ws, ws_params, data, wiz):
@@ -550,13 +654,7 @@ class AssetReportXlsx(models.AbstractModel):
         row_pos = 0
         row_pos = self._report_title(ws, row_pos, ws_params, data, wiz)
 
-        def asset_filter(asset):
-            filt = getattr(self, f"{report}_filter")
-            return filt(wiz, asset)
-
-        assets = data["assets"].filtered(asset_filter)
-
-        if not assets:
+        if not data["group_totals"][report]:
             return self._empty_report(ws, row_pos, ws_params, data, wiz)
 
         row_pos = self._write_line(
@@ -581,33 +679,16 @@ class AssetReportXlsx(models.AbstractModel):
         period_end_value_pos = "period_end_value" in wl and wl.index("period_end_value")
 
         entries = []
-        root = wiz.asset_group_id
-        root_val = data["grouped_assets"][root]
         error_dict = {
             "no_table": self.env["account.asset"],
             "dups": self.env["account.asset"],
         }
 
-        self._create_report_entries(ws_params, wiz, entries, root, root_val, error_dict)
+        self._create_report_entries(
+            ws_params, wiz, entries, wiz.asset_group_id, data, error_dict
+        )
 
-        # traverse entries in reverse order to calc totals
-        for i, entry in enumerate(reversed(entries)):
-            if "group" in entry:
-                parent = entry["group"].parent_id
-                for parent_entry in reversed(entries[: -i - 1]):
-                    if "group" in parent_entry and parent_entry["group"] == parent:
-                        parent_entry["_purchase_value"] += entry["_purchase_value"]
-                        parent_entry["_depreciation_base"] += entry[
-                            "_depreciation_base"
-                        ]
-                        parent_entry["_salvage_value"] += entry["_salvage_value"]
-                        parent_entry["_period_start_value"] += entry[
-                            "_period_start_value"
-                        ]
-                        parent_entry["_period_end_value"] += entry["_period_end_value"]
-                        continue
-
-        processed = []
+        processed = set()
         for entry in entries:
             period_start_value_cell = period_start_value_pos and self._rowcol_to_cell(
                 row_pos, period_start_value_pos
@@ -646,7 +727,7 @@ class AssetReportXlsx(models.AbstractModel):
                     error_dict["dups"] += asset
                     continue
                 else:
-                    processed.append(asset)
+                    processed.add(asset)
                 row_pos = self._write_line(
                     ws,
                     row_pos,
@@ -49,7 +49,9 @@ class TestAssetManagementXls(AccountTestInvoicingCommon):
                 "method_period": "year",
             }
         )
-        cls.env["account.asset"].create(
+        cls.group_fa = group_fa
+        cls.group_tfa = group_tfa
+        cls.asset = cls.env["account.asset"].create(
             {
                 "state": "draft",
                 "method_time": "year",
@@ -61,7 +63,8 @@ class TestAssetManagementXls(AccountTestInvoicingCommon):
                 "profile_id": ict3Y.id,
                 "date_start": time.strftime("%Y-01-01"),
             }
-        ).validate()
+        )
+        cls.asset.validate()
         fy_dates = cls.company.compute_fiscalyear_dates(fields.date.today())
 
         wiz_vals = {
@@ -69,6 +72,7 @@ class TestAssetManagementXls(AccountTestInvoicingCommon):
             "date_from": fy_dates["date_from"],
             "date_to": fy_dates["date_to"],
         }
+        cls.wiz_vals = wiz_vals
         cls.xls_report = cls.wiz_model.create(wiz_vals)
         cls.report_action = cls.xls_report.xls_export()
 
@@ -87,3 +91,33 @@ class TestAssetManagementXls(AccountTestInvoicingCommon):
             active_model=self.xls_report._name, **self.report_action["context"]
         )
         model.create_xlsx_report(self.xls_report.ids, data=self.report_action["data"])
+
+    def test_02_group_totals(self):
+        """Group totals include the assets of the whole group subtree"""
+        data = {}
+        self.env[f"report.{self.xls_report_name}"]._get_assets(self.xls_report, data)
+        active_totals = data["group_totals"]["active"]
+        for group in self.group_fa | self.group_tfa:
+            self.assertEqual(active_totals[group.id]["_purchase_value"], 1500.0)
+            self.assertEqual(active_totals[group.id]["_depreciation_base"], 1500.0)
+        self.assertEqual(
+            data["group_assets"]["active"][self.group_tfa.id], [self.asset]
+        )
+        self.assertFalse(data["group_assets"]["active"][self.group_fa.id])
+        self.assertEqual(data["group_children"][self.group_fa.id], [self.group_tfa])
+
+    def test_03_background_job_cache(self):
+        """Exports with the same options from another wizard reuse the file"""
+        job_model = self.env["report.xlsx.job"]
+        data = self.report_action["data"]
+        job = job_model._enqueue(self.xls_report_name, self.xls_report.ids, data)
+        job._process()
+        self.assertEqual(job.state, "done")
+        other_wizard = self.wiz_model.create(self.wiz_vals)
+        self.assertEqual(
+            job_model._enqueue(self.xls_report_name, other_wizard.ids, data), job
+        )
+        other_wizard.date_from = fields.Date.add(self.wiz_vals["date_from"], days=1)
+        self.assertNotEqual(
+            job_model._enqueue(self.xls_report_name, other_wizard.ids, data), job
+        )
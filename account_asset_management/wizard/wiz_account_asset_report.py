@@ -69,7 +69,11 @@ class WizAccountAssetReport(models.TransientModel):
             "type": "ir.actions.report",
             "report_type": "xlsx",
             "report_name": report_name,
-            "context": dict(self.env.context, report_file=report_file),
+            "context": dict(
+                self.env.context,
+                report_file=report_file,
+                report_xlsx_background=True,
+            ),
             "data": {"dynamic_report": True},
         }
         return report
@@ -18,21 +18,22 @@ class AccountJournal(models.Model):
         The goal is to improve performances.
         """
         self.ensure_one()
-        speeddict = {"account_number": {}}
-        partner_banks = self.env["res.partner.bank"].search_read(
-            [("company_id", "in", (False, self.company_id.id))],
-            ["acc_number", "partner_id"],
-        )
-        for partner_bank in partner_banks:
-            sanitized_acc_number = self._sanitize_bank_account_number(
-                partner_bank["acc_number"]
-            )
-            speeddict["account_number"][sanitized_acc_number] = {
-                "partner_id": partner_bank["partner_id"][0],
-                "partner_bank_id": partner_bank["id"],
-            }
+        speeddict = {
+            "account_number": self.env[
+                "res.partner.bank"
+            ]._get_statement_import_accounts(self.company_id)
+        }
         return speeddict
 
+    def _statement_lines_import_update_hook(self, st_lines_vals, speeddict):
+        """Update all the lines of a statement at once. By default, each line
+        goes through `_statement_line_import_update_hook`, but it can be
+        inherited for processing them in batch.
+        """
+        self.ensure_one()
+        for st_line_vals in st_lines_vals:
+            self._statement_line_import_update_hook(st_line_vals, speeddict)
+
     def _statement_line_import_update_hook(self, st_line_vals, speeddict):
         """This method is designed to be inherited by reconciliation modules.
         In this method you can:
@@ -0,0 +1,185 @@
+# License LGPL-3.0 or later (https://www.gnu.org/licenses/lgpl).
+
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from types import MappingProxyType
+
+from odoo import api, models
+from odoo.tools import SQL
+
+# Changed bank accounts are looked up since the last change already cached
+# minus this margin, for catching the ones committed late
+STATEMENT_IMPORT_CACHE_MARGIN = timedelta(minutes=10)
+# Hash of the values of a bank account used for matching it
+STATEMENT_IMPORT_ROW_HASH = SQL(
+    "hashtext(CONCAT_WS(',', id, acc_number, partner_id, sequence))"
+)
+
+
+class ResPartnerBank(models.Model):
+    _inherit = "res.partner.bank"
+
+    # Bank accounts of each database, company and access rules, shared by all
+    # the imports
+    _statement_import_cache = {}
+    _statement_import_cache_lock = threading.Lock()
+
+    @api.model
+    def _get_statement_import_domain(self, company):
+        """Domain of the bank accounts that can be matched for the company."""
+        return [("company_id", "in", (False, company.id))]
+
+    @api.model
+    def _get_statement_import_query(self, company):
+        """Query of the IDs of the bank accounts that can be matched for the
+        company and read by the current user."""
+        domain = self._get_statement_import_domain(company)
+        return self.with_context(active_test=True)._search(domain).subselect()
+
+    @api.model
+    def _get_statement_import_cache_key(self, company):
+        """Key of the cache entry of the company, shared by the users with the
+        same access rules on the bank accounts."""
+        access = None
+        if not self.env.su:
+            access = str(self.env["ir.rule"]._compute_domain(self._name, "read"))
+        return (self.env.cr.dbname, company.id, access)
+
+    @api.model
+    def _get_statement_import_fingerprint(self, company):
+        """Count and checksum of the bank accounts that can be matched for the
+        company, which change with any modification of their matched values."""
+        self.env.cr.execute(
+            SQL(
+                """
+                SELECT COUNT(*), COALESCE(SUM(%s::bigint), 0)
+                FROM res_partner_bank
+                WHERE id IN %s
+                """,
+                STATEMENT_IMPORT_ROW_HASH,
+                self._get_statement_import_query(company),
+            )
+        )
+        return self.env.cr.fetchone()
+
+    @api.model
+    def _get_statement_import_rows(self, company, since=None):
+        """Read the bank accounts of the company, or the ones changed since the
+        given date, flagging if they can be matched."""
+        query = self._get_statement_import_query(company)
+        self.env.cr.execute(
+            SQL(
+                """
+                SELECT
+                    id,
+                    acc_number,
+                    partner_id,
+                    sequence,
+                    write_date,
+                    %(hash)s,
+                    id IN %(query)s
+                FROM res_partner_bank
+                WHERE %(where)s
+                """,
+                query=query,
+                hash=STATEMENT_IMPORT_ROW_HASH,
+                where=SQL("write_date >= %s", since)
+                if since
+                else SQL("id IN %s", query),
+            )
+        )
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _apply_statement_import_rows(self, entry, rows):
+        """Update the cache entry with the given bank accounts rows, keeping
+        for each number the last bank account in the model order, as a search
+        would."""
+        journal_obj = self.env["account.journal"]
+        banks = entry["banks"]
+        numbers = entry["numbers"]
+        affected_numbers = set()
+        for (
+            bank_id,
+            acc_number,
+            partner_id,
+            sequence,
+            write_date,
+            row_hash,
+            valid,
+        ) in rows:
+            old = banks.pop(bank_id, None)
+            if old:
+                numbers[old[0]].discard(bank_id)
+                entry["checksum"] -= old[3]
+                affected_numbers.add(old[0])
+            if valid:
+                number = journal_obj._sanitize_bank_account_number(acc_number)
+                banks[bank_id] = (number, partner_id, sequence, row_hash)
+                numbers[number].add(bank_id)
+                entry["checksum"] += row_hash
+                affected_numbers.add(number)
+            if not entry["date"] or write_date > entry["date"]:
+                entry["date"] = write_date
+        for number in affected_numbers:
+            bank_ids = numbers.get(number)
+            if not bank_ids:
+                numbers.pop(number, None)
+                entry["accounts"].pop(number, None)
+                continue
+            bank_id = max(
+                bank_ids,
+                key=lambda x: (banks[x][2] is None, banks[x][2] or 0, x),
+            )
+            entry["accounts"][number] = MappingProxyType(
+                {"partner_id": banks[bank_id][1], "partner_bank_id": bank_id}
+            )
+
+    @api.model
+    def _get_statement_import_accounts(self, company):
+        """Get the bank accounts that can be matched when importing statements
+        of the company, by account number sanitized through
+        `account.journal._sanitize_bank_account_number`.
+
+        The bank accounts are cached between imports and journals, and only
+        the ones changed since the last call are read again.
+
+        :return: Copy of the cached dictionary, with the sanitized account
+          numbers as keys, and read-only mappings with the partner and bank
+          account IDs as values.
+        """
+        self.check_access("read")
+        self.flush_model()
+        fingerprint = self._get_statement_import_fingerprint(company)
+        key = self._get_statement_import_cache_key(company)
+        sequence = self.env.registry.registry_sequence
+        with self._statement_import_cache_lock:
+            entry = self._statement_import_cache.get(key)
+            if entry and entry["sequence"] != sequence:
+                # The registry was reloaded, and the account numbers could be
+                # sanitized differently
+                entry = None
+            if entry and (len(entry["banks"]), entry["checksum"]) == fingerprint:
+                return dict(entry["accounts"])
+            if entry and entry["date"]:
+                self._apply_statement_import_rows(
+                    entry,
+                    self._get_statement_import_rows(
+                        company, since=entry["date"] - STATEMENT_IMPORT_CACHE_MARGIN
+                    ),
+                )
+            if not entry or (len(entry["banks"]), entry["checksum"]) != fingerprint:
+                entry = {
+                    "banks": {},
+                    "numbers": defaultdict(set),
+                    "accounts": {},
+                    "checksum": 0,
+                    "date": None,
+                    "sequence": sequence,
+                }
+                self._apply_statement_import_rows(
+                    entry, self._get_statement_import_rows(company)
+                )
+                self._statement_import_cache[key] = entry
+            return dict(entry["accounts"])
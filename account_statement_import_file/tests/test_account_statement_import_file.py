@@ -146,3 +146,78 @@ class TestAccountStatementImportFile(common.TransactionCase):
         )
         with self.assertRaises(UserError):
             import_wizard.import_single_statement(vals, result)
+
+    def test_create_bank_statements_skip_existing(self):
+        import_wizard = self.import_wizard
+
+        def stmts_vals():
+            return [
+                {
+                    "name": "Test statement",
+                    "journal_id": self.journal_1.id,
+                    "balance_start": 10,
+                    "balance_end_real": 7,
+                    "transactions": [
+                        {
+                            "payment_ref": f"PAYMENT REF {i}",
+                            "date": "2024-01-01",
+                            "amount": -1,
+                            "unique_import_id": f"TEST-{i}",
+                            "journal_id": self.journal_1.id,
+                        }
+                        for i in range(3)
+                    ],
+                }
+            ]
+
+        vals = stmts_vals()
+        vals[0]["transactions"] = vals[0]["transactions"][:2]
+        vals[0]["balance_end_real"] = 8
+        result = {"statement_ids": [], "notifications": []}
+        import_wizard._create_bank_statements(vals, result)
+        self.assertEqual(
+            import_wizard._get_existing_unique_import_ids(stmts_vals()),
+            {"TEST-0", "TEST-1"},
+        )
+        # Reimporting an overlapping statement only creates the new line
+        result = {"statement_ids": [], "notifications": []}
+        import_wizard._create_bank_statements(stmts_vals(), result)
+        statement = self.env["account.bank.statement"].browse(result["statement_ids"])
+        self.assertEqual(statement.line_ids.mapped("unique_import_id"), ["TEST-2"])
+        self.assertEqual(statement.balance_start, 8)
+        self.assertEqual(len(result["notifications"]), 1)
+        # Lines repeated across the statements of a file are created once
+        vals = stmts_vals() + stmts_vals()
+        for st_vals in vals:
+            for lvals in st_vals["transactions"]:
+                lvals["unique_import_id"] += "-BATCH"
+        result = {"statement_ids": [], "notifications": []}
+        import_wizard._create_bank_statements(vals, result)
+        statements = self.env["account.bank.statement"].browse(result["statement_ids"])
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(len(statements.line_ids), 3)
+        self.assertEqual(len(result["notifications"]), 1)
+
+    def test_statement_import_bank_accounts_cache(self):
+        partner_bank_obj = self.env["res.partner.bank"]
+        partner = self.env["res.partner"].create({"name": "Test partner"})
+        partner_bank = partner_bank_obj.create(
+            {"acc_number": "ES12 3456 7890", "partner_id": partner.id}
+        )
+        accounts = self.journal_1._statement_line_import_speeddict()["account_number"]
+        self.assertEqual(
+            accounts["ES1234567890"],
+            {"partner_id": partner.id, "partner_bank_id": partner_bank.id},
+        )
+        # Changes are applied to the cache shared between journals
+        partner_bank.acc_number = "ES09 8765 4321"
+        accounts = self.journal_2._statement_line_import_speeddict()["account_number"]
+        self.assertNotIn("ES1234567890", accounts)
+        self.assertEqual(accounts["ES0987654321"]["partner_bank_id"], partner_bank.id)
+        partner_bank.active = False
+        accounts = partner_bank_obj._get_statement_import_accounts(self.env.company)
+        self.assertNotIn("ES0987654321", accounts)
+        # Callers get their own copy of the cached bank accounts
+        accounts["ES0987654321"] = {"partner_id": partner.id}
+        accounts = partner_bank_obj._get_statement_import_accounts(self.env.company)
+        self.assertNotIn("ES0987654321", accounts)
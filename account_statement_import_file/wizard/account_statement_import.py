@@ -6,11 +6,18 @@ import logging
 
 from odoo import api, fields, models
 from odoo.exceptions import UserError
+from odoo.tools import split_every
 
 from odoo.addons.base.models.res_bank import sanitize_account_number
 
 logger = logging.getLogger(__name__)
 
+# Number of statement lines created at once, for bounding the memory used by
+# the records and the computations pending of each batch
+STATEMENT_LINE_BATCH_SIZE = 1000
+# Number of unique import IDs looked up per query
+UNIQUE_IMPORT_ID_BATCH_SIZE = 10000
+
 
 class AccountStatementImport(models.TransientModel):
     _name = "account.statement.import"
@@ -85,18 +92,20 @@ class AccountStatementImport(models.TransientModel):
 
     def import_single_file(self, file_data, result):
         parsing_data = self.with_context(active_id=self.ids[0])._parse_file(file_data)
-        if not isinstance(parsing_data, list):  # for backward compatibility
+        if isinstance(parsing_data, tuple):  # for backward compatibility
             parsing_data = [parsing_data]
-        logger.info(
-            "Bank statement file %s contains %d accounts",
-            self.statement_filename,
-            len(parsing_data),
-        )
+        # Parsers may yield the statements while reading the file
+        idx = 0
         for idx, single_statement_data in enumerate(parsing_data, start=1):
             logger.debug(
                 "account %d: single_statement_data=%s", idx, single_statement_data
             )
             self.import_single_statement(single_statement_data, result)
+        logger.info(
+            "Bank statement file %s contains %d accounts",
+            self.statement_filename,
+            idx,
+        )
 
     def import_single_statement(self, single_statement_data, result):
         if not isinstance(single_statement_data, tuple):
@@ -162,7 +171,7 @@ class AccountStatementImport(models.TransientModel):
                         Will be used to find/create the res.partner.bank in the system
                     -o 'partner_name': string
         If the file is a multi-statement file, this method must return
-        a list of triplets.
+        a list of triplets, or an iterator yielding them as they are read.
         """
         raise UserError(
             self.env._(
@@ -305,35 +314,66 @@ class AccountStatementImport(models.TransientModel):
                 journal._statement_line_import_update_unique_import_id(
                     lvals, account_number
                 )
-                journal._statement_line_import_update_hook(lvals, speeddict)
+            journal._statement_lines_import_update_hook(
+                st_vals["transactions"], speeddict
+            )
+            for lvals in st_vals["transactions"]:
                 if not lvals.get("payment_ref"):
                     raise UserError(self.env._("Missing payment_ref on a transaction."))
         return stmts_vals
 
+    def _get_existing_unique_import_ids(self, stmts_vals):
+        """Get the unique import IDs of the given statements values that
+        were already imported, searching them all at once.
+        """
+        unique_import_ids = {
+            lvals["unique_import_id"]
+            for st_vals in stmts_vals
+            for lvals in st_vals["transactions"]
+            if lvals.get("unique_import_id")
+        }
+        existing_ids = set()
+        absl_obj = self.env["account.bank.statement.line"].sudo()
+        for ids_chunk in split_every(UNIQUE_IMPORT_ID_BATCH_SIZE, unique_import_ids):
+            existing_ids.update(
+                absl_obj.search_fetch(
+                    [("unique_import_id", "in", list(ids_chunk))],
+                    ["unique_import_id"],
+                ).mapped("unique_import_id")
+            )
+        return existing_ids
+
+    def _create_bank_statement(self, st_vals, st_lines_vals):
+        """Create the statement with its lines, in batches of
+        STATEMENT_LINE_BATCH_SIZE lines, flushing the computations of each
+        batch at once.
+        """
+        context = st_vals.pop("creation_context", {})
+        batches = split_every(STATEMENT_LINE_BATCH_SIZE, st_lines_vals, list)
+        st_vals["line_ids"] = [[0, False, line] for line in next(batches)]
+        statement = (
+            self.env["account.bank.statement"].with_context(**context).create(st_vals)
+        )
+        absl_obj = self.env["account.bank.statement.line"].with_context(**context)
+        for batch in batches:
+            self.env.flush_all()
+            absl_obj.create([dict(line, statement_id=statement.id) for line in batch])
+        return statement
+
     def _create_bank_statements(self, stmts_vals, result):
         """Create new bank statements from imported values,
         filtering out already imported transactions,
         and return data used by the reconciliation widget"""
-        abs_obj = self.env["account.bank.statement"]
-        absl_obj = self.env["account.bank.statement.line"]
+        existing_unique_import_ids = self._get_existing_unique_import_ids(stmts_vals)
 
         # Filter out already imported transactions and create statements
         statement_ids = []
-        existing_st_line_ids = {}
+        ignored_unique_import_ids = set()
         for st_vals in stmts_vals:
             st_lines_to_create = []
             for lvals in st_vals["transactions"]:
-                existing_line = False
-                if lvals.get("unique_import_id"):
-                    existing_line = absl_obj.sudo().search(
-                        [
-                            ("unique_import_id", "=", lvals["unique_import_id"]),
-                        ],
-                        limit=1,
-                    )
-                    # we can only have 1 anyhow because we have a unicity SQL constraint
-                if existing_line:
-                    existing_st_line_ids[existing_line.id] = True
+                if lvals.get("unique_import_id") in existing_unique_import_ids:
+                    ignored_unique_import_ids.add(lvals["unique_import_id"])
                     if "balance_start" in st_vals:
                         st_vals["balance_start"] += float(lvals["amount"])
                 else:
@@ -345,18 +385,22 @@ class AccountStatementImport(models.TransientModel):
                         vals["sequence"] = seq
                 # Remove values that won't be used to create records
                 st_vals.pop("transactions", None)
-                context = st_vals.pop("creation_context", {})
                 # Create the statement with lines
-                st_vals["line_ids"] = [[0, False, line] for line in st_lines_to_create]
-                statement = abs_obj.with_context(**context).create(st_vals)
+                statement = self._create_bank_statement(st_vals, st_lines_to_create)
                 statement_ids.append(statement.id)
+                # The following statements of the file skip these lines too
+                existing_unique_import_ids.update(
+                    lvals["unique_import_id"]
+                    for lvals in st_lines_to_create
+                    if lvals.get("unique_import_id")
+                )
 
         if not statement_ids:
             return False
         result["statement_ids"].extend(statement_ids)
 
         # Prepare import feedback
-        num_ignored = len(existing_st_line_ids)
+        num_ignored = len(ignored_unique_import_ids)
         if num_ignored > 0:
             if num_ignored == 1:
                 msg = self.env._(
@@ -1,3 +1,4 @@
 from . import controllers
 from . import wizard
+from . import services
 from . import models
\ No newline at end of file
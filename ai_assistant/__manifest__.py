@@ -5,10 +5,11 @@
     "category": "Productivity",
     "author": "Your Company",
     "website": "https://yourwebsite.com",
-    "depends": ["web", "account"],
+    "depends": ["web", "bus", "account"],
     "data": [
         "security/ir.model.access.csv",
         "views/ai_assistant_views.xml",
+        "data/ir_cron.xml",
     ],
     "assets": {
         "web.assets_backend": [
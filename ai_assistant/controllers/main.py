@@ -16,26 +16,21 @@ class AiAssistantController(http.Controller):
         try:
             _logger.info(f"AI Request - Question: '{question[:100]}...', Model: {active_model}, ID: {active_id}")
             
-            user = request.env.user
-            
             # Get or create assistant for this user
-            assistant = request.env["ai.assistant"].search([
-                ("user_id", "=", user.id),
-                ("active", "=", True)
-            ], limit=1, order="create_date desc")
-            
-            if not assistant:
-                assistant = request.env["ai.assistant"].create({
-                    "user_id": user.id,
-                    "name": f"{user.name}'s AI Assistant"
-                })
+            assistant = self._get_assistant()
             
-            # Get detailed context from the active record
+            # Get detailed context from the active record and the related ones
             context_data = self._get_record_context(active_model, active_id)
+            context_data += self._get_retrieval_context(question, active_model, active_id)
             _logger.debug(f"Context for AI: {context_data[:500]}")
             
-            # Call the LLM with question and context
-            answer = assistant.call_external_llm(question, context_data)
+            # Answer from the cache, or else call the LLM with question and context
+            history = assistant._get_history_messages()
+            answer, cache_vals = request.env["ai.response.cache"]._lookup(
+                question, context_data, active_model, active_id, history=history
+            )
+            if answer is None:
+                answer = assistant.call_external_llm(question, context_data, cache_vals=cache_vals, history=history)
             
             # Store the conversation
             message = request.env["ai.message"].create({
@@ -64,6 +59,90 @@ class AiAssistantController(http.Controller):
                 "error": str(e),
             }
     
+    @http.route("/ai/ask_stream", type="json", auth="user", methods=["POST"], csrf=False)
+    def ai_ask_stream(self, question, active_model=None, active_id=None, **kwargs):
+        """
+        Streaming variant of /ai/ask: returns at once with a stream id, the
+        answer is sent through the bus as it is generated and stored when
+        complete, without holding the HTTP worker during the LLM call.
+        """
+        try:
+            _logger.info(f"AI Stream Request - Question: '{question[:100]}...', Model: {active_model}, ID: {active_id}")
+            
+            assistant = self._get_assistant()
+            context_data = self._get_record_context(active_model, active_id)
+            context_data += self._get_retrieval_context(question, active_model, active_id)
+            message_vals = {
+                "question": question,
+                "model_context": active_model,
+                "record_id": active_id,
+                "timestamp": datetime.now(),
+            }
+            
+            # Cached answers are returned at once, without streaming
+            history = assistant._get_history_messages()
+            answer, cache_vals = request.env["ai.response.cache"]._lookup(
+                question, context_data, active_model, active_id, history=history
+            )
+            if answer is not None:
+                message = request.env["ai.message"].create(dict(message_vals, assistant_id=assistant.id, answer=answer))
+                return {
+                    "success": True,
+                    "answer": answer,
+                    "message_id": message.id,
+                    "timestamp": message.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                    "cached": True,
+                }
+            
+            # Configuration and credit errors are reported right away
+            llm_request = assistant._prepare_llm_request(question, context_data, history=history)
+            llm_request["cache_vals"] = cache_vals
+            stream_id = assistant._start_llm_stream(llm_request, message_vals)
+            
+            return {
+                "success": True,
+                "stream_id": stream_id,
+            }
+            
+        except Exception as e:
+            _logger.error(f"Error in ai_ask_stream: {str(e)}", exc_info=True)
+            return {
+                "success": False,
+                "answer": f"❌ Error: {str(e)}",
+                "error": str(e),
+            }
+    
+    def _get_assistant(self):
+        """Get or create assistant for the current user"""
+        user = request.env.user
+        assistant = request.env["ai.assistant"].search([
+            ("user_id", "=", user.id),
+            ("active", "=", True)
+        ], limit=1, order="create_date desc")
+        
+        if not assistant:
+            assistant = request.env["ai.assistant"].create({
+                "user_id": user.id,
+                "name": f"{user.name}'s AI Assistant"
+            })
+        return assistant
+    
+    def _get_retrieval_context(self, question, model_name, record_id):
+        """
+        Records related to the question, found in the local retrieval index.
+        """
+        max_tokens = int(request.env["ir.config_parameter"].sudo().get_param("ai_assistant.retrieval_max_tokens", 500))
+        if not max_tokens:
+            return ""
+        try:
+            exclude = (model_name, int(record_id)) if model_name and record_id else None
+            with request.env.cr.savepoint():
+                related = request.env["ai.retrieval.document"]._get_context(question, max_tokens, exclude=exclude)
+        except Exception as e:
+            _logger.warning(f"Failed to retrieve related records: {str(e)}")
+            return ""
+        return "\n\n" + related if related else ""
+    
     def _get_record_context(self, model_name, record_id):
         """
         Extract meaningful context from the current System record.
@@ -1 +1,5 @@
 from . import ai_assistant
+from . import ai_response_cache
+from . import ai_usage
+from . import ai_retrieval
+from . import ai_stream_job
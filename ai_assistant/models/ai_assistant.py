@@ -1,11 +1,34 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.exceptions import UserError, ValidationError
+from ..services.llm_client import get_client, LLMServiceUnavailable
+from textwrap import shorten
 import requests
 import json
+import time
+import re
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Bus notification type of the streamed answers
+STREAM_NOTIFICATION = "ai_assistant/stream"
+# Seconds between two bus notifications of a streamed answer
+STREAM_FLUSH_INTERVAL = 0.3
+# Final answer of the streams that couldn't complete
+STREAM_INTERRUPTED_ANSWER = "❌ Unexpected Error: The answer was interrupted."
+# Endpoint used when none is configured
+DEFAULT_ENDPOINT = "https://api.openai.com/v1/chat/completions"
+LLM_MODEL = "gpt-3.5-turbo"  # or "gpt-4" if available
+# Version of the system prompt and tools, to bump when they change as
+# cached answers are only served for the same version
+PROMPT_VERSION = 1
+# Latest messages replayed in the prompt, at most, and characters kept of
+# each of their answers
+HISTORY_MAX_MESSAGES = 10
+HISTORY_ANSWER_MAX_CHARS = 1500
+# Characters kept of the summary of the older messages
+HISTORY_SUMMARY_MAX_CHARS = 2000
+
 class AiAssistant(models.Model):
 	_name = "ai.assistant"
 	_description = "AI Assistant Session"
@@ -25,56 +48,67 @@ class AiAssistant(models.Model):
 		copy=False
 	)
 	active = fields.Boolean(default=True)
+	history_summary = fields.Text(string="History Summary", readonly=True, copy=False,
+								  help="Summary of the messages older than the ones replayed in the prompt")
+	summary_message_id = fields.Integer(string="Summarized Up To", readonly=True, copy=False,
+										help="Last message included in the history summary")
 	create_date = fields.Datetime(string="Created On")
 	write_date = fields.Datetime(string="Last Updated")
 
-	def call_external_llm(self, question, context=""):
+	def call_external_llm(self, question, context="", cache_vals=None, history=None):
 		"""
 		Calls external LLM (OpenAI, Claude, etc.) with proper error handling, 
 		maintains conversational memory, and executes functional tool calls.
+		Text answers are cached with `cache_vals` when given.
 		"""
-		# Get configuration from system parameters
-		api_key = self.env["ir.config_parameter"].sudo().get_param("ai_assistant.api_key")
-		endpoint = self.env["ir.config_parameter"].sudo().get_param("ai_assistant.endpoint")
-		
-		# Check if configuration exists
-		if not api_key or api_key.strip() == "":
-			raise UserError(
-				"⚠️ API Key not configured. "
-				"Please set your AI API key in Settings → Technical → Parameters → System Parameters.\n"
-				"Create a parameter with key: 'ai_assistant.api_key'"
+		llm_request = self._prepare_llm_request(question, context, history=history)
+		llm_request["cache_vals"] = cache_vals
+		response = None
+		try:
+			# Make the API call, on the pooled connections of the endpoint
+			response = get_client(llm_request["endpoint"]).post(
+				llm_request["headers"], 
+				llm_request["payload"]
 			)
-		
-		if not endpoint or endpoint.strip() == "":
-			endpoint = "https://api.openai.com/v1/chat/completions"
-			self.env["ir.config_parameter"].sudo().set_param("ai_assistant.endpoint", endpoint)
+			
+			# Check for HTTP errors
+			response.raise_for_status()
+			response_data = response.json()
+			
+			if "choices" in response_data and len(response_data["choices"]) > 0:
+				message = response_data["choices"][0]["message"]
+				return self._process_llm_message(message, llm_request)
+			else:
+				_logger.error(f"Unexpected API response: {response_data}")
+				raise UserError("⚠️ The AI service returned an unexpected response format.")
+				
+		except Exception as e:
+			raise UserError(self._get_llm_error_message(e, response))
 
-		# Check if this is the main SaaS database
-		is_main_db = self.env['ir.module.module'].search_count([('name', '=', 'saas_management'), ('state', '=', 'installed')]) > 0
+	def _prepare_llm_request(self, question, context="", history=None):
+		"""
+		Checks the configuration and the credits, and builds the request of the
+		LLM call: endpoint, headers and payload.
 
-		# Parse current limit and count
-		limit_str = self.env["ir.config_parameter"].sudo().get_param("ai_assistant.message_limit", "0")
-		count_str = self.env["ir.config_parameter"].sudo().get_param("ai_assistant.message_count", "0")
-		try:
-			limit = int(limit_str)
-			count = int(count_str)
-		except ValueError:
-			limit = 0
-			count = 0
+		:param history: prompt messages of the conversation history, as
+			returned by `_get_history_messages`, read if not given
+		"""
+		# Get configuration from system parameters
+		config = self._get_llm_config()
+		headers = self._get_llm_headers()
+		endpoint = config["endpoint"]
+		
+		if not endpoint:
+			endpoint = DEFAULT_ENDPOINT
+			self.env["ir.config_parameter"].sudo().set_param("ai_assistant.endpoint", endpoint)
 
 		# Check credit limit (bypass for main database)
-		if not is_main_db:
-			if count >= limit:
+		if not config["is_main_db"]:
+			if self.env["ai.usage"]._get_total() >= config["message_limit"]:
 				raise UserError("⚠️ AI Message limit reached (0 credits left). Please purchase more AI credits from your SaaS portal.")
 
 		_logger.info(f"Calling LLM API: {endpoint}")
 
-		# Prepare the request
-		headers = {
-			"Authorization": f"Bearer {api_key.strip()}",
-			"Content-Type": "application/json"
-		}
-		
 		# Prepare the conversation with context
 		messages = []
 		
@@ -88,16 +122,9 @@ class AiAssistant(models.Model):
 		{context}"""
 		messages.append({"role": "system", "content": system_message})
 		
-		# Load previous conversation history (up to last 10 messages)
-		history = self.env['ai.message'].search(
-			[('assistant_id', '=', self.id)], 
-			order="timestamp desc", 
-			limit=10
-		)
-		# Reverse so they are chronological
-		for msg in reversed(history):
-			messages.append({"role": "user", "content": msg.question})
-			messages.append({"role": "assistant", "content": msg.answer or "Action OK."})
+		# Load previous conversation history: summary of the older messages,
+		# then the latest ones within the token budget
+		messages.extend(self._get_history_messages() if history is None else history)
 			
 		# Add current user question
 		messages.append({"role": "user", "content": question})
@@ -134,7 +161,7 @@ class AiAssistant(models.Model):
 		]
 		
 		payload = {
-			"model": "gpt-3.5-turbo",  # or "gpt-4" if available
+			"model": LLM_MODEL,
 			"messages": messages,
 			"tools": tools,
 			"tool_choice": "auto",
@@ -142,59 +169,268 @@ class AiAssistant(models.Model):
 			"temperature": 0.7,
 		}
 
-		try:
-			# Make the API call
-			response = requests.post(
-				endpoint, 
-				headers=headers, 
-				json=payload, 
-				timeout=30
+		return {
+			"endpoint": endpoint,
+			"headers": headers,
+			"payload": payload,
+		}
+
+	@api.model
+	def _get_llm_headers(self):
+		"""
+		Headers of the LLM calls, with the API key.
+		"""
+		api_key = self._get_llm_config()["api_key"]
+		
+		# Check if configuration exists
+		if not api_key:
+			raise UserError(
+				"⚠️ API Key not configured. "
+				"Please set your AI API key in Settings → Technical → Parameters → System Parameters.\n"
+				"Create a parameter with key: 'ai_assistant.api_key'"
 			)
-			
-			# Check for HTTP errors
-			response.raise_for_status()
-			response_data = response.json()
-			
-			if "choices" in response_data and len(response_data["choices"]) > 0:
-				message = response_data["choices"][0]["message"]
-				
-				# Intercept Tool Calls
-				if message.get("tool_calls"):
-					for tool_call in message["tool_calls"]:
-						if tool_call["function"]["name"] == "create_invoice":
-							args = json.loads(tool_call["function"]["arguments"])
-							return self._tool_create_invoice(args)
-							
-				# Otherwise Handle Standard Text
-				answer = message.get("content") or "Action complete."
-				
-				# Increment usage
-				self.env["ir.config_parameter"].sudo().set_param("ai_assistant.message_count", str(count + 1))
-				
-				_logger.info(f"LLM Response received: {len(answer)} characters")
-				return answer.strip()
-			else:
-				_logger.error(f"Unexpected API response: {response_data}")
-				raise UserError("⚠️ The AI service returned an unexpected response format.")
-				
-		except requests.exceptions.ConnectionError:
-			raise UserError("🔌 Connection Error: Cannot connect to AI service. Check your internet connection.")
-		except requests.exceptions.Timeout:
-			raise UserError("⏱️ Timeout Error: The AI service took too long to respond.")
-		except requests.exceptions.HTTPError as e:
+		return {
+			"Authorization": f"Bearer {api_key}",
+			"Content-Type": "application/json"
+		}
+
+	@api.model
+	@tools.ormcache()
+	def _get_llm_config(self):
+		"""
+		Configuration of the LLM calls, cached until a system parameter or
+		the installed modules change, as both clear the registry caches.
+		"""
+		params = self.env["ir.config_parameter"].sudo()
+		try:
+			message_limit = int(params.get_param("ai_assistant.message_limit", "0"))
+		except ValueError:
+			message_limit = 0
+		return {
+			"api_key": (params.get_param("ai_assistant.api_key") or "").strip(),
+			"endpoint": (params.get_param("ai_assistant.endpoint") or "").strip(),
+			"message_limit": message_limit,
+			# Check if this is the main SaaS database
+			"is_main_db": self.env['ir.module.module'].sudo().search_count(
+				[('name', '=', 'saas_management'), ('state', '=', 'installed')]
+			) > 0,
+		}
+
+	def _process_llm_message(self, message, llm_request):
+		"""
+		Executes the tool calls of the LLM message, or else returns its text,
+		counts the message and caches the text.
+		"""
+		# Intercept Tool Calls
+		if message.get("tool_calls"):
+			for tool_call in message["tool_calls"]:
+				if tool_call["function"]["name"] == "create_invoice":
+					args = json.loads(tool_call["function"]["arguments"])
+					return self._tool_create_invoice(args)
+					
+		# Otherwise Handle Standard Text
+		answer = message.get("content") or "Action complete."
+		
+		# Increment usage
+		self.env["ai.usage"]._record(self.user_id.id)
+		
+		_logger.info(f"LLM Response received: {len(answer)} characters")
+		answer = answer.strip()
+		self.env["ai.response.cache"]._store(llm_request.get("cache_vals"), answer)
+		return answer
+
+	# ─── History ─────────────────────────────────────────────────────────
+
+	def _get_history_messages(self):
+		"""
+		Prompt messages of the conversation history: the latest messages
+		not summarized yet that fit in `ai_assistant.history_max_tokens`,
+		preceded by the summary of the older ones. Messages are ordered by
+		id, as the summary keeps the last one it includes.
+		"""
+		self.ensure_one()
+		budget = int(self.env["ir.config_parameter"].sudo().get_param("ai_assistant.history_max_tokens", 1500)) * 4
+		history = self.env['ai.message'].search(
+			[('assistant_id', '=', self.id), ('id', '>', self.summary_message_id)],
+			order="id desc",
+			limit=HISTORY_MAX_MESSAGES
+		)
+		window = []
+		for msg in history:
+			answer = msg.answer or "Action OK."
+			if len(answer) > HISTORY_ANSWER_MAX_CHARS:
+				answer = answer[:HISTORY_ANSWER_MAX_CHARS] + "…"
+			size = len(msg.question) + len(answer)
+			if window and size > budget:
+				break
+			window.append((msg, answer))
+			budget -= size
+		if window:
+			self._summarize_history_before(window[-1][0])
+
+		messages = []
+		if self.history_summary:
+			messages.append({"role": "system", "content": f"Resumen de la conversación anterior:\n{self.history_summary}"})
+		# Reverse so they are chronological
+		for msg, answer in reversed(window):
+			messages.append({"role": "user", "content": msg.question})
+			messages.append({"role": "assistant", "content": answer})
+		return messages
+
+	def _summarize_history_before(self, message):
+		"""
+		Add the messages older than `message` and not summarized yet to the
+		rolling summary, one line per message, dropping the oldest lines
+		beyond the summary size.
+		"""
+		self.ensure_one()
+		to_summarize = self.env['ai.message'].search([
+			('assistant_id', '=', self.id),
+			('id', '<', message.id),
+			('id', '>', self.summary_message_id),
+		], order="id")
+		if not to_summarize:
+			return
+		lines = self.history_summary.splitlines() if self.history_summary else []
+		for msg in to_summarize:
+			# First sentence of the answer, which usually carries its gist
+			answer = re.split(r"(?<=[.!?])\s", (msg.answer or "").strip(), maxsplit=1)[0]
+			lines.append(f"- {shorten(msg.question, 150)} → {shorten(answer, 200)}")
+		while len(lines) > 1 and sum(len(line) + 1 for line in lines) > HISTORY_SUMMARY_MAX_CHARS:
+			lines.pop(0)
+		self.write({
+			'history_summary': "\n".join(lines),
+			'summary_message_id': to_summarize[-1].id,
+		})
+
+	def _get_llm_error_message(self, error, response=None):
+		"""
+		User facing message of an error of the LLM call.
+		"""
+		if isinstance(error, UserError):
+			return error.args[0]
+		if isinstance(error, LLMServiceUnavailable):
+			return "🔌 AI service unavailable: it failed repeatedly, please try again in a few moments."
+		if isinstance(error, requests.exceptions.ConnectionError):
+			return "🔌 Connection Error: Cannot connect to AI service. Check your internet connection."
+		if isinstance(error, requests.exceptions.Timeout):
+			return "⏱️ Timeout Error: The AI service took too long to respond."
+		if isinstance(error, requests.exceptions.HTTPError):
 			if response.status_code == 401:
-				raise UserError("🔑 Authentication Error: Invalid API key. Please check your API key in settings.")
+				return "🔑 Authentication Error: Invalid API key. Please check your API key in settings."
 			elif response.status_code == 429:
-				raise UserError("💳 Rate Limit Error: You've exceeded your API quota. Please check your account limits.")
+				return "💳 Rate Limit Error: You've exceeded your API quota. Please check your account limits."
 			else:
 				error_msg = f"HTTP Error {response.status_code}: {response.text}"
 				_logger.error(error_msg)
-				raise UserError(f"🌐 API Error {response.status_code}: Please check your API configuration.")
-		except json.JSONDecodeError:
-			raise UserError("📄 Invalid Response: The AI service returned invalid JSON.")
+				return f"🌐 API Error {response.status_code}: Please check your API configuration."
+		if isinstance(error, json.JSONDecodeError):
+			return "📄 Invalid Response: The AI service returned invalid JSON."
+		_logger.error(f"Unexpected error in LLM call: {str(error)}", exc_info=error)
+		return f"❌ Unexpected Error: {str(error)}"
+
+	# ─── Streaming ───────────────────────────────────────────────────────
+
+	def _start_llm_stream(self, llm_request, message_vals):
+		"""
+		Queues the streaming of the answer of the prepared LLM request, run by
+		a cron worker through ai.stream.job so that the HTTP worker is
+		released right away, and the stream isn't lost when it is recycled.
+		The answer is sent to the user through the bus as it arrives, and
+		stored as an ai.message with `message_vals` when complete.
+
+		:return: identifier of the stream, sent with each notification
+		"""
+		self.ensure_one()
+		return self.env["ai.stream.job"]._enqueue(self, llm_request, message_vals).stream_id
+
+	def _stream_external_llm(self, stream_id, llm_request, message_vals):
+		"""
+		Streams the answer, sending its parts right away as they arrive. The
+		final notification is sent when the transaction commits, along with
+		the message storing the answer. The API key is read again when the
+		request comes without its headers.
+		"""
+		self.ensure_one()
+		payload = dict(llm_request["payload"], stream=True)
+		response = None
+		content = []
+		pending = []
+		tool_calls = {}
+		last_flush = time.monotonic()
+		# Sent in any case, so that the user is never left waiting
+		values = {
+			"done": True,
+			"success": False,
+			"answer": STREAM_INTERRUPTED_ANSWER,
+		}
+		try:
+			# Rolled back when the stream fails, before the error is sent
+			with self.env.cr.savepoint():
+				headers = llm_request.get("headers") or self._get_llm_headers()
+				with get_client(llm_request["endpoint"]).post(
+					headers,
+					payload,
+					stream=True,
+				) as response:
+					try:
+						response.raise_for_status()
+					except requests.exceptions.HTTPError as e:
+						# The error body can only be read while the response is open
+						raise UserError(self._get_llm_error_message(e, response)) from e
+					# Server-sent events, one JSON chunk per "data:" line
+					for line in response.iter_lines(decode_unicode=True):
+						if not line or not line.startswith("data:"):
+							continue
+						data = line[5:].strip()
+						if data == "[DONE]":
+							break
+						choices = json.loads(data).get("choices") or [{}]
+						delta = choices[0].get("delta") or {}
+						if delta.get("content"):
+							content.append(delta["content"])
+							pending.append(delta["content"])
+						# Tool call arguments arrive in pieces, per call index
+						for tool_delta in delta.get("tool_calls") or []:
+							tool_call = tool_calls.setdefault(tool_delta.get("index", 0), {
+								"function": {"name": "", "arguments": ""},
+							})
+							function = tool_delta.get("function") or {}
+							tool_call["function"]["name"] += function.get("name") or ""
+							tool_call["function"]["arguments"] += function.get("arguments") or ""
+						if pending and time.monotonic() - last_flush >= STREAM_FLUSH_INTERVAL:
+							self._send_stream_delta(stream_id, "".join(pending))
+							pending = []
+							last_flush = time.monotonic()
+				answer = self._process_llm_message({
+					"content": "".join(content),
+					"tool_calls": [tool_calls[index] for index in sorted(tool_calls)],
+				}, llm_request)
+				message = self.env["ai.message"].create(dict(message_vals, assistant_id=self.id, answer=answer))
+			_logger.info(f"AI Response stored: ID {message.id}")
+			values = {
+				"done": True,
+				"success": True,
+				"answer": answer,
+				"message_id": message.id,
+				"timestamp": message.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+			}
 		except Exception as e:
-			_logger.error(f"Unexpected error in LLM call: {str(e)}", exc_info=True)
-			raise UserError(f"❌ Unexpected Error: {str(e)}")
+			values["answer"] = self._get_llm_error_message(e, response)
+		finally:
+			self._send_stream_notification(stream_id, values)
+
+	def _send_stream_notification(self, stream_id, values):
+		# Notifications are sent when the transaction commits
+		self.env["bus.bus"]._sendone(self.env.user.partner_id, STREAM_NOTIFICATION, dict(values, stream_id=stream_id))
+
+	def _send_stream_delta(self, stream_id, delta):
+		# Sent right away, on a cursor of its own committed at once
+		with self.env.registry.cursor() as cr:
+			self.env(cr=cr)["bus.bus"]._sendone(self.env.user.partner_id, STREAM_NOTIFICATION, {
+				"delta": delta,
+				"stream_id": stream_id,
+			})
 
 	def _tool_create_invoice(self, args):
 		"""
@@ -261,6 +497,8 @@ class AiAssistant(models.Model):
 		"""
 		self.ensure_one()
 		self.message_ids.unlink()
+		self.env['ai.message.archive'].search([('assistant_id', '=', self.id)]).unlink()
+		self.write({'history_summary': False, 'summary_message_id': 0})
 		return {
 			"type": "ir.actions.client",
 			"tag": "display_notification",
@@ -288,6 +526,13 @@ class AiAssistant(models.Model):
 		old_sessions.write({"active": False})
 		
 		_logger.info(f"Cleaned up {count} old AI sessions older than {days_old} days.")
+		
+		# Move the old messages out of the table the prompts are built from
+		retention_days = int(self.env["ir.config_parameter"].sudo().get_param("ai_assistant.message_retention_days", 180))
+		if retention_days:
+			self.env["ai.message.archive"]._archive_messages(
+				fields.Datetime.subtract(fields.Datetime.now(), days=retention_days)
+			)
 
 class AiMessage(models.Model):
 	_name = "ai.message"
@@ -310,6 +555,13 @@ class AiMessage(models.Model):
 	model_context = fields.Char(string="Source Model")
 	record_id = fields.Integer(string="Record ID")
 	
+	def init(self):
+		# History of an assistant, read on every question
+		self.env.cr.execute("""
+			CREATE INDEX IF NOT EXISTS ai_message_assistant_timestamp_index
+			ON ai_message (assistant_id, timestamp)
+		""")
+	
 	def name_get(self):
 		result = []
 		for message in self:
@@ -319,4 +571,60 @@ class AiMessage(models.Model):
 			).strftime("%Y-%m-%d %H:%M")
 			name = f"{timestamp}: {message.question[:50]}..."
 			result.append((message.id, name))
-		return result
\ No newline at end of file
+		return result
+
+class AiMessageArchive(models.Model):
+	"""
+	Messages older than the retention period, moved out of ai.message so
+	that the table the prompts are built from stays small.
+	"""
+	_name = "ai.message.archive"
+	_description = "Archived AI Conversation Message"
+	_order = "timestamp desc"
+
+	assistant_id = fields.Many2one(
+		"ai.assistant", 
+		string="Assistant", 
+		required=True, 
+		index=True,
+		ondelete="cascade"
+	)
+	question = fields.Text(string="User Question", readonly=True)
+	answer = fields.Text(string="AI Response", readonly=True)
+	timestamp = fields.Datetime(string="Time", readonly=True)
+	model_context = fields.Char(string="Source Model", readonly=True)
+	record_id = fields.Integer(string="Record ID", readonly=True)
+
+	@api.model
+	def _archive_messages(self, before, batch_size=10000):
+		"""
+		Move the messages older than `before`, by batches each committed on
+		its own so that the cron doesn't hold long locks on ai_message.
+		"""
+		total = 0
+		while True:
+			self.env.cr.execute("""
+				WITH moved AS (
+					DELETE FROM ai_message
+					 WHERE id IN (
+						SELECT id FROM ai_message
+						 WHERE timestamp < %(before)s
+						 ORDER BY id
+						 LIMIT %(limit)s
+					 )
+				 RETURNING assistant_id, question, answer, timestamp, model_context, record_id
+				)
+				INSERT INTO ai_message_archive
+					(assistant_id, question, answer, timestamp, model_context, record_id,
+					 create_uid, create_date, write_uid, write_date)
+				SELECT assistant_id, question, answer, timestamp, model_context, record_id,
+					   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+				  FROM moved
+			""", {"before": before, "limit": batch_size, "uid": self.env.uid})
+			moved = self.env.cr.rowcount
+			total += moved
+			self.env.cr.commit()
+			if moved < batch_size:
+				break
+		self.env["ai.message"].invalidate_model()
+		_logger.info(f"Archived {total} AI messages older than {before}.")
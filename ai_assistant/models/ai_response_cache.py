@@ -0,0 +1,174 @@
+from odoo import models, fields, api
+from .ai_assistant import LLM_MODEL, PROMPT_VERSION
+from datetime import timedelta
+import psycopg2
+import hashlib
+import re
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Words referring to the earlier turns of the conversation, in the languages
+# of the tenants. "This" and "este" usually refer to the open record instead.
+FOLLOW_UP_PATTERN = re.compile(
+	r"^(and|also|so|then|y|también|entonces|pues)\b"
+	r"|\b(it|those|they|them|he|she|him|her"
+	r"|above|previous|earlier|again|else|same"
+	r"|eso|ello|esos|esas|anterior|antes|otra vez|de nuevo|mismo|misma"
+	r"|él|ella|ellos|ellas)\b"
+)
+
+
+class AiResponseCache(models.Model):
+	"""
+	Answers of the LLM to questions asked on the same record context, served
+	again instead of paying for a new call. An entry is found by the
+	normalised question, the hash of the context string of the record, the
+	LLM model and the prompt version, and is dropped when it expires or when
+	its record has been modified since. Follow-up questions, whose answer
+	depends on the earlier turns of the conversation, are not cached.
+	"""
+	_name = "ai.response.cache"
+	_description = "AI Response Cache"
+	_order = "last_hit desc, id desc"
+
+	key = fields.Char(string="Key", required=True, readonly=True, index=True)
+	question = fields.Text(string="Question", required=True, readonly=True)
+	answer = fields.Text(string="Answer", required=True, readonly=True)
+	model_context = fields.Char(string="Source Model", readonly=True)
+	record_id = fields.Integer(string="Record ID", readonly=True)
+	record_write_date = fields.Datetime(string="Record Version", readonly=True)
+	hit_count = fields.Integer(string="Hits", readonly=True)
+	last_hit = fields.Datetime(string="Last Hit", readonly=True)
+
+	_sql_constraints = [
+		("key_uniq", "unique(key)", "The cache key must be unique."),
+	]
+
+	@api.model
+	def _normalize_question(self, question):
+		question = re.sub(r"\s+", " ", (question or "").strip().lower())
+		return question.rstrip(" ?!.¿¡")
+
+	@api.model
+	def _is_follow_up(self, question):
+		"""Whether the question refers to the earlier turns of the conversation"""
+		return bool(FOLLOW_UP_PATTERN.search(self._normalize_question(question)))
+
+	@api.model
+	def _get_record_version(self, model_name, record_id):
+		if not model_name or not record_id or model_name not in self.env:
+			return False
+		record = self.env[model_name].sudo().browse(int(record_id)).exists()
+		return record.write_date if record and "write_date" in record._fields else False
+
+	@api.model
+	def _get_ttl(self):
+		return int(self.env["ir.config_parameter"].sudo().get_param("ai_assistant.cache_ttl_hours", 24))
+
+	@api.model
+	def _lookup(self, question, context, model_name=None, record_id=None, history=None):
+		"""
+		Find the cached answer of the question on the record context.
+
+		:param history: prompt messages of the conversation history. Follow-up
+			questions asked after earlier turns are neither looked up nor
+			stored, as their answer only holds within their conversation.
+
+		:return: tuple (answer or None, values to store the answer with)
+		"""
+		ttl = self._get_ttl()
+		if not ttl or (history and self._is_follow_up(question)):
+			return None, None
+		normalized = self._normalize_question(question)
+		context_hash = hashlib.sha256((context or "").encode()).hexdigest()
+		key = hashlib.sha256("\0".join([
+			str(PROMPT_VERSION), LLM_MODEL, normalized, context_hash,
+		]).encode()).hexdigest()
+		record_version = self._get_record_version(model_name, record_id)
+		cache_vals = {
+			"key": key,
+			"question": normalized,
+			"model_context": model_name or False,
+			"record_id": int(record_id) if record_id else False,
+			"record_write_date": record_version,
+		}
+		entry = self.sudo().search([("key", "=", key)], limit=1)
+		if entry and (
+			entry.create_date < fields.Datetime.now() - timedelta(hours=ttl)
+			or entry.record_write_date != record_version
+		):
+			entry.unlink()
+			entry = self.browse()
+		self.env["ai.response.cache.stats"]._record(hit=bool(entry))
+		if not entry:
+			return None, cache_vals
+		entry.write({
+			"hit_count": entry.hit_count + 1,
+			"last_hit": fields.Datetime.now(),
+		})
+		_logger.info(f"AI answer served from cache: entry {entry.id}")
+		return entry.answer, cache_vals
+
+	@api.model
+	def _store(self, cache_vals, answer):
+		if not cache_vals or not answer:
+			return
+		try:
+			# A concurrent request may have stored the same answer meanwhile
+			with self.env.cr.savepoint():
+				self.sudo().create(dict(cache_vals, answer=answer))
+		except psycopg2.IntegrityError:
+			pass
+
+	@api.model
+	def _cron_evict(self):
+		"""Drop the expired entries, then the least recently used ones over the limit"""
+		self.sudo().search([
+			("create_date", "<", fields.Datetime.now() - timedelta(hours=self._get_ttl())),
+		]).unlink()
+		max_entries = int(self.env["ir.config_parameter"].sudo().get_param("ai_assistant.cache_max_entries", 1000))
+		self.env.cr.execute("""
+			DELETE FROM ai_response_cache
+			 WHERE id IN (
+				SELECT id FROM ai_response_cache
+				 ORDER BY COALESCE(last_hit, create_date) DESC
+				OFFSET %s
+			 )
+		""", (max_entries,))
+		_logger.info(f"AI response cache eviction: {self.env.cr.rowcount} least recently used entries dropped")
+
+
+class AiResponseCacheStats(models.Model):
+	_name = "ai.response.cache.stats"
+	_description = "AI Response Cache Statistics"
+	_order = "date desc"
+
+	date = fields.Date(string="Date", required=True, readonly=True)
+	hits = fields.Integer(string="Hits", readonly=True)
+	misses = fields.Integer(string="Misses", readonly=True)
+	hit_rate = fields.Float(string="Hit Rate (%)", compute="_compute_hit_rate")
+
+	_sql_constraints = [
+		("date_uniq", "unique(date)", "There is a single statistics line per day."),
+	]
+
+	@api.depends("hits", "misses")
+	def _compute_hit_rate(self):
+		for stats in self:
+			total = stats.hits + stats.misses
+			stats.hit_rate = 100.0 * stats.hits / total if total else 0.0
+
+	@api.model
+	def _record(self, hit):
+		# On its own cursor: the row of the day is shared by all the requests,
+		# its lock must not be held until the end of a request waiting on the LLM
+		with self.env.registry.cursor() as cr:
+			cr.execute("""
+				INSERT INTO ai_response_cache_stats (date, hits, misses, create_uid, create_date, write_uid, write_date)
+				VALUES (CURRENT_DATE, %(hits)s, %(misses)s, %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC')
+				ON CONFLICT (date) DO UPDATE
+				   SET hits = ai_response_cache_stats.hits + EXCLUDED.hits,
+				       misses = ai_response_cache_stats.misses + EXCLUDED.misses,
+				       write_date = EXCLUDED.write_date
+			""", {"hits": int(hit), "misses": int(not hit), "uid": self.env.uid})
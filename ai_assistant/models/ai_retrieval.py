@@ -0,0 +1,313 @@
+from odoo import models, fields, api
+from odoo.tools import SQL, html2plaintext
+from datetime import timedelta
+import time
+import re
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Records indexed for the retrieval of the AI context, with their text fields
+RETRIEVAL_SOURCES = {
+	"crm.lead": ["partner_name", "contact_name", "email_from", "stage_id", "user_id", "description"],
+	"res.partner": ["email", "phone", "city", "country_id", "category_id", "comment"],
+	"sale.order": ["partner_id", "client_order_ref", "state", "amount_total", "note"],
+	"account.move": ["partner_id", "ref", "invoice_origin", "state", "payment_state", "amount_total", "narration"],
+	"dms.file": ["path_names", "tag_ids", "mimetype"],
+}
+# Records indexed per batch, and seconds an indexing run lasts before
+# handing over to a new one
+INDEX_BATCH_SIZE = 500
+INDEX_RUN_BUDGET = 240
+# Records written by transactions still running when the index was last
+# updated have an older write date, so each run starts that much earlier
+INDEX_OVERLAP = timedelta(minutes=10)
+# Characters of text kept per record
+DOCUMENT_MAX_CHARS = 1000
+# Records matching the question that are ranked, at most: frequent terms
+# match a large part of the index, which would all be read for ranking
+RETRIEVAL_MAX_CANDIDATES = 500
+# Snowball dictionaries of PostgreSQL for the installed languages, used for
+# dropping the stopwords of the questions and stemming their words
+STEMMING_DICTIONARIES = {
+	"da": "danish_stem", "de": "german_stem", "en": "english_stem",
+	"es": "spanish_stem", "fi": "finnish_stem", "fr": "french_stem",
+	"hu": "hungarian_stem", "it": "italian_stem", "nb": "norwegian_stem",
+	"nl": "dutch_stem", "pt": "portuguese_stem", "ro": "romanian_stem",
+	"ru": "russian_stem", "sv": "swedish_stem", "tr": "turkish_stem",
+}
+
+
+class AiRetrievalDocument(models.Model):
+	"""
+	Full text index over the business records, used to add the records
+	related to a question to the AI context. The index is a PostgreSQL
+	tsvector column with a GIN index, so that retrieval stays a single
+	indexed query whatever the number of records, and needs no external
+	service. It is updated incrementally from the write dates of the records.
+	"""
+	_name = "ai.retrieval.document"
+	_description = "AI Retrieval Document"
+
+	res_model = fields.Char(string="Model", required=True, readonly=True)
+	res_id = fields.Integer(string="Record ID", required=True, readonly=True)
+	title = fields.Char(string="Title", readonly=True)
+	content = fields.Text(string="Content", readonly=True)
+	source_write_date = fields.Datetime(string="Record Version", readonly=True)
+
+	_sql_constraints = [
+		("record_uniq", "unique(res_model, res_id)", "A record is indexed once."),
+	]
+
+	def init(self):
+		# 'simple' configuration: tenants mix languages, words are kept as is
+		self.env.cr.execute("""
+			ALTER TABLE ai_retrieval_document
+			ADD COLUMN IF NOT EXISTS tsv tsvector
+			GENERATED ALWAYS AS (
+				setweight(to_tsvector('simple', COALESCE(title, '')), 'A')
+				|| setweight(to_tsvector('simple', COALESCE(content, '')), 'B')
+			) STORED
+		""")
+		self.env.cr.execute("""
+			CREATE INDEX IF NOT EXISTS ai_retrieval_document_tsv_index
+			ON ai_retrieval_document USING GIN (tsv)
+		""")
+		self.env.cr.execute("""
+			CREATE INDEX IF NOT EXISTS ai_retrieval_document_version_index
+			ON ai_retrieval_document (res_model, source_write_date, res_id)
+		""")
+
+	# ─── Indexing ────────────────────────────────────────────────────────
+
+	@api.model
+	def _cron_update_index(self):
+		deadline = time.monotonic() + INDEX_RUN_BUDGET
+		for model_name in RETRIEVAL_SOURCES:
+			if model_name not in self.env:
+				continue
+			since = self._get_index_start(model_name)
+			while time.monotonic() < deadline:
+				has_more = self._index_next_batch(model_name, since)
+				self.env.cr.commit()
+				if not has_more:
+					break
+			else:
+				# Continue with the records left over in a new run
+				self.env.ref("ai_assistant.cron_ai_retrieval_index")._trigger()
+				return
+
+	@api.model
+	def _get_index_start(self, model_name):
+		"""Write date from which the records of the model are checked, if any"""
+		self.env.cr.execute("""
+			SELECT MAX(source_write_date) FROM ai_retrieval_document
+			 WHERE res_model = %s
+		""", (model_name,))
+		last_write_date = self.env.cr.fetchone()[0]
+		return last_write_date - INDEX_OVERLAP if last_write_date else None
+
+	@api.model
+	def _index_next_batch(self, model_name, since):
+		"""Index the next records of the model written since the given date
+		whose indexed version is outdated, in the order of their write date.
+		The records indexed are not selected again, so that a run continuing
+		the previous one never goes through the same records.
+
+		:return: whether there may be more records to index
+		"""
+		model = self.env[model_name].sudo().with_context(active_test=False)
+		model.flush_model(["write_date"])
+		self.env.cr.execute(SQL("""
+			SELECT record.id
+			  FROM %(table)s record
+			  LEFT JOIN ai_retrieval_document doc
+			    ON doc.res_model = %(model)s AND doc.res_id = record.id
+			 WHERE %(since)s
+			   AND doc.source_write_date IS DISTINCT FROM record.write_date
+			 ORDER BY record.write_date, record.id
+			 LIMIT %(limit)s
+		""",
+			table=SQL.identifier(model._table),
+			model=model_name,
+			since=SQL("record.write_date >= %s", since) if since else SQL("TRUE"),
+			limit=INDEX_BATCH_SIZE,
+		))
+		ids = [row[0] for row in self.env.cr.fetchall()]
+		if not ids:
+			return False
+		self._index_records(model.browse(ids))
+		return len(ids) == INDEX_BATCH_SIZE
+
+	@api.model
+	def _index_records(self, records):
+		field_names = [name for name in RETRIEVAL_SOURCES[records._name] if name in records._fields]
+		params = []
+		for record in records:
+			lines = []
+			for name in field_names:
+				value = self._get_field_text(record, name)
+				if value:
+					lines.append(f"{record._fields[name].string}: {value}")
+			params.append((
+				records._name, record.id, record.display_name or "",
+				"\n".join(lines)[:DOCUMENT_MAX_CHARS], record.write_date, self.env.uid, self.env.uid,
+			))
+		self.env.cr.executemany("""
+			INSERT INTO ai_retrieval_document
+				(res_model, res_id, title, content, source_write_date, create_uid, create_date, write_uid, write_date)
+			VALUES (%s, %s, %s, %s, %s, %s, NOW() AT TIME ZONE 'UTC', %s, NOW() AT TIME ZONE 'UTC')
+			ON CONFLICT (res_model, res_id) DO UPDATE
+			   SET title = EXCLUDED.title,
+			       content = EXCLUDED.content,
+			       source_write_date = EXCLUDED.source_write_date,
+			       write_date = EXCLUDED.write_date
+		""", params)
+
+	@api.model
+	def _get_field_text(self, record, name):
+		field = record._fields[name]
+		value = record[name]
+		if field.type in ("many2one", "many2many", "one2many"):
+			return ", ".join(value.mapped("display_name"))
+		if field.type == "selection":
+			return dict(field._description_selection(self.env)).get(value) or ""
+		if field.type == "html":
+			return html2plaintext(value or "").strip()
+		if field.type in ("float", "monetary", "integer"):
+			return str(value) if value else ""
+		return re.sub(r"\s+", " ", value or "").strip()
+
+	# ─── Retrieval ───────────────────────────────────────────────────────
+
+	@api.model
+	def _get_stemming_dictionaries(self):
+		"""Snowball dictionaries of the installed languages"""
+		dictionaries = {
+			STEMMING_DICTIONARIES[code.split("_")[0]]
+			for code, _name in self.env["res.lang"].get_installed()
+			if code.split("_")[0] in STEMMING_DICTIONARIES
+		}
+		return sorted(dictionaries) or ["english_stem"]
+
+	@api.model
+	def _get_query_terms(self, question):
+		"""Terms of the tsquery of the question: its words that are not a
+		stopword in any installed language, each one matching the words
+		starting with any of its stems, as the index keeps words as is.
+		"""
+		words = []
+		for word in re.findall(r"[^\W_]{3,}", (question or "").lower()):
+			if word not in words:
+				words.append(word)
+		if not words:
+			return []
+		self.env.cr.execute("""
+			SELECT word, array_agg(DISTINCT lexeme), bool_or(stopword)
+			  FROM (
+				SELECT word, lexemes[1] AS lexeme, lexemes = '{}' AS stopword
+				  FROM unnest(%s::text[]) AS word,
+				       unnest(%s::text[]) AS dictionary,
+				       ts_lexize(dictionary::regdictionary, word) AS lexemes
+			  ) stems
+			 GROUP BY word
+		""", (words, self._get_stemming_dictionaries()))
+		stems = {word: (lexemes, stopword) for word, lexemes, stopword in self.env.cr.fetchall()}
+		terms = []
+		for word in words:
+			lexemes, stopword = stems.get(word, ([word], False))
+			if stopword:
+				continue
+			# Only words are kept, so that the terms are safe in a tsquery
+			lexemes = sorted({x for x in lexemes if x and re.fullmatch(r"[^\W_]+", x)} or {word})
+			terms.append("(" + " | ".join(f"{x}:*" for x in lexemes) + ")")
+		return terms[:12]
+
+	@api.model
+	def _match_documents(self, query, limit, exclude_ids=()):
+		"""Best ranked documents matching the tsquery, among the first
+		`RETRIEVAL_MAX_CANDIDATES` found by the GIN index.
+
+		:return: list of (id, res_model, res_id, content)
+		"""
+		self.env.cr.execute("""
+			SELECT id, res_model, res_id, content
+			  FROM (
+				SELECT id, res_model, res_id, content, tsv
+				  FROM ai_retrieval_document
+				 WHERE tsv @@ to_tsquery('simple', %(query)s)
+				   AND id != ALL(%(exclude_ids)s::int[])
+				 LIMIT %(candidates)s
+			  ) candidate, to_tsquery('simple', %(query)s) query
+			 ORDER BY ts_rank_cd(tsv, query) DESC, id
+			 LIMIT %(limit)s
+		""", {
+			"query": query,
+			"exclude_ids": list(exclude_ids),
+			"candidates": RETRIEVAL_MAX_CANDIDATES,
+			"limit": limit,
+		})
+		return self.env.cr.fetchall()
+
+	@api.model
+	def _retrieve(self, question, limit=5, exclude=None):
+		"""
+		Records the most related to the question that the current user can
+		read, best first. The records matching all the terms come first, then
+		the ones matching any of them, each ranked among a bounded number of
+		candidates.
+
+		:param exclude: (model, id) of a record to leave out
+		:return: list of (record, content)
+		"""
+		terms = self._get_query_terms(question)
+		if not terms:
+			return []
+		# Extra rows make up for the records the user can't read
+		size = limit * 3
+		rows = self._match_documents(" & ".join(terms), size)
+		if len(rows) < size and len(terms) > 1:
+			rows += self._match_documents(" | ".join(terms), size - len(rows), [row[0] for row in rows])
+		rows = [(res_model, res_id, content) for _id, res_model, res_id, content in rows]
+		ids_by_model = {}
+		for res_model, res_id, content in rows:
+			if (res_model, res_id) != exclude:
+				ids_by_model.setdefault(res_model, []).append(res_id)
+
+		readable = {}
+		for res_model, ids in ids_by_model.items():
+			if res_model not in self.env:
+				continue
+			model = self.env[res_model]
+			if not model.check_access_rights("read", raise_exception=False):
+				continue
+			records = model.search([("id", "in", ids)])
+			readable.update({(res_model, record.id): record for record in records})
+			# Forget the records deleted since they were indexed
+			gone = set(ids) - set(model.sudo().with_context(active_test=False).browse(ids).exists().ids)
+			if gone:
+				self.env.cr.execute(
+					"DELETE FROM ai_retrieval_document WHERE res_model = %s AND res_id = ANY(%s)",
+					(res_model, list(gone)),
+				)
+		results = [
+			(readable[(res_model, res_id)], content)
+			for res_model, res_id, content in rows
+			if (res_model, res_id) in readable
+		]
+		return results[:limit]
+
+	@api.model
+	def _get_context(self, question, max_tokens, exclude=None):
+		"""Text of the records related to the question, within the token budget"""
+		budget = max_tokens * 4  # about 4 characters per token
+		blocks = []
+		for record, content in self._retrieve(question, exclude=exclude):
+			block = f"[{record._description}] {record.display_name}\n{content}"
+			if len(block) > budget:
+				break
+			blocks.append(block)
+			budget -= len(block)
+		if not blocks:
+			return ""
+		return "=== RELATED RECORDS ===\n" + "\n\n".join(blocks)
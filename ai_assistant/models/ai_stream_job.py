@@ -0,0 +1,195 @@
+from odoo import models, fields, api, SUPERUSER_ID
+from odoo.modules.registry import Registry
+from odoo.tools import config
+from .ai_assistant import STREAM_INTERRUPTED_ANSWER
+from datetime import datetime, timedelta
+from psycopg2 import errors
+import threading
+import logging
+import time
+import uuid
+
+_logger = logging.getLogger(__name__)
+
+# Advisory lock class of the jobs being streamed, held by their worker
+STREAM_JOB_LOCK_KEY = 0x0A15EA11
+# Time a cron run keeps taking new jobs, at most
+STREAM_RUN_BUDGET = 300
+
+
+class AiStreamJob(models.Model):
+	"""
+	Answer to stream, run by the cron workers: unlike the HTTP workers, they
+	aren't recycled while they handle a job, and the jobs of a worker that
+	died anyway still get their final notification, so that their user is
+	never left waiting.
+	"""
+	_name = "ai.stream.job"
+	_description = "AI Streamed Answer"
+	_order = "id"
+
+	assistant_id = fields.Many2one("ai.assistant", string="Assistant", required=True, readonly=True,
+								   ondelete="cascade")
+	user_id = fields.Many2one("res.users", string="User", required=True, readonly=True, ondelete="cascade")
+	stream_id = fields.Char(string="Stream", required=True, readonly=True, index=True)
+	request = fields.Json(string="Request", readonly=True,
+						  help="LLM request, without its headers holding the API key")
+	message_vals = fields.Json(string="Message Values", readonly=True)
+	state = fields.Selection([
+		("pending", "Pending"),
+		("running", "Running"),
+		("done", "Done"),
+		("failed", "Failed"),
+	], string="Status", default="pending", required=True, readonly=True, index=True)
+
+	@api.model
+	def _enqueue(self, assistant, llm_request, message_vals):
+		"""Queue the stream of the answer and wake a worker up"""
+		job = self.sudo().create({
+			"assistant_id": assistant.id,
+			"user_id": self.env.uid,
+			"stream_id": uuid.uuid4().hex,
+			"request": self._to_json({key: value for key, value in llm_request.items() if key != "headers"}),
+			"message_vals": self._to_json(message_vals),
+		})
+		self.env.ref("ai_assistant.cron_ai_stream_jobs").sudo()._trigger()
+		return job
+
+	@api.model
+	def _to_json(self, value):
+		"""The value with its dates as strings, to store it in a Json field"""
+		if isinstance(value, dict):
+			return {key: self._to_json(item) for key, item in value.items()}
+		if isinstance(value, (list, tuple)):
+			return [self._to_json(item) for item in value]
+		if isinstance(value, datetime):
+			return fields.Datetime.to_string(value)
+		return value
+
+	def _run(self):
+		"""Stream the answer as the user of the job, without committing"""
+		self.ensure_one()
+		assistant = self.assistant_id.with_user(self.user_id)
+		assistant._stream_external_llm(self.stream_id, dict(self.request), dict(self.message_vals or {}))
+		self.write({"state": "done"})
+
+	# ─── Workers ─────────────────────────────────────────────────────────
+
+	@api.model
+	def _get_worker_count(self):
+		return int(self.env["ir.config_parameter"].sudo().get_param("ai_assistant.stream_workers", 4))
+
+	@api.model
+	def _get_run_budget(self):
+		"""Seconds a cron run keeps taking new jobs: half the time limit of
+		the cron workers at most, so that it is done before the watchdog
+		kills it"""
+		limit = config["limit_time_real_cron"]
+		if limit is None or limit < 0:
+			limit = config["limit_time_real"]
+		return min(STREAM_RUN_BUDGET, limit / 2) if limit and limit > 0 else STREAM_RUN_BUDGET
+
+	@api.model
+	def _cron_run_jobs(self):
+		"""
+		Stream the queued answers with at most `ai_assistant.stream_workers`
+		threads, each one with its own cursor and taking jobs until the queue
+		is empty or the run budget is spent.
+		"""
+		self.search([("state", "=", "running")])._fail_dead()
+		self.env.cr.commit()
+		deadline = time.monotonic() + self._get_run_budget()
+		workers = [
+			threading.Thread(target=self._worker, args=(self.env.cr.dbname, deadline), daemon=True)
+			for _i in range(max(self._get_worker_count(), 1))
+		]
+		for worker in workers:
+			worker.start()
+		for worker in workers:
+			worker.join()
+		if self.search_count([("state", "=", "pending")], limit=1):
+			self.env.ref("ai_assistant.cron_ai_stream_jobs")._trigger()
+
+	@api.model
+	def _worker(self, db_name, deadline):
+		try:
+			with Registry(db_name).cursor() as cr:
+				env = api.Environment(cr, SUPERUSER_ID, {})
+				while time.monotonic() < deadline:
+					job = env["ai.stream.job"]._acquire()
+					if not job:
+						break
+					job._process()
+		except Exception:
+			_logger.exception("AI stream worker failed")
+
+	@api.model
+	def _acquire(self):
+		"""Take the next pending job, locked until it is processed"""
+		cr = self.env.cr
+		cr.execute("""
+			SELECT id FROM ai_stream_job
+			 WHERE state = 'pending'
+			 ORDER BY id
+			 LIMIT 1
+			   FOR UPDATE SKIP LOCKED
+		""")
+		row = cr.fetchone()
+		job = self.browse(row[0]) if row else self.browse()
+		if job:
+			# Held across the commits until the job is processed, and released
+			# by the database if the worker dies
+			cr.execute("SELECT pg_advisory_lock(%s, %s)", (STREAM_JOB_LOCK_KEY, job.id))
+			job.write({"state": "running"})
+		cr.commit()
+		return job
+
+	def _process(self):
+		self.ensure_one()
+		cr = self.env.cr
+		try:
+			self._run()
+			cr.commit()
+		except Exception:
+			_logger.exception(f"AI stream {self.stream_id} failed")
+			cr.rollback()
+			self._fail()
+			cr.commit()
+		finally:
+			cr.rollback()
+			cr.execute("SELECT pg_advisory_unlock(%s, %s)", (STREAM_JOB_LOCK_KEY, self.id))
+			cr.commit()
+
+	def _fail(self):
+		"""End the streams with an error, sent when the transaction commits"""
+		for job in self:
+			job.write({"state": "failed"})
+			job.assistant_id.with_user(job.user_id)._send_stream_notification(job.stream_id, {
+				"done": True,
+				"success": False,
+				"answer": STREAM_INTERRUPTED_ANSWER,
+			})
+
+	def _fail_dead(self):
+		"""End the running jobs whose worker died. Their stream is not started
+		again, as part of it may have already been sent."""
+		for job in self.sudo().filtered(lambda j: j.state == "running"):
+			try:
+				with self.env.cr.savepoint():
+					# Only granted when no worker holds the lock of the job
+					self.env.cr.execute("SELECT pg_try_advisory_xact_lock(%s, %s)", (STREAM_JOB_LOCK_KEY, job.id))
+					if not self.env.cr.fetchone()[0]:
+						continue
+					_logger.warning(f"Worker streaming AI answer {job.stream_id} died")
+					job._fail()
+			except errors.SerializationFailure:
+				# Its worker just finished it
+				continue
+
+	@api.autovacuum
+	def _gc_jobs(self):
+		"""Drop the jobs ended for a day, with the prompts they hold"""
+		self.sudo().search([
+			("state", "in", ("done", "failed")),
+			("write_date", "<", fields.Datetime.now() - timedelta(days=1)),
+		]).unlink()
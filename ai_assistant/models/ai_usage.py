@@ -0,0 +1,54 @@
+from odoo import models, fields, api
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class AiUsage(models.Model):
+	"""
+	AI messages consumed, one row per user and day incremented in place, so
+	that concurrent requests never lose a message and only contend with the
+	other requests of the same user. The credits used by the database are the
+	sum of all the rows, which the SaaS Manager reads with a single query.
+	"""
+	_name = "ai.usage"
+	_description = "AI Usage"
+	_order = "date desc, user_id"
+
+	user_id = fields.Many2one("res.users", string="User", readonly=True, ondelete="set null",
+							  help="Empty for the messages counted before the usage was kept per user")
+	date = fields.Date(string="Date", required=True, readonly=True)
+	messages = fields.Integer(string="Messages", readonly=True)
+
+	def init(self):
+		# NULLS NOT DISTINCT is only available from PostgreSQL 15
+		self.env.cr.execute("""
+			CREATE UNIQUE INDEX IF NOT EXISTS ai_usage_user_date_uniq
+			ON ai_usage (COALESCE(user_id, 0), date)
+		""")
+		# Take over the count kept in the system parameters before
+		self.env.cr.execute("SELECT 1 FROM ai_usage LIMIT 1")
+		if not self.env.cr.fetchone():
+			count = self.env["ir.config_parameter"].sudo().get_param("ai_assistant.message_count", "0")
+			try:
+				count = int(count)
+			except ValueError:
+				count = 0
+			if count:
+				self._record(False, count)
+
+	@api.model
+	def _record(self, user_id, messages=1):
+		self.env.cr.execute("""
+			INSERT INTO ai_usage (user_id, date, messages, create_uid, create_date, write_uid, write_date)
+			VALUES (%(user_id)s, CURRENT_DATE, %(messages)s, %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC')
+			ON CONFLICT (COALESCE(user_id, 0), date) DO UPDATE
+			   SET messages = ai_usage.messages + EXCLUDED.messages,
+			       write_date = EXCLUDED.write_date
+		""", {"user_id": user_id or None, "messages": messages, "uid": self.env.uid})
+
+	@api.model
+	def _get_total(self):
+		"""Messages consumed by the database since the beginning"""
+		self.env.cr.execute("SELECT COALESCE(SUM(messages), 0) FROM ai_usage")
+		return self.env.cr.fetchone()[0]
@@ -0,0 +1 @@
+from . import llm_client
@@ -0,0 +1,138 @@
+"""
+Per-process HTTP client of the LLM endpoints.
+
+Each endpoint gets a requests session, whose keep-alive connections are
+reused by the following calls instead of doing a new TLS handshake per
+question. Calls answered with 429 or 5xx are retried with exponential
+backoff, honouring Retry-After, and a circuit breaker makes the calls fail
+at once while the endpoint keeps failing, instead of holding a worker for
+the whole timeout of each call.
+"""
+
+from requests.adapters import HTTPAdapter
+import email.utils
+import threading
+import requests
+import random
+import time
+import os
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Connections kept open per endpoint and process
+POOL_SIZE = 10
+# (connect, read) timeouts, in seconds
+TIMEOUT = (5, 30)
+# Retries of the calls answered with one of these status codes
+MAX_RETRIES = 2
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_BACKOFF = 1.0
+# Longest Retry-After waited for, longer ones are returned to the caller
+MAX_RETRY_DELAY = 10
+# Consecutive failed calls opening the circuit, and seconds it stays open
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 30
+
+
+class LLMServiceUnavailable(Exception):
+    """The circuit of the endpoint is open, calls fail without being made"""
+
+
+class LLMClient:
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def post(self, headers, payload, stream=False):
+        """
+        POST the payload to the endpoint, retrying throttled and failed calls.
+
+        :return: the response of the last attempt, whatever its status
+        :raise LLMServiceUnavailable: if the circuit is open
+        """
+        self._before_call()
+        success = False
+        try:
+            attempt = 0
+            while True:
+                response = self.session.post(self.endpoint, headers=headers, json=payload,
+                                             stream=stream, timeout=TIMEOUT)
+                if response.status_code not in RETRY_STATUSES or attempt >= MAX_RETRIES:
+                    break
+                delay = self._get_retry_delay(response, attempt)
+                if delay > MAX_RETRY_DELAY:
+                    break
+                _logger.info("LLM endpoint answered %s, retrying in %.1fs", response.status_code, delay)
+                response.close()
+                time.sleep(delay)
+                attempt += 1
+            # Throttling is the quota of the account, not an outage of the service
+            success = response.status_code < 500
+            return response
+        finally:
+            # Whatever the exception, the trial call is over
+            self._after_call(success)
+
+    def _get_retry_delay(self, response, attempt):
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            if retry_after.isdigit():
+                return int(retry_after)
+            try:
+                date = email.utils.parsedate_to_datetime(retry_after)
+                return max(date.timestamp() - time.time(), 0)
+            except (TypeError, ValueError):
+                pass
+        return RETRY_BACKOFF * 2 ** attempt + random.uniform(0, RETRY_BACKOFF)
+
+    # ─── Circuit breaker ─────────────────────────────────────────────────
+
+    def _before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            # Once the reset timeout is over, a single trial call goes through
+            if time.monotonic() - self._opened_at < CIRCUIT_RESET_TIMEOUT or self._trial_running:
+                raise LLMServiceUnavailable(self.endpoint)
+            self._trial_running = True
+
+    def _after_call(self, success):
+        with self._lock:
+            self._trial_running = False
+            if success:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            if self._failures >= CIRCUIT_FAILURE_THRESHOLD:
+                if self._opened_at is None:
+                    _logger.warning("LLM endpoint %s keeps failing, calls are suspended for %ss",
+                                    self.endpoint, CIRCUIT_RESET_TIMEOUT)
+                self._opened_at = time.monotonic()
+
+
+_clients = {}
+_clients_pid = None
+_clients_lock = threading.Lock()
+
+
+def get_client(endpoint):
+    """Client of the endpoint for the current process"""
+    global _clients_pid
+    with _clients_lock:
+        # Connections inherited from a parent process are not shared
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            _clients_pid = os.getpid()
+        if endpoint not in _clients:
+            _clients[endpoint] = LLMClient(endpoint)
+        return _clients[endpoint]
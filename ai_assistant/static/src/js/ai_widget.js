@@ -18,6 +18,7 @@ export class AiAssistantWidget extends Component {
 			messages: [],
 			inputText: "",
 			isLoading: false,
+			isStreaming: false,
 			unreadCount: 0,
 			currentContext: null,
 			isConfigured: false,
@@ -28,6 +29,11 @@ export class AiAssistantWidget extends Component {
 		// Get System services
 		this.actionService = useService("action");
 		this.notificationService = useService("notification");
+		this.busService = useService("bus_service");
+		
+		// Answers are streamed through the bus, by stream id
+		this.streams = {};
+		this.busService.subscribe("ai_assistant/stream", (payload) => this._onStreamNotification(payload));
 		
 		// Load previous messages
 		this._loadMessagesFromStorage();
@@ -182,15 +188,15 @@ export class AiAssistantWidget extends Component {
 			// Get current context
 			const context = this.state.currentContext;
 			
-			// Call AI endpoint
-			const response = await rpc("/ai/ask", {
+			// Call AI endpoint, which streams the answer through the bus
+			const response = await rpc("/ai/ask_stream", {
 				question: question,
 				active_model: context ? context.model : null,
 				active_id: context ? context.id : null,
 			});
 			
-			if (response.success) {
-				// Add AI response
+			if (response.success && !response.stream_id) {
+				// Answer served from the cache
 				this.state.messages.push({
 					text: response.answer,
 					sender: "ai",
@@ -202,6 +208,24 @@ export class AiAssistantWidget extends Component {
 					"🤖 AI response received",
 					{ type: "success" }
 				);
+			} else if (response.success) {
+				const stream = this._getStream(response.stream_id);
+				stream.isWaited = true;
+				if (stream.text) {
+					this._showStreamMessage(stream);
+				}
+				const result = await this._waitForStream(stream);
+				delete this.streams[response.stream_id];
+				
+				// Final answer, or the error the stream ended with
+				this._showStreamMessage(stream);
+				stream.message.text = result.answer || "❌ Sorry, I encountered an error.";
+				stream.message.isError = !result.success;
+				
+				this.notificationService.add(
+					result.success ? "🤖 AI response received" : (result.answer || "AI Error"),
+					{ type: result.success ? "success" : "danger" }
+				);
 			} else {
 				// Show error
 				this.state.messages.push({
@@ -234,6 +258,7 @@ export class AiAssistantWidget extends Component {
 			);
 		} finally {
 			this.state.isLoading = false;
+			this.state.isStreaming = false;
 			
 			// Save messages
 			this._saveMessagesToStorage();
@@ -248,6 +273,56 @@ export class AiAssistantWidget extends Component {
 		}
 	}
 	
+	_getStream(streamId) {
+		if (!this.streams[streamId]) {
+			const stream = { text: "", message: null, isWaited: false };
+			stream.done = new Promise((resolve) => (stream.resolve = resolve));
+			this.streams[streamId] = stream;
+		}
+		return this.streams[streamId];
+	}
+	
+	_onStreamNotification(payload) {
+		const stream = this._getStream(payload.stream_id);
+		if (payload.delta) {
+			stream.text += payload.delta;
+			if (stream.isWaited) {
+				this._showStreamMessage(stream);
+				stream.message.text = stream.text;
+				this._scrollToBottom();
+			}
+		}
+		if (payload.done) {
+			stream.resolve(payload);
+			// Streams of the other tabs of the user are never waited for
+			if (!stream.isWaited) {
+				setTimeout(() => delete this.streams[payload.stream_id], 60000);
+			}
+		}
+	}
+	
+	_showStreamMessage(stream) {
+		// The AI message replaces the loading indicator once text arrives
+		if (!stream.message) {
+			this.state.messages.push({
+				text: stream.text,
+				sender: "ai",
+				timestamp: new Date(),
+				id: `ai_${Date.now()}`,
+			});
+			stream.message = this.state.messages[this.state.messages.length - 1];
+			this.state.isStreaming = true;
+		}
+	}
+	
+	_waitForStream(stream) {
+		const timeout = new Promise((resolve) => setTimeout(() => resolve({
+			success: false,
+			answer: "⏱️ Timeout Error: The AI service took too long to respond.",
+		}), 120000));
+		return Promise.race([stream.done, timeout]);
+	}
+	
 	handleKeyPress(ev) {
 		if (ev.key === "Enter" && !ev.shiftKey) {
 			ev.preventDefault();
@@ -0,0 +1,106 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import threading
+import json
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+from ..models.ai_assistant import STREAM_INTERRUPTED_ANSWER, STREAM_NOTIFICATION
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Chat completions endpoint streaming a fixed answer as server-sent
+    events, or refusing the API key on /unauthorized"""
+
+    chunks = ["Hola", ", ", "mundo"]
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append((dict(self.headers), json.loads(body)))
+        if self.path == "/unauthorized":
+            self.send_response(401)
+            self.end_headers()
+            self.wfile.write(b'{"error": "invalid key"}')
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for chunk in self.chunks:
+            data = {"choices": [{"delta": {"content": chunk}}]}
+            self.wfile.write(f"data: {json.dumps(data)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@tagged("post_install", "-at_install")
+class TestAiStream(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = HTTPServer(("127.0.0.1", 0), StubLLMHandler)
+        cls.server.requests = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}"
+        params = cls.env["ir.config_parameter"].sudo()
+        params.set_param("ai_assistant.api_key", "test-key")
+        params.set_param("ai_assistant.endpoint", f"{cls.url}/v1/chat/completions")
+        params.set_param("ai_assistant.message_limit", "100")
+        cls.assistant = cls.env["ai.assistant"].create({"name": "Stream test"})
+
+    def _start_stream(self, question):
+        llm_request = self.assistant._prepare_llm_request(question)
+        stream_id = self.assistant._start_llm_stream(llm_request, {
+            "question": question,
+            "timestamp": fields.Datetime.now(),
+        })
+        return self.env["ai.stream.job"].search([("stream_id", "=", stream_id)])
+
+    def _get_final_notification(self, stream_id):
+        for notification in self.env["bus.bus"].search([], order="id desc"):
+            message = json.loads(notification.message)
+            payload = message["payload"]
+            if message["type"] == STREAM_NOTIFICATION and payload.get("stream_id") == stream_id \
+                    and payload.get("done"):
+                return payload
+        return None
+
+    def test_stream_answer(self):
+        job = self._start_stream("¿Qué tal?")
+        self.assertEqual(job.state, "pending")
+        # The API key is read again when streaming, it isn't stored
+        self.assertNotIn("headers", job.request)
+        job._run()
+        self.assertEqual(job.state, "done")
+        headers, payload = self.server.requests[-1]
+        self.assertEqual(headers["Authorization"], "Bearer test-key")
+        self.assertTrue(payload["stream"])
+        self.assertEqual(payload["messages"][-1]["content"], "¿Qué tal?")
+        message = self.assistant.message_ids
+        self.assertEqual(message.answer, "Hola, mundo")
+        notification = self._get_final_notification(job.stream_id)
+        self.assertTrue(notification["success"])
+        self.assertEqual(notification["answer"], "Hola, mundo")
+        self.assertEqual(notification["message_id"], message.id)
+
+    def test_stream_error(self):
+        job = self._start_stream("¿Qué tal?")
+        job.request = dict(job.request, endpoint=f"{self.url}/unauthorized")
+        job._run()
+        self.assertFalse(self.assistant.message_ids)
+        notification = self._get_final_notification(job.stream_id)
+        self.assertFalse(notification["success"])
+        self.assertIn("Authentication Error", notification["answer"])
+
+    def test_stream_dead_worker(self):
+        job = self._start_stream("¿Qué tal?")
+        # Running, but no worker holds its lock
+        job.state = "running"
+        job._fail_dead()
+        self.assertEqual(job.state, "failed")
+        notification = self._get_final_notification(job.stream_id)
+        self.assertFalse(notification["success"])
+        self.assertEqual(notification["answer"], STREAM_INTERRUPTED_ANSWER)
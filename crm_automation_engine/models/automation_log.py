@@ -2,12 +2,16 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.tools import split_every
 from datetime import date, timedelta
 import calendar
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Inactive clients whose alerts are created and committed together
+INACTIVE_CLIENT_CHUNK_SIZE = 500
+
 
 class AutomationLog(models.Model):
     """
@@ -81,7 +85,25 @@ class AutomationLog(models.Model):
         Convenience method called from base.automation code blocks.
         Creates an audit log record.
         """
-        vals = {
+        vals = self._prepare_log_vals(
+            name, automation_type, trigger_event,
+            model_name=model_name, record_id=record_id,
+            action_taken=action_taken, result=result,
+            error_message=error_message, company_id=company_id,
+        )
+        try:
+            return self.sudo().create(vals)
+        except Exception as e:
+            _logger.error('Failed to write automation log: %s', str(e))
+            return self.browse()  # Return empty recordset on failure
+
+    @api.model
+    def _prepare_log_vals(self, name, automation_type, trigger_event,
+                          model_name=False, record_id=False,
+                          action_taken='', result='success',
+                          error_message=False, company_id=False):
+        """Values of a log record, to create several logs at once."""
+        return {
             'name': name,
             'automation_type': automation_type,
             'trigger_event': trigger_event,
@@ -92,11 +114,6 @@ class AutomationLog(models.Model):
             'error_message': error_message or '',
             'company_id': company_id or self.env.company.id,
         }
-        try:
-            return self.sudo().create(vals)
-        except Exception as e:
-            _logger.error('Failed to write automation log: %s', str(e))
-            return self.browse()  # Return empty recordset on failure
 
     # ─── CRON: Client Inactive X Days ───
     @api.model
@@ -104,77 +121,106 @@ class AutomationLog(models.Model):
         """
         Daily cron that finds customers with no sale orders or invoices
         in the last X days and creates alert activities.
+        The inactive customers of a company are found with a single query,
+        and their activities and logs are created in chunks, each committed
+        on its own.
         """
         companies = self.env['res.company'].search([
             ('enable_client_inactive_alert', '=', True)
         ])
+        activity_type = self.env.ref('mail.mail_activity_data_todo', raise_if_not_found=False)
+        res_model_id = self.env['ir.model']._get_id('res.partner')
+        admin = self.env.ref('base.user_admin', raise_if_not_found=False)
         for company in companies:
             days = company.client_inactive_days or 30
-            cutoff_date = date.today() - timedelta(days=days)
-
-            # Find customers with no recent sale orders or invoices
-            partners = self.env['res.partner'].sudo().search([
-                ('customer_rank', '>', 0),
-                ('active', '=', True),
-                ('company_id', 'in', [company.id, False]),
-            ])
+            partner_rows = self._get_inactive_clients(company, date.today() - timedelta(days=days))
+            _logger.info('Client inactive alert: %s inactive clients (Company: %s)', len(partner_rows), company.name)
 
-            for partner in partners:
-                # Check for recent activity
-                recent_order = self.env['sale.order'].sudo().search([
-                    ('partner_id', '=', partner.id),
-                    ('date_order', '>=', cutoff_date),
-                    ('company_id', '=', company.id),
-                ], limit=1)
+            default_user_id = company.partner_id.user_id.id or (admin or self.env.user).id
+            for rows in split_every(INACTIVE_CLIENT_CHUNK_SIZE, partner_rows, list):
+                activity_vals = [{
+                    'res_model_id': res_model_id,
+                    'res_id': partner_id,
+                    'activity_type_id': activity_type.id if activity_type else False,
+                    'summary': _('Inactive client — no activity in %s days') % days,
+                    'note': _('This customer has had no sale orders or invoices in the last %s days. Consider reaching out.') % days,
+                    'user_id': user_id or default_user_id,
+                    'date_deadline': date.today() + timedelta(days=3),
+                } for partner_id, name, user_id in rows]
+                try:
+                    with self.env.cr.savepoint():
+                        self.env['mail.activity'].sudo().create(activity_vals)
+                        self.sudo().create([self._prepare_log_vals(
+                            name='Client Inactive Alert: %s' % name,
+                            automation_type='client',
+                            trigger_event='client_inactive',
+                            model_name='res.partner',
+                            record_id=partner_id,
+                            action_taken='Created follow-up activity for inactive client (%s days)' % days,
+                            company_id=company.id,
+                        ) for partner_id, name, user_id in rows])
+                except Exception as e:
+                    _logger.error('Client inactive alert failed for %s clients: %s', len(rows), str(e))
+                    self.sudo().create([self._prepare_log_vals(
+                        name='Client Inactive Alert Failed: %s' % name,
+                        automation_type='client',
+                        trigger_event='client_inactive',
+                        model_name='res.partner',
+                        record_id=partner_id,
+                        action_taken='Failed to create activity',
+                        result='fail',
+                        error_message=str(e),
+                        company_id=company.id,
+                    ) for partner_id, name, user_id in rows])
+                if not self.env.registry.in_test_mode():
+                    self.env.cr.commit()
 
-                recent_invoice = self.env['account.move'].sudo().search([
-                    ('partner_id', '=', partner.id),
-                    ('invoice_date', '>=', cutoff_date),
-                    ('move_type', '=', 'out_invoice'),
-                    ('company_id', '=', company.id),
-                ], limit=1)
-
-                if not recent_order and not recent_invoice:
-                    # Check if we already created an alert recently
-                    existing_activity = self.env['mail.activity'].sudo().search([
-                        ('res_model', '=', 'res.partner'),
-                        ('res_id', '=', partner.id),
-                        ('summary', 'ilike', 'Inactive client'),
-                        ('date_deadline', '>=', date.today() - timedelta(days=7)),
-                    ], limit=1)
+    @api.model
+    def _get_inactive_clients(self, company, cutoff_date):
+        """
+        Customers of the company with no sale order or customer invoice since
+        the cutoff date, and no inactive client alert in the last 7 days.
 
-                    if not existing_activity:
-                        try:
-                            # Create alert activity
-                            user_id = partner.user_id.id or company.partner_id.user_id.id or self.env.ref('base.user_admin').id
-                            partner.activity_schedule(
-                                'mail.mail_activity_data_todo',
-                                summary=_('Inactive client — no activity in %s days') % days,
-                                note=_('This customer has had no sale orders or invoices in the last %s days. Consider reaching out.') % days,
-                                user_id=user_id,
-                                date_deadline=date.today() + timedelta(days=3),
-                            )
-                            self.log_automation(
-                                name='Client Inactive Alert: %s' % partner.name,
-                                automation_type='client',
-                                trigger_event='client_inactive',
-                                model_name='res.partner',
-                                record_id=partner.id,
-                                action_taken='Created follow-up activity for inactive client (%s days)' % days,
-                                company_id=company.id,
-                            )
-                        except Exception as e:
-                            self.log_automation(
-                                name='Client Inactive Alert Failed: %s' % partner.name,
-                                automation_type='client',
-                                trigger_event='client_inactive',
-                                model_name='res.partner',
-                                record_id=partner.id,
-                                action_taken='Failed to create activity',
-                                result='fail',
-                                error_message=str(e),
-                                company_id=company.id,
-                            )
+        :return: list of (partner id, name, salesperson id)
+        """
+        self.env['res.partner'].flush_model(['customer_rank', 'active', 'company_id', 'name', 'user_id'])
+        self.env['sale.order'].flush_model(['partner_id', 'date_order', 'company_id'])
+        self.env['account.move'].flush_model(['partner_id', 'invoice_date', 'move_type', 'company_id'])
+        self.env['mail.activity'].flush_model(['res_model', 'res_id', 'summary', 'date_deadline'])
+        self.env.cr.execute("""
+            SELECT p.id, p.name, p.user_id
+              FROM res_partner p
+             WHERE p.customer_rank > 0
+               AND p.active
+               AND (p.company_id = %(company_id)s OR p.company_id IS NULL)
+               AND NOT EXISTS (
+                    SELECT 1 FROM sale_order so
+                     WHERE so.partner_id = p.id
+                       AND so.company_id = %(company_id)s
+                       AND so.date_order >= %(cutoff_date)s
+               )
+               AND NOT EXISTS (
+                    SELECT 1 FROM account_move am
+                     WHERE am.partner_id = p.id
+                       AND am.company_id = %(company_id)s
+                       AND am.move_type = 'out_invoice'
+                       AND am.invoice_date >= %(cutoff_date)s
+               )
+               AND NOT EXISTS (
+                    SELECT 1 FROM mail_activity a
+                     WHERE a.res_model = 'res.partner'
+                       AND a.res_id = p.id
+                       AND a.summary ILIKE %(summary)s
+                       AND a.date_deadline >= %(alert_date)s
+               )
+             ORDER BY p.id
+        """, {
+            'company_id': company.id,
+            'cutoff_date': cutoff_date,
+            'summary': '%Inactive client%',
+            'alert_date': date.today() - timedelta(days=7),
+        })
+        return self.env.cr.fetchall()
 
     # ─── CRON: Start of Month ───
     @api.model
@@ -2,6 +2,8 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 import base64
+import io
+import zipfile
 
 from odoo import fields
 from odoo.tests import common
@@ -101,6 +103,37 @@ class L10nEsAccountStatementImportN43(common.TransactionCase):
         self.assertEqual(statement_lines[1].ref, "/")
         self.assertEqual(statement_lines[0].ref, "5540014210128010")
 
+    def test_import_n43_zip(self):
+        n43_file_path = file_path("l10n_es_account_statement_import_n43/tests/test.n43")
+        zip_file = io.BytesIO()
+        with zipfile.ZipFile(zip_file, "w") as archive:
+            archive.write(n43_file_path, "test.n43")
+            archive.writestr("readme.txt", "Not a N43 file")
+        self.import_wizard.statement_file = base64.b64encode(zip_file.getvalue())
+        action = self.import_wizard.import_file_button()
+        self.assertTrue(action)
+        statement_lines = self.env["account.bank.statement.line"].search(
+            [("statement_id.journal_id", "=", self.journal.id)]
+        )
+        self.assertEqual(len(statement_lines), 3)
+
+    def test_parse_n43_streaming(self):
+        with open(
+            file_path("l10n_es_account_statement_import_n43/tests/test.n43"), "rb"
+        ) as n43_file:
+            data_file = n43_file.read()
+        lines = self.import_wizard._iter_n43_lines(data_file, "iso-8859-1")
+        n43s = self.import_wizard._parse(lines)
+        # Accounts are yielded while reading, not once the whole file is parsed
+        self.assertEqual(len(next(n43s)[0]["lines"]), 3)
+
+    def test_parse_n43_empty(self):
+        # A N43 file without accounts is still handled by this parser
+        data_file = b"88" + b"9" * 18 + b"000000" + b" " * 54 + b"\n"
+        self.assertTrue(self.import_wizard._check_n43(data_file))
+        self.assertFalse(self.import_wizard._check_n43(b"\n"))
+        self.assertEqual(list(self.import_wizard._parse_file(data_file)), [])
+
     def test_import_n43_fecha_oper(self):
         self.journal.n43_date_type = "fecha_oper"
         action = self.import_wizard.import_file_button()
@@ -109,3 +142,45 @@ class L10nEsAccountStatementImportN43(common.TransactionCase):
             [("statement_id.journal_id", "=", self.journal.id)]
         )
         self.assertEqual(statements[0].date, fields.Date.to_date("2016-05-26"))
+
+    def test_n43_partner_index(self):
+        index = self.import_wizard._get_n43_partner_index(self.env.company)
+        conceptos = {"01": ("Test partner N43", "Test partner N43")}
+        other_conceptos = {"01": ("", "TEST PÁRTNER N43")}
+        for search_method in ("caixabank", "santander", "sabadell"):
+            method = getattr(
+                self.import_wizard, f"_get_n43_partner_from_{search_method}"
+            )
+            self.assertEqual(method(conceptos, index=index), method(conceptos))
+        # The partners are loaded once, for the fields searched
+        self.assertEqual(set(index["partners"]), {"name", "vat"})
+        with self.assertQueryCount(0):
+            partner = self.import_wizard._get_n43_partner_from_sabadell(
+                other_conceptos, index=index
+            )
+        if self.env.registry.has_unaccent:
+            self.assertEqual(partner, self.partner)
+            self.assertEqual(
+                index["cache"][("name", "ilike", "TEST PÁRTNER N43")],
+                self.partner.id,
+            )
+
+    def test_n43_partner_index_first_match(self):
+        self.partner.vat = "ESA12345674"
+        index = self.import_wizard._get_n43_partner_index(self.env.company)
+        conceptos = {"01": ("Test partner N43", "ESA12345674")}
+        partner = self.import_wizard._get_n43_partner_from_santander(
+            conceptos, index=index
+        )
+        self.assertEqual(partner, self.partner)
+        # The name isn't looked up once the VAT matched
+        self.assertNotIn("name", index["partners"])
+
+    def test_n43_partner_index_company(self):
+        other_company = self.env["res.company"].create({"name": "Other N43"})
+        index = self.import_wizard._get_n43_partner_index(other_company)
+        conceptos = {"01": ("", "TEST PARTNER N43")}
+        # The partner of another company isn't matched
+        self.assertFalse(
+            self.import_wizard._get_n43_partner_from_sabadell(conceptos, index=index)
+        )
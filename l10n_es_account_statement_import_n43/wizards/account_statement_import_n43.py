@@ -2,10 +2,15 @@
 # Copyright 2021 Tecnativa - Carlos Roca
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+import io
 import logging
+import unicodedata
+import zipfile
+from bisect import bisect_right
 from datetime import datetime
 
 from odoo import api, exceptions, fields, models
+from odoo.tools import SQL
 
 _logger = logging.getLogger(__name__)
 
@@ -17,6 +22,11 @@ except ImportError:
         "from http://pypi.python.org/pypi/chardet"
     )
 
+# Bytes at the beginning of the file used for detecting its encoding
+N43_ENCODING_PREFIX_SIZE = 64 * 1024
+# Separator of the partner values in the text searched by the partner index
+N43_PARTNER_SEPARATOR = "\x00"
+
 account_mapping = {
     "01": "4300%00",
     "02": "4100%00",
@@ -198,16 +208,22 @@ class AccountStatementImport(models.TransientModel):
             )
         return st_data
 
-    def _parse(self, data_file):
-        # st_data will contain data read from the file
-        result = []
+    def _parse(self, lines):
+        """Parse the N43 records record by record, yielding the groups of
+        each account as soon as its final record is read.
+
+        :param lines: Iterable of the decoded lines of the file, or the whole
+          decoded file.
+        """
+        if isinstance(lines, str):
+            lines = lines.split("\n")
         st_data = {
             "_num_records": 0,  # Number of records really counted
             "groups": [],  # Info about each of the groups (account groups)
         }
         st_group = {}
         st_line = {}
-        for raw_line in data_file.split("\n"):
+        for raw_line in lines:
             if not raw_line.strip():
                 continue
             code = raw_line[0:2]
@@ -223,7 +239,7 @@ class AccountStatementImport(models.TransientModel):
                 self._process_record_24(st_line, raw_line)
             elif code == "33":
                 self._process_record_33(st_group, raw_line)
-                result.append(st_data["groups"])
+                yield st_data["groups"]
                 st_data["groups"] = []
                 st_group = {}
                 st_line = {}
@@ -241,29 +257,61 @@ class AccountStatementImport(models.TransientModel):
                 )
             # Update the record counter
             st_data["_num_records"] += 1
-        return result
 
     @api.model
     def _get_common_file_encodings(self):
         """Returns a list with commonly used encodings"""
         return ["iso-8859-1", "utf-8-sig"]
 
-    def _check_n43(self, data_file):
-        # We'll try to decode with the encoding detected by chardet first
-        # otherwise, we'll try with another common encodings until success
+    def _get_n43_encodings(self, data_file):
+        """Get the encodings to try for decoding the file, starting with the
+        one detected by chardet from its beginning."""
         encodings = self._get_common_file_encodings()
-        # Try to guess the encoding of the data file
-        detected_encoding = chardet.detect(data_file).get("encoding", False)
+        detected_encoding = chardet.detect(data_file[:N43_ENCODING_PREFIX_SIZE]).get(
+            "encoding", False
+        )
         if detected_encoding:
             encodings += [detected_encoding]
-        while encodings:
+        return encodings[::-1]
+
+    @api.model
+    def _iter_n43_lines(self, data_file, encoding):
+        """Decode the file line by line, without holding it decoded whole."""
+        stream = io.TextIOWrapper(
+            io.BytesIO(data_file), encoding=encoding, newline="\n"
+        )
+        for raw_line in stream:
+            yield raw_line.rstrip("\n")
+
+    def _check_n43(self, data_file):
+        """Find the first encoding the file decodes with and passes all the
+        checks of the N43 records with, reading it without keeping anything.
+
+        :return: The encoding, or False if it isn't a N43 file.
+        """
+        if not data_file.strip():
+            return False
+        for encoding in self._get_n43_encodings(data_file):
             try:
-                data_decoded = data_file.decode(encodings.pop())
-                return self._parse(data_decoded)
+                for _groups in self._parse(self._iter_n43_lines(data_file, encoding)):
+                    continue
+                return encoding
             except (UnicodeDecodeError, exceptions.ValidationError):
                 _logger.info("Something was wrong with encodings!")
         return False
 
+    @api.model
+    def _get_n43_files(self, data_file):
+        """Yield the contents of each file to import: the members of a zip
+        archive one by one, or the file itself."""
+        if not zipfile.is_zipfile(io.BytesIO(data_file)):
+            yield data_file
+            return
+        with zipfile.ZipFile(io.BytesIO(data_file)) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield archive.read(info)
+
     def _get_n43_ref(self, line):
         try:
             ref1 = int(line["referencia1"])
@@ -280,50 +328,146 @@ class AccountStatementImport(models.TransientModel):
         else:  # pragma: no cover
             return "{} / {}".format(line["referencia1"], line["referencia2"])
 
-    def _get_n43_partner_from_caixabank(self, conceptos):
+    def _get_n43_partner_index(self, company):
+        """Get the index of the partners looked up while importing a file, so
+        that each value is only searched once, and without a query.
+
+        :param company: Company of the journal, for only matching its
+          partners and the shared ones.
+        :return: Dictionary with the company, the partners of each field,
+          loaded by `_load_n43_partners` when first searched, and the results
+          already looked up.
+        """
+        return {"company": company, "partners": {}, "cache": {}}
+
+    def _normalize_n43_value(self, value):
+        """Lower the case and strip the accents of the value, the way the
+        `ilike` domain compares them."""
+        value = value.lower()
+        if not self.env.registry.has_unaccent:
+            return value
+        return "".join(
+            char
+            for char in unicodedata.normalize("NFKD", value)
+            if not unicodedata.combining(char)
+        )
+
+    def _load_n43_partners(self, index, field):
+        """Load the values of the field of the active partners of the company
+        and the shared ones, in the order a search returns them.
+
+        :return: Dictionary with the first partner of each value, for the `=`
+          operator, and for `ilike` the normalized values joined in a single
+          text with the position each one starts at and its partner, so that
+          the first partner containing a value is found with a single `find`.
+        """
+        if field in index["partners"]:
+            return index["partners"][field]
         partner_obj = self.env["res.partner"]
-        partner = partner_obj.browse()
+        partner_obj.flush_model(["active", "company_id", "complete_name", field])
+        company_ids = index["company"].parent_ids.ids or index["company"].ids
+        self.env.cr.execute(
+            SQL(
+                """
+                SELECT p.id, %s
+                FROM res_partner p
+                WHERE p.active
+                    AND (p.company_id IS NULL OR p.company_id = ANY(%s))
+                    AND %s IS NOT NULL
+                ORDER BY p.complete_name, p.id DESC
+                """,
+                SQL.identifier("p", field),
+                company_ids,
+                SQL.identifier("p", field),
+            )
+        )
+        exact = {}
+        texts = []
+        starts = []
+        partner_ids = []
+        position = 0
+        for partner_id, value in self.env.cr.fetchall():
+            exact.setdefault(value, partner_id)
+            text = self._normalize_n43_value(value)
+            texts.append(text)
+            starts.append(position)
+            partner_ids.append(partner_id)
+            position += len(text) + len(N43_PARTNER_SEPARATOR)
+        index["partners"][field] = {
+            "exact": exact,
+            "text": N43_PARTNER_SEPARATOR.join(texts),
+            "starts": starts,
+            "partner_ids": partner_ids,
+        }
+        return index["partners"][field]
+
+    def _match_n43_partner(self, index, field, operator, value):
+        """Get the id of the first partner of the index whose field matches
+        the value the way the `=` or `ilike` domain would do, or False."""
+        partners = self._load_n43_partners(index, field)
+        if operator == "=":
+            return partners["exact"].get(value, False)
+        position = partners["text"].find(self._normalize_n43_value(value))
+        if position < 0:
+            return False
+        return partners["partner_ids"][bisect_right(partners["starts"], position) - 1]
+
+    def _search_n43_partner(self, field, operator, value, index=None):
+        """Get the first partner whose field matches the value, through the
+        index if given."""
+        partner_obj = self.env["res.partner"]
+        if index is None:
+            return partner_obj.search([(field, operator, value)], limit=1)
+        key = (field, operator, value)
+        if key not in index["cache"]:
+            index["cache"][key] = self._match_n43_partner(index, field, operator, value)
+        return partner_obj.browse(index["cache"][key])
+
+    def _get_n43_partner_from_caixabank(self, conceptos, index=None):
+        partner = self.env["res.partner"]
         # Try to match from VAT included in concept complementary record #02
         if conceptos.get("02"):  # pragma: no cover
             vat = conceptos["02"][0][:2] + conceptos["02"][0][7:]
             if vat:
-                partner = partner_obj.search([("vat", "=", vat)], limit=1)
+                partner = self._search_n43_partner("vat", "=", vat, index=index)
         if not partner:
             # Try to match from partner name
             if conceptos.get("01"):
                 name = conceptos["01"][0][4:] + conceptos["01"][1]
                 if name and len(name) > 7:
-                    partner = partner_obj.search([("name", "ilike", name)], limit=1)
+                    partner = self._search_n43_partner(
+                        "name", "ilike", name, index=index
+                    )
         return partner
 
-    def _get_n43_partner_from_santander(self, conceptos):
-        partner_obj = self.env["res.partner"]
-        partner = partner_obj.browse()
+    def _get_n43_partner_from_santander(self, conceptos, index=None):
+        partner = self.env["res.partner"]
         # Try to match from VAT included in concept complementary record #01
         if conceptos.get("01"):
             if conceptos["01"][1]:
                 vat = conceptos["01"][1]
                 if vat:
-                    partner = partner_obj.search([("vat", "ilike", vat)], limit=1)
+                    partner = self._search_n43_partner("vat", "ilike", vat, index=index)
         if not partner:
             # Try to match from partner name
             if conceptos.get("01"):
                 name = conceptos["01"][0]
                 if name and len(name) > 7:
-                    partner = partner_obj.search([("name", "ilike", name)], limit=1)
+                    partner = self._search_n43_partner(
+                        "name", "ilike", name, index=index
+                    )
         return partner
 
-    def _get_n43_partner_from_sabadell(self, conceptos):
-        partner_obj = self.env["res.partner"]
-        partner = partner_obj.browse()
+    def _get_n43_partner_from_sabadell(self, conceptos, index=None):
+        partner = self.env["res.partner"]
         # Try to match from partner name
         if conceptos.get("01"):
             name = conceptos["01"][1]
             if name and len(name) > 7:
-                partner = partner_obj.search([("name", "ilike", name)], limit=1)
+                partner = self._search_n43_partner("name", "ilike", name, index=index)
         return partner
 
-    def _get_n43_partner(self, line, journal):
+    def _get_n43_partner(self, line, journal, index=None):
         if not line.get("conceptos") or journal.n43_partner_search == "none":
             return self.env["res.partner"]
         if journal.n43_partner_search == "all":
@@ -334,7 +478,7 @@ class AccountStatementImport(models.TransientModel):
             search_methods = [journal.n43_partner_search]
         for search_method in search_methods:
             partner = getattr(self, f"_get_n43_partner_from_{search_method}")(
-                line["conceptos"]
+                line["conceptos"], index=index
             )
             if partner:
                 return partner
@@ -352,19 +496,43 @@ class AccountStatementImport(models.TransientModel):
             )
         return account_obj.browse()
 
+    def import_single_file(self, file_data, result):
+        # The partner indexes are shared by all the accounts of the file
+        return super(
+            AccountStatementImport, self.with_context(n43_partner_indexes={})
+        ).import_single_file(file_data, result)
+
     @api.model
     def _parse_file(self, data_file):
-        n43s = self._check_n43(data_file)
-        if not n43s:  # pragma: no cover
+        # The files are checked first, so that nothing is imported from a file
+        # failing halfway, and only their encodings are kept
+        encodings = {}
+        for index, n43_file in enumerate(self._get_n43_files(data_file)):
+            encoding = self._check_n43(n43_file)
+            if encoding:
+                encodings[index] = encoding
+        if not encodings:  # pragma: no cover
             return super()._parse_file(data_file)
-        result = []
-        for n43 in n43s:
-            data = self._parse_single_file_n43(n43)
-            if data[2]:
-                # We should only add data if there is some transactions.
-                # Otherwise we could ignore it.
-                result.append(data)
-        return result
+        return self._iter_n43_statements(data_file, encodings)
+
+    @api.model
+    def _iter_n43_statements(self, data_file, encodings):
+        """Yield the statements data of each account of the N43 files as soon
+        as its final record is read, so that it is imported before the next
+        one is parsed.
+
+        :param encodings: Dictionary with the encoding of each N43 file, by
+          its position in the files returned by `_get_n43_files`.
+        """
+        for index, n43_file in enumerate(self._get_n43_files(data_file)):
+            if index not in encodings:
+                continue
+            for n43 in self._parse(self._iter_n43_lines(n43_file, encodings[index])):
+                data = self._parse_single_file_n43(n43)
+                if data[2]:
+                    # We should only add data if there is some transactions.
+                    # Otherwise we could ignore it.
+                    yield data
 
     def _parse_single_file_n43(self, n43):
         transactions = []
@@ -414,13 +582,22 @@ class AccountStatementImport(models.TransientModel):
     def _complete_stmts_vals(self, stmts_vals, journal, account_number):
         """Match partner_id if if hasn't been deducted yet."""
         res = super()._complete_stmts_vals(stmts_vals, journal, account_number)
+        # Partners are matched for all the accounts of the file from a single
+        # load of the partners, each line until its first match
+        index = None
+        if journal.n43_partner_search != "none":
+            indexes = self.env.context.get("n43_partner_indexes", {})
+            index = indexes.get(journal.company_id.id)
+            if index is None:
+                index = self._get_n43_partner_index(journal.company_id)
+                indexes[journal.company_id.id] = index
         for st_vals in res:
             for line_vals in st_vals["transactions"]:
                 if line_vals.get("n43_line"):
                     n43_line = line_vals.pop("n43_line")
                     if not line_vals.get("partner_id"):
                         line_vals["partner_id"] = self._get_n43_partner(
-                            n43_line, journal
+                            n43_line, journal, index=index
                         ).id
                     line_vals["date"] = fields.Date.to_string(
                         n43_line.get(journal.n43_date_type or "fecha_valor")
@@ -0,0 +1,41 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from openupgradelib import openupgrade
+
+_RELATION = "account_move_line_l10n_es_aeat_tax_line_rel"
+
+
+@openupgrade.migrate()
+def migrate(env, version):
+    """Journal items are no longer linked to the tax lines, but reproduced from
+    a domain: fill the domain, the count and the balance of the existing tax
+    lines and drop the former relation table."""
+    if not openupgrade.table_exists(env.cr, _RELATION):
+        return
+    tax_lines = env["l10n.es.aeat.tax.line"].search([])
+    for model, lines in tax_lines.grouped("model").items():
+        if model not in env:
+            continue
+        for res_id, res_lines in lines.grouped("res_id").items():
+            report = env[model].browse(res_id).exists()
+            if not report:
+                continue
+            for line in res_lines:
+                domain = report._get_tax_line_move_line_domain(line.map_line_id)
+                line.move_line_domain = repr(domain)
+    openupgrade.logged_query(
+        env.cr,
+        f"""
+        UPDATE l10n_es_aeat_tax_line tl
+        SET move_line_count = rel.count, move_line_balance = rel.balance
+        FROM (
+            SELECT rel.l10n_es_aeat_tax_line_id, COUNT(*) AS count,
+                SUM(aml.balance) AS balance
+            FROM {_RELATION} rel
+            JOIN account_move_line aml ON aml.id = rel.account_move_line_id
+            GROUP BY rel.l10n_es_aeat_tax_line_id
+        ) rel
+        WHERE rel.l10n_es_aeat_tax_line_id = tl.id
+        """,
+    )
+    openupgrade.logged_query(env.cr, f"DROP TABLE {_RELATION}")
@@ -13,6 +13,7 @@ from . import l10n_es_aeat_export_config
 from . import l10n_es_aeat_export_config_line
 from . import l10n_es_aeat_map_tax
 from . import l10n_es_aeat_map_tax_line
+from . import l10n_es_aeat_move_change
 from . import l10n_es_aeat_report
 from . import l10n_es_aeat_report_tax_mapping
 from . import l10n_es_aeat_tax_line
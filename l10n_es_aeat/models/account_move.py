@@ -6,6 +6,7 @@
 import logging
 
 from odoo import api, fields, models
+from odoo.tools import SQL
 
 _logger = logging.getLogger(__name__)
 
@@ -33,6 +34,18 @@ class AccountMove(models.Model):
         for item in self:
             item.thirdparty_invoice = item.journal_id.thirdparty_invoice
 
+    def _post(self, soft=True):
+        posted = super()._post(soft=soft)
+        self.env["l10n.es.aeat.move.change"]._record_changes(posted, 1)
+        return posted
+
+    def button_draft(self):
+        # Recorded before resetting, while the lines are still the posted ones
+        self.env["l10n.es.aeat.move.change"]._record_changes(
+            self.filtered(lambda x: x.state == "posted"), -1
+        )
+        return super().button_draft()
+
     def _get_aeat_tax_info(self):
         self.ensure_one()
         res = {}
@@ -59,6 +72,66 @@ class AccountMove(models.Model):
 class AccountMoveLine(models.Model):
     _inherit = "account.move.line"
 
+    @api.model
+    def _get_aeat_tax_groups(self, domain):
+        """Group the move lines of the domain by the attributes the AEAT tax
+        mapping lines filter on.
+
+        :param domain: Domain of the move lines to group
+        :return: List of dictionaries with the attributes, the debit and
+          credit sums and the number of move lines of each group.
+        """
+        tax_ids_field = self._fields["tax_ids"]
+        # Only the values read below, as this runs when posting entries too
+        self.flush_model(
+            ["date", "account_id", "tax_line_id", "tax_ids", "debit", "credit"]
+        )
+        self.env["account.move"].flush_model(
+            ["financial_type", "tax_cash_basis_rec_id"]
+        )
+        self.env["account.tax"].flush_model(["tax_exigibility"])
+        self.env.cr.execute(
+            SQL(
+                """
+                SELECT
+                    aml.date,
+                    aml.account_id,
+                    aml.tax_line_id,
+                    line_tax.tax_exigibility AS tax_line_exigibility,
+                    COALESCE(base_tax.tax_ids, '{}') AS tax_ids,
+                    COALESCE(base_tax.on_payment, FALSE) AS base_on_payment,
+                    COALESCE(base_tax.not_on_payment, FALSE) AS base_not_on_payment,
+                    move.financial_type,
+                    move.tax_cash_basis_rec_id IS NOT NULL AS cash_basis,
+                    aml.debit > 0 AS has_debit,
+                    aml.credit > 0 AS has_credit,
+                    SUM(aml.debit) AS debit,
+                    SUM(aml.credit) AS credit,
+                    COUNT(*) AS count
+                FROM account_move_line aml
+                JOIN account_move move ON move.id = aml.move_id
+                LEFT JOIN account_tax line_tax ON line_tax.id = aml.tax_line_id
+                LEFT JOIN LATERAL (
+                    SELECT
+                        ARRAY_AGG(tax.id ORDER BY tax.id) AS tax_ids,
+                        BOOL_OR(tax.tax_exigibility = 'on_payment') AS on_payment,
+                        BOOL_OR(tax.tax_exigibility != 'on_payment')
+                            AS not_on_payment
+                    FROM %(relation)s rel
+                    JOIN account_tax tax ON tax.id = rel.%(column2)s
+                    WHERE rel.%(column1)s = aml.id
+                ) base_tax ON TRUE
+                WHERE aml.id IN %(move_lines)s
+                GROUP BY 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11
+                """,
+                relation=SQL.identifier(tax_ids_field.relation),
+                column1=SQL.identifier(tax_ids_field.column1),
+                column2=SQL.identifier(tax_ids_field.column2),
+                move_lines=self._search(domain).subselect(),
+            )
+        )
+        return self.env.cr.dictfetchall()
+
     def _process_aeat_tax_base_info(self, res, tax, sign):
         """It modifies the dictionary given in res for setting the base amount info
         for the taxes dictionary obtained in ~~account.move~~._get_aeat_tax_info().
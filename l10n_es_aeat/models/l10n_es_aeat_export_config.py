@@ -2,7 +2,101 @@
 # Copyright 2019 Tecnativa - Pedro M. Baeza
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl
 
-from odoo import fields, models
+import re
+from collections import namedtuple
+from functools import partial
+
+from odoo import api, fields, models
+from odoo.tools import SQL, frozendict, ormcache
+
+EXPRESSION_PATTERN = re.compile(r"(\$\{.+?\})")
+NOT_ALLOWED_CHARS_PATTERN = re.compile(
+    r"[^A-Z0-9\s\.,-_&'´\\:;/\(\)ÑÇ]", flags=re.UNICODE | re.X
+)
+
+# Line of an export configuration compiled into plain values: its offset and
+# size in the record it belongs to, the function formatting its value into
+# bytes, and the ${...} expressions already split. Other attributes are named
+# as the ones of the line.
+ExportLayoutField = namedtuple(
+    "ExportLayoutField",
+    [
+        "line_id",
+        "offset",
+        "size",
+        "formatter",
+        "export_type",
+        "expression_parts",
+        "fixed_value",
+        "conditional_expression",
+        "repeat_expression",
+        "subconfig_id",
+    ],
+)
+# Compiled export configuration. Records are runs of consecutive lines always
+# written with their size, as (size, fields), written at once from a buffer of
+# that size; or a single line with a variable output, as (None, (field,)).
+ExportLayout = namedtuple("ExportLayout", ["records", "fields"])
+
+
+def format_string(text, length, fill=" ", align="<"):
+    """Format the string into a fixed length ASCII (iso-8859-1) record."""
+    if not text:
+        return (fill * length).encode("iso-8859-1")
+    # Replace accents and convert to upper
+    from unidecode import unidecode
+
+    text = text.upper()
+    text = "".join([unidecode(x) if x not in ("Ñ", "Ç") else x for x in text])
+    text = NOT_ALLOWED_CHARS_PATTERN.sub("", text)
+    ascii_string = text.encode("iso-8859-1")[:length]
+    ascii_fill = fill.encode("iso-8859-1")
+    if align == ">":
+        return ascii_string.rjust(length, ascii_fill)
+    return ascii_string.ljust(length, ascii_fill)
+
+
+def format_alphabetic_string(text, length, fill=" ", align="<"):
+    """Format the string into a fixed length ASCII (iso-8859-1) record
+    without numbers."""
+    if not text:
+        return (fill * length).encode("iso-8859-1")
+    name = re.sub(r"[\d-]", "", text, flags=re.UNICODE | re.X)
+    return format_string(name, length, fill=fill, align=align)
+
+
+def format_number(
+    number,
+    int_length,
+    dec_length=0,
+    include_sign=False,
+    positive_sign=" ",
+    negative_sign="N",
+):
+    """Format the number into a fixed length string, zero filled, with its
+    sign first if included."""
+    if number == "":
+        number = 0.0
+    number = float(number)
+    sign = number >= 0 and positive_sign or negative_sign
+    number = abs(number)
+    ascii_string = ""
+    if include_sign:
+        ascii_string += sign
+    if dec_length > 0:
+        ascii_string += "%0*.*f" % (int_length + dec_length + 1, dec_length, number)
+        ascii_string = ascii_string.replace(".", "")
+    elif int_length > 0:
+        ascii_string += "%.*d" % (int_length, int(number))
+    return ascii_string
+
+
+def _format_number_value(val, **kwargs):
+    return format_number(float(val or 0), **kwargs).encode("iso-8859-1")
+
+
+def _format_boolean_value(val, yes="X", no=" "):
+    return (val and yes or no).encode("iso-8859-1")
 
 
 class AeatModelExportConfig(models.Model):
@@ -21,3 +115,111 @@ class AeatModelExportConfig(models.Model):
         inverse_name="export_config_id",
         string="Lines",
     )
+
+    @api.model
+    def _compile_expression(self, expression):
+        """Split the expression into its literal texts and the ${...}
+        expressions to evaluate, marked with True.
+        """
+        return tuple(
+            (True, part[2:-1].strip())
+            if EXPRESSION_PATTERN.fullmatch(part)
+            else (False, part)
+            for part in EXPRESSION_PATTERN.split(expression)
+            if part
+        )
+
+    def _get_layout_version(self):
+        """Checksum of the lines of the configuration, which changes with any
+        change of them, for caching its compiled layout."""
+        self.ensure_one()
+        self.env["aeat.model.export.config.line"].flush_model()
+        self.env.cr.execute(
+            SQL(
+                """
+                SELECT md5(string_agg(line::text, ',' ORDER BY line.id))
+                FROM aeat_model_export_config_line line
+                WHERE line.export_config_id = %s
+                """,
+                self.id,
+            )
+        )
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _get_line_formatter(self, line):
+        """Function formatting a value of the line into bytes, with the size
+        of the line for all of them but booleans."""
+        align = ">" if line.alignment == "right" else "<"
+        if line.export_type == "string":
+            return partial(format_string, length=line.size, align=align)
+        elif line.export_type == "alphabetic":
+            return partial(format_alphabetic_string, length=line.size, align=align)
+        elif line.export_type == "boolean":
+            return partial(_format_boolean_value, yes=line.bool_yes, no=line.bool_no)
+        elif line.export_type in ("float", "integer"):
+            decimal_size = 0 if line.export_type == "integer" else line.decimal_size
+            return partial(
+                _format_number_value,
+                int_length=line.size - decimal_size - (line.apply_sign and 1 or 0),
+                dec_length=decimal_size,
+                include_sign=line.apply_sign,
+                positive_sign=line.positive_sign,
+                negative_sign=line.negative_sign,
+            )
+        return None
+
+    @api.model
+    def _is_fixed_size_line(self, line):
+        """Whether the line is always written once, with its size."""
+        if line.conditional_expression or line.repeat_expression:
+            return False
+        if line.export_type == "subconfig":
+            return False
+        if line.export_type == "boolean":
+            return len(line.bool_yes or "") == len(line.bool_no or "") == line.size
+        return True
+
+    @ormcache("self.id", "version")
+    def _get_compiled_layout(self, version=None):
+        """Low level cached layout of the configuration, for not reading its
+        lines, computing their positions and formats and splitting their
+        expressions for each exported record.
+
+        :param version: Version of the configuration, as returned by
+          `_get_layout_version`, so that the layout is compiled again when
+          the configuration changes without clearing other caches.
+        :return: ExportLayout of the configuration.
+        """
+        self.ensure_one()
+        records = []
+        fields_by_line = {}
+        run = []
+        offset = 0
+        for line in self.sudo().config_line_ids:
+            fixed = self._is_fixed_size_line(line)
+            field = ExportLayoutField(
+                line_id=line.id,
+                offset=offset if fixed else 0,
+                size=line.size,
+                formatter=self._get_line_formatter(line),
+                export_type=line.export_type,
+                expression_parts=line.expression
+                and self._compile_expression(line.expression),
+                fixed_value=line.fixed_value,
+                conditional_expression=line.conditional_expression,
+                repeat_expression=line.repeat_expression,
+                subconfig_id=line.subconfig_id.id,
+            )
+            fields_by_line[line.id] = field
+            if fixed:
+                run.append(field)
+                offset += line.size
+                continue
+            if run:
+                records.append((offset, tuple(run)))
+                run, offset = [], 0
+            records.append((None, (field,)))
+        if run:
+            records.append((offset, tuple(run)))
+        return ExportLayout(tuple(records), frozendict(fields_by_line))
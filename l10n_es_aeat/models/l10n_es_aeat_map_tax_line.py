@@ -82,12 +82,26 @@ class L10nEsAeatMapTaxLine(models.Model):
         :rtype: float
         """
         self.ensure_one()
+        return self._get_amount_from_sums(
+            sum(move_lines.mapped("debit")), sum(move_lines.mapped("credit"))
+        )
+
+    def _get_amount_from_sums(self, debit, credit):
+        """
+        Get the amount from the debit and credit sums of the move lines
+        according to the configuration of the mapping line.
+        :param debit: Sum of the debit of the move lines.
+        :param credit: Sum of the credit of the move lines.
+        :return: The amount calculated from the sums.
+        :rtype: float
+        """
+        self.ensure_one()
         if self.sum_type == "credit":
-            amount = sum(move_lines.mapped("credit"))
+            amount = credit
         elif self.sum_type == "debit":
-            amount = sum(move_lines.mapped("debit"))
+            amount = debit
         else:  # self.sum_type == 'both'
-            amount = sum(move_lines.mapped("credit")) - sum(move_lines.mapped("debit"))
+            amount = credit - debit
         if self.inverse:
             amount = (-1.0) * amount
         return amount
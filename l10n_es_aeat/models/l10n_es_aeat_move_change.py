@@ -0,0 +1,138 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, fields, models
+
+
+class L10nEsAeatMoveChange(models.Model):
+    """Journal entries posted or reset to draft while a tax mapping report
+    including them is calculated, so that recalculating it only needs to
+    apply these changes to its tax lines.
+    """
+
+    _name = "l10n.es.aeat.move.change"
+    _description = "AEAT journal entries change"
+    _order = "id"
+
+    company_id = fields.Many2one(
+        comodel_name="res.company", required=True, readonly=True, index=True
+    )
+    sign = fields.Integer(
+        required=True,
+        readonly=True,
+        help="1 when the journal entries are posted, -1 when they are reset to draft.",
+    )
+    groups = fields.Json(
+        readonly=True,
+        help="Groups of the tax journal items of the entries, as returned by "
+        "the tax mapping reports scan.",
+    )
+
+    @api.model
+    def _get_report_models(self):
+        return [
+            self.env[model_name]
+            for model_name in self.env.registry.descendants(
+                ["l10n.es.aeat.report.tax.mapping"], "_inherit"
+            )
+            if not self.env[model_name]._abstract
+        ]
+
+    @api.model
+    def _get_calculated_reports(self, companies, extra_domain=None):
+        reports = []
+        for report_model in self._get_report_models():
+            reports += report_model.sudo().search(
+                [
+                    ("state", "=", "calculated"),
+                    ("company_id", "in", companies.parent_ids.ids),
+                ]
+                + (extra_domain or [])
+            )
+        return reports
+
+    @api.model
+    def _get_tracked_moves(self, moves):
+        """Filter the journal entries that may be included in a calculated
+        report, as changes of the other ones don't need to be recorded.
+
+        Only the calculated reports of the companies and years of the entries
+        are read, and the entries are filtered in memory, so that posting
+        entries not covered by any report costs a few indexed searches.
+        """
+        if not moves:
+            return moves
+        dates = moves.mapped("date")
+        periods = [
+            (report.company_id, report.year, report.date_end)
+            for report in self._get_calculated_reports(
+                moves.company_id,
+                extra_domain=[
+                    ("year", "in", sorted({x.year for x in dates})),
+                    ("date_end", ">=", min(dates)),
+                ],
+            )
+        ]
+        if not periods:
+            return moves.browse()
+        return moves.filtered(
+            lambda move: any(
+                company in move.company_id.parent_ids
+                and year == move.date.year
+                and move.date <= date_end
+                for company, year, date_end in periods
+            )
+        )
+
+    @api.model
+    def _record_changes(self, moves, sign):
+        """Record the tax journal items of the given entries.
+
+        :param moves: Journal entries recordset posted or to be reset
+        :param sign: 1 if the entries are posted, -1 if they are reset
+        """
+        moves = self._get_tracked_moves(moves)
+        vals_list = []
+        for company in moves.company_id:
+            groups = (
+                self.env["account.move.line"]
+                .sudo()
+                ._get_aeat_tax_groups(
+                    [
+                        (
+                            "move_id",
+                            "in",
+                            moves.filtered(lambda x, c=company: x.company_id == c).ids,
+                        ),
+                        "|",
+                        ("tax_line_id", "!=", False),
+                        ("tax_ids", "!=", False),
+                    ]
+                )
+            )
+            if groups:
+                for group in groups:
+                    group["date"] = fields.Date.to_string(group["date"])
+                vals_list.append(
+                    {"company_id": company.id, "sign": sign, "groups": groups}
+                )
+        if vals_list:
+            self.sudo().create(vals_list)
+
+    @api.autovacuum
+    def _gc_changes(self):
+        """Drop the changes already included in all the calculated reports
+        that may include them."""
+        reports = self._get_calculated_reports(
+            self.env["res.company"].sudo().search([])
+        )
+        applied = [
+            (report.company_id, set(report.applied_move_change_ids or []))
+            for report in reports
+        ]
+        self.sudo().search([]).filtered(
+            lambda change: all(
+                change.id in applied_ids
+                for company, applied_ids in applied
+                if company in change.company_id.parent_ids
+            )
+        ).unlink()
@@ -511,10 +511,12 @@ class L10nEsAeatReport(models.AbstractModel):
         return result
 
     @api.model
-    def _view_move_lines(self, amls):
+    def _view_move_lines(self, amls=None, domain=None):
+        """Action showing the given journal items, or the ones matching the
+        given domain, which are then loaded page by page by the list view."""
         res = self.env.ref("account.action_account_moves_all_a").sudo().read()[0]
         view = self.env.ref("l10n_es_aeat.view_move_line_tree")
         res["context"] = {"create": 0}
         res["views"] = [(view.id, "list")]
-        res["domain"] = [("id", "in", amls.ids)]
+        res["domain"] = domain if domain is not None else [("id", "in", amls.ids)]
         return res
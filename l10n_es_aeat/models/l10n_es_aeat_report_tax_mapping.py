@@ -2,7 +2,10 @@
 # Copyright 2016,2024 Tecnativa - Pedro M. Baeza
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+from collections import defaultdict
+
 from odoo import api, exceptions, fields, models
+from odoo.osv import expression
 
 
 class L10nEsAeatReportTaxMapping(models.AbstractModel):
@@ -29,11 +32,16 @@ class L10nEsAeatReportTaxMapping(models.AbstractModel):
         string="Valued tax lines",
     )
 
+    applied_move_change_ids = fields.Json(
+        readonly=True,
+        copy=False,
+        help="Journal entries changes already included in the tax lines. Kept "
+        "by id, as changes are not committed in the order of their ids.",
+    )
+
     def calculate(self):
         res = super().calculate()
         for report in self:
-            report.tax_line_ids.unlink()
-            report.env.invalidate_all()
             # Buscar configuración de mapeo de impuestos
             tax_code_map = (
                 self.env["l10n.es.aeat.map.tax"]
@@ -52,29 +60,152 @@ class L10nEsAeatReportTaxMapping(models.AbstractModel):
                     limit=1,
                 )
             )
-            if tax_code_map:
-                tax_lines = []
-                for map_line in tax_code_map.map_line_ids:
-                    tax_lines.append(report._prepare_tax_line_vals(map_line))
-                report.tax_line_ids = [(0, 0, x) for x in tax_lines]
+            map_lines = tax_code_map.map_line_ids
+            if map_lines and report._can_recalculate_incrementally(map_lines):
+                report._recalculate_tax_lines_incrementally()
+                continue
+            report.tax_line_ids.unlink()
+            report.env.invalidate_all()
+            # Read in the same snapshot as the scan: these changes are the
+            # ones it includes, the others are applied by the next calculation
+            report.applied_move_change_ids = report._get_move_changes().ids
+            if map_lines:
+                tax_lines_values = report._get_tax_lines_values(map_lines)
+                report.tax_line_ids = [
+                    (0, 0, report._prepare_tax_line_vals(x, tax_lines_values[x]))
+                    for x in map_lines
+                ]
         return res
 
+    def _can_recalculate_incrementally(self, map_lines):
+        """Check if the tax lines of a calculated report can be updated only
+        with the journal entries posted or reset to draft since its last
+        calculation, instead of scanning again the whole period.
+
+        :param map_lines: Mapping lines recordset to compute
+        """
+        self.ensure_one()
+        if (
+            self.state != "calculated"
+            or self.env.context.get("aeat_full_recalculation")
+            or self._get_partner_domain()
+        ):
+            return False
+        # Reports calculated before the changes were recorded (NULL, read as
+        # False) may miss the ones done until then. No change applied is []
+        if self.applied_move_change_ids in (None, False):
+            return False
+        tax_lines = self.tax_line_ids
+        if len(tax_lines) != len(map_lines) or tax_lines.map_line_id != map_lines:
+            return False
+        # The criteria of any line, like its period, may have changed
+        return all(
+            tax_line.move_line_domain
+            == repr(self._get_tax_line_move_line_domain(tax_line.map_line_id))
+            for tax_line in tax_lines
+        )
+
+    def _get_move_changes(self):
+        """Get the journal entries changes recorded that the report may include."""
+        self.ensure_one()
+        return (
+            self.env["l10n.es.aeat.move.change"]
+            .sudo()
+            .search([("company_id", "child_of", self.company_id.id)])
+        )
+
+    def _recalculate_tax_lines_incrementally(self):
+        """Apply to the tax lines the journal entries changes not included in
+        them yet."""
+        self.ensure_one()
+        all_changes = self._get_move_changes()
+        applied_ids = set(self.applied_move_change_ids or [])
+        changes = all_changes.filtered(lambda x: x.id not in applied_ids)
+        if not changes:
+            return
+        tax_lines = self.tax_line_ids
+        criteria, lines_by_tax = self._get_tax_lines_criteria(tax_lines.map_line_id)
+        values = {
+            map_line: {"debit": 0.0, "credit": 0.0, "count": 0} for map_line in criteria
+        }
+        for change in changes:
+            groups = [
+                dict(group, date=fields.Date.to_date(group["date"]))
+                for group in change.groups
+            ]
+            self._add_tax_move_line_groups(
+                groups, criteria, lines_by_tax, values, sign=change.sign
+            )
+        for tax_line in tax_lines:
+            map_line_values = values.get(tax_line.map_line_id)
+            if not map_line_values or not any(map_line_values.values()):
+                continue
+            tax_line.write(
+                {
+                    "amount": tax_line.amount
+                    + tax_line.map_line_id._get_amount_from_sums(
+                        map_line_values["debit"], map_line_values["credit"]
+                    ),
+                    "move_line_count": tax_line.move_line_count
+                    + map_line_values["count"],
+                    "move_line_balance": tax_line.move_line_balance
+                    + map_line_values["debit"]
+                    - map_line_values["credit"],
+                }
+            )
+        # The changes garbage collected since are forgotten
+        self.applied_move_change_ids = all_changes.ids
+
     def unlink(self):
         self.mapped("tax_line_ids").unlink()
         return super().unlink()
 
-    def _prepare_tax_line_vals(self, map_line):
+    def _prepare_tax_line_vals(self, map_line, values=None):
+        """Prepare the tax line of the given mapping line.
+
+        :param map_line: Mapping line record
+        :param values: Amounts and count of move lines of the mapping line, as
+          returned by `_get_tax_lines_values`. Computed for this line only if
+          not given.
+        """
         self.ensure_one()
-        move_lines = self._get_tax_lines(self.date_start, self.date_end, map_line)
-        amount = map_line._get_amount_from_moves(move_lines)
+        if values is None:
+            values = self._get_tax_lines_values(map_line)[map_line]
         return {
             "model": self._name,
             "res_id": self.id,
             "map_line_id": map_line.id,
-            "amount": amount,
-            "move_line_ids": [(6, 0, move_lines.ids)],
+            "amount": map_line._get_amount_from_sums(values["debit"], values["credit"]),
+            "move_line_domain": repr(self._get_tax_line_move_line_domain(map_line)),
+            "move_line_count": values["count"],
+            "move_line_balance": values["debit"] - values["credit"],
         }
 
+    def _get_tax_line_move_line_domain(self, map_line):
+        """Get the domain stored on the tax line for reproducing its move lines
+        without linking them.
+
+        :param map_line: Mapping line record
+        :return: Domain with literal values only.
+        """
+        self.ensure_one()
+        period = self._get_tax_line_period(map_line)
+        if not period:
+            return expression.FALSE_DOMAIN
+        date_start, date_end = (fields.Date.to_string(x) for x in period)
+        return self._get_move_line_domain(date_start, date_end, map_line)
+
+    def _get_tax_line_period(self, map_line):
+        """Get the dates between which the move lines of the mapping line are
+        computed.
+
+        :param map_line: Mapping line record
+        :return: Tuple with the start and end dates, or None for not
+          computing the line.
+        """
+        self.ensure_one()
+        return self.date_start, self.date_end
+
     def _get_partner_domain(self):
         return []
 
@@ -152,6 +283,172 @@ class L10nEsAeatReportTaxMapping(models.AbstractModel):
         domain = self._get_move_line_domain(date_start, date_end, map_line)
         return self.env["account.move.line"].search(domain)
 
+    def _get_tax_move_line_groups(self, date_start, date_end, taxes):
+        """Scan once the move lines of the period that have any of the given
+        taxes, grouping them by the attributes the mapping lines filter on.
+
+        :param date_start: Start date of the scanned period
+        :param date_end: Stop date of the scanned period
+        :param taxes: Taxes recordset of all the scanned mapping lines
+        :return: List of dictionaries with the attributes, the debit and
+          credit sums and the number of move lines of each group.
+        """
+        self.ensure_one()
+        aml_model = self.env["account.move.line"]
+        domain = [
+            ("company_id", "child_of", self.company_id.id),
+            ("date", ">=", date_start),
+            ("date", "<=", date_end),
+            ("parent_state", "=", "posted"),
+            "|",
+            ("tax_line_id", "in", taxes.ids),
+            ("tax_ids", "in", taxes.ids),
+        ] + self._get_partner_domain()
+        return aml_model._get_aeat_tax_groups(domain)
+
+    def _get_tax_line_criteria(self, map_line):
+        """Translate the configuration of the mapping line to the criteria
+        applied on the groups returned by `_get_tax_move_line_groups`. They
+        are the same as the ones of `_get_move_line_domain`.
+
+        :param map_line: Mapping line record
+        :return: Dictionary with the criteria, or None if the mapping line
+          can't have any move line.
+        """
+        self.ensure_one()
+        period = self._get_tax_line_period(map_line)
+        taxes = map_line.get_taxes_for_company(self.company_id)
+        if not period or not taxes:
+            return None
+        financial_types = None
+        if map_line.move_type == "regular":
+            financial_types = {"receivable", "payable", "liquidity", "other"}
+        elif map_line.move_type == "refund":
+            financial_types = {"receivable_refund", "payable_refund"}
+        account_ids = None
+        if map_line.account_xmlid_ids:
+            account_ids = set(map_line.get_accounts_for_company(self.company_id).ids)
+        return {
+            "date_start": period[0],
+            "date_end": period[1],
+            "tax_ids": set(taxes.ids),
+            "financial_types": financial_types,
+            "account_ids": account_ids,
+        }
+
+    @api.model
+    def _match_tax_move_line_group(self, group, map_line, criteria):
+        """Check if a group of move lines belongs to the mapping line."""
+        if not criteria["date_start"] <= group["date"] <= criteria["date_end"]:
+            return False
+        if (
+            criteria["financial_types"] is not None
+            and group["financial_type"] not in criteria["financial_types"]
+        ):
+            return False
+        in_tax_line = group["tax_line_id"] in criteria["tax_ids"]
+        in_tax_ids = not criteria["tax_ids"].isdisjoint(group["tax_ids"])
+        if map_line.field_type == "base":
+            if not in_tax_ids:
+                return False
+        elif map_line.field_type == "amount":
+            if not in_tax_line:
+                return False
+        elif not (in_tax_line or in_tax_ids):
+            return False
+        if (
+            criteria["account_ids"] is not None
+            and group["account_id"] not in criteria["account_ids"]
+        ):
+            return False
+        if map_line.sum_type == "debit" and not group["has_debit"]:
+            return False
+        if map_line.sum_type == "credit" and not group["has_credit"]:
+            return False
+        tax_line_exigibility = group["tax_line_exigibility"]
+        if map_line.exigible_type == "yes":
+            return (
+                group["cash_basis"]
+                or (bool(tax_line_exigibility) and tax_line_exigibility != "on_payment")
+                or group["base_not_on_payment"]
+            )
+        if map_line.exigible_type == "no":
+            return (
+                not group["cash_basis"]
+                and tax_line_exigibility == "on_payment"
+                and group["base_on_payment"]
+            )
+        return True
+
+    def _get_tax_lines_values(self, map_lines):
+        """Get the move lines and amounts of all the given mapping lines,
+        scanning the move lines of the period only once, instead of
+        searching them for each mapping line through `_get_tax_lines`.
+
+        :param map_lines: Mapping lines recordset
+        :return: Dictionary with the mapping lines as keys, and dictionaries
+          with the debit and credit sums and the number of move lines as
+          values.
+        """
+        self.ensure_one()
+        values = {
+            map_line: {"debit": 0.0, "credit": 0.0, "count": 0}
+            for map_line in map_lines
+        }
+        criteria, lines_by_tax = self._get_tax_lines_criteria(map_lines)
+        if not criteria:
+            return values
+        groups = self._get_tax_move_line_groups(
+            min(x["date_start"] for x in criteria.values()),
+            max(x["date_end"] for x in criteria.values()),
+            self.env["account.tax"].browse(list(lines_by_tax)),
+        )
+        self._add_tax_move_line_groups(groups, criteria, lines_by_tax, values)
+        return values
+
+    def _get_tax_lines_criteria(self, map_lines):
+        """Get the criteria of the given mapping lines, and index them by the
+        taxes they are computed on.
+
+        :param map_lines: Mapping lines recordset
+        :return: Tuple with the dictionary of criteria by mapping line, without
+          the lines that can't have any move line, and the dictionary of
+          mapping lines by tax id.
+        """
+        self.ensure_one()
+        criteria = {}
+        lines_by_tax = defaultdict(list)
+        for map_line in map_lines:
+            map_line_criteria = self._get_tax_line_criteria(map_line)
+            if not map_line_criteria:
+                continue
+            criteria[map_line] = map_line_criteria
+            for tax_id in map_line_criteria["tax_ids"]:
+                lines_by_tax[tax_id].append(map_line)
+        return criteria, lines_by_tax
+
+    @api.model
+    def _add_tax_move_line_groups(self, groups, criteria, lines_by_tax, values, sign=1):
+        """Add the sums of the groups of move lines to the values of the
+        mapping lines they belong to.
+
+        :param groups: Groups as returned by `_get_tax_move_line_groups`
+        :param criteria: Criteria by mapping line
+        :param lines_by_tax: Mapping lines by tax id
+        :param values: Dictionary of sums by mapping line to update
+        :param sign: -1 for subtracting the groups instead of adding them
+        """
+        for group in groups:
+            candidates = set(lines_by_tax.get(group["tax_line_id"], []))
+            for tax_id in group["tax_ids"]:
+                candidates.update(lines_by_tax.get(tax_id, []))
+            for map_line in candidates:
+                if self._match_tax_move_line_group(group, map_line, criteria[map_line]):
+                    map_line_values = values[map_line]
+                    map_line_values["debit"] += sign * group["debit"]
+                    map_line_values["credit"] += sign * group["credit"]
+                    map_line_values["count"] += sign * group["count"]
+
     @api.model
     def _prepare_regularization_move_line(self, account_group):
         return {
@@ -163,11 +460,11 @@ class L10nEsAeatReportTaxMapping(models.AbstractModel):
 
     def _process_tax_line_regularization(self, tax_lines):
         self.ensure_one()
+        tax_lines._check_move_lines_unchanged()
         groups = self.env["account.move.line"].read_group(
-            [
-                ("id", "in", tax_lines.move_line_ids.ids),
-                ("parent_state", "=", "posted"),
-            ],
+            expression.AND(
+                [tax_lines._get_move_line_domain(), [("parent_state", "=", "posted")]]
+            ),
             ["debit", "credit", "account_id"],
             ["account_id"],
         )
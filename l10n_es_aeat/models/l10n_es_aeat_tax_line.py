@@ -2,7 +2,11 @@
 # Copyright 2016-2017 Tecnativa - Pedro M. Baeza
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
-from odoo import fields, models
+import ast
+
+from odoo import exceptions, fields, models
+from odoo.osv import expression
+from odoo.tools import float_compare
 
 
 class L10nEsAeatTaxLine(models.Model):
@@ -27,11 +31,80 @@ class L10nEsAeatTaxLine(models.Model):
         required=True,
         ondelete="cascade",
     )
+    move_line_domain = fields.Text(
+        readonly=True,
+        help="Domain of the journal items computed in the line.",
+    )
+    move_line_count = fields.Integer(string="Journal items count", readonly=True)
+    move_line_balance = fields.Float(
+        string="Journal items balance",
+        digits="Account",
+        readonly=True,
+        help="Balance of the journal items computed in the line. Checked with "
+        "their count before using the domain, as entries may have been posted "
+        "or reset to draft since.",
+    )
     move_line_ids = fields.Many2many(
-        comodel_name="account.move.line", string="Journal items"
+        comodel_name="account.move.line",
+        string="Journal items",
+        compute="_compute_move_line_ids",
     )
     to_regularize = fields.Boolean(related="map_line_id.to_regularize", readonly=True)
     model = fields.Char(index=True, readonly=True, required=True, string="Model name")
 
+    def _compute_move_line_ids(self):
+        for line in self:
+            line.move_line_ids = line._get_move_lines()
+
+    def _get_move_line_domain(self):
+        """Domain of the journal items of the lines, as evaluated when
+        computing them."""
+        return expression.OR(
+            [
+                ast.literal_eval(line.move_line_domain)
+                if line.move_line_domain
+                else expression.FALSE_DOMAIN
+                for line in self
+            ]
+            or [expression.FALSE_DOMAIN]
+        )
+
+    def _get_move_lines(self, limit=None, offset=0):
+        return self.env["account.move.line"].search(
+            self._get_move_line_domain(), limit=limit, offset=offset
+        )
+
+    def _check_move_lines_unchanged(self):
+        """Check that the domains of the lines still give the journal items
+        computed in them, comparing their count and balance.
+
+        :raise UserError: if any line gives other journal items now.
+        """
+        precision = self.env["decimal.precision"].precision_get("Account")
+        changed = self.env["l10n.es.aeat.tax.line"]
+        aml_model = self.env["account.move.line"]
+        for line in self:
+            [(count, balance)] = aml_model._read_group(
+                line._get_move_line_domain(), aggregates=["__count", "balance:sum"]
+            )
+            if count != line.move_line_count or float_compare(
+                balance or 0.0, line.move_line_balance, precision_digits=precision
+            ):
+                changed |= line
+        if changed:
+            raise exceptions.UserError(
+                self.env._(
+                    "Journal entries have been posted or reset to draft since "
+                    "the following tax lines were calculated:\n%s\n"
+                    "Recalculate the report first.",
+                    "\n".join(
+                        f"[{line.field_number}] {line.name}" for line in changed
+                    ),
+                )
+            )
+
     def get_calculated_move_lines(self):
-        return self.env["l10n.es.aeat.report"]._view_move_lines(self.move_line_ids)
+        self._check_move_lines_unchanged()
+        return self.env["l10n.es.aeat.report"]._view_move_lines(
+            domain=self._get_move_line_domain()
+        )
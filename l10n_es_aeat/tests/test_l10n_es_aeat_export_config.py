@@ -169,3 +169,104 @@ class TestL10nEsAeatExportConfig(BaseCommon):
         )
         export_file = export_to_boe._export_config(new_report, export_config)
         self.assertEqual(b"<T           001001500X >", export_file)
+
+    def test_export_config_layout_cache(self):
+        partners = self.env["res.partner"].create([{"name": "A"}, {"name": "B"}])
+        export_config = self.env["aeat.model.export.config"].create(
+            {
+                "name": "Test Export Config",
+                "model_number": "000",
+                "config_line_ids": [
+                    (
+                        0,
+                        0,
+                        {
+                            "sequence": 1,
+                            "name": "Partner names",
+                            "expression": "${object.name}-x",
+                            "repeat_expression": "object",
+                            "export_type": "string",
+                            "size": 6,
+                            "alignment": "left",
+                        },
+                    )
+                ],
+            }
+        )
+        export_to_boe = self.env["l10n.es.aeat.report.export_to_boe"].create(
+            {"name": "test_export_to_boe.txt"}
+        )
+        self.assertEqual(
+            export_to_boe._export_config(partners, export_config), b"A-X   B-X   "
+        )
+        layout = export_config._get_compiled_layout(export_config._get_layout_version())
+        self.assertEqual(
+            layout.fields[export_config.config_line_ids.id].expression_parts,
+            ((True, "object.name"), (False, "-x")),
+        )
+        # The compiled layout is invalidated when the configuration changes
+        export_config.config_line_ids.size = 4
+        self.assertEqual(
+            export_to_boe._export_config(partners, export_config), b"A-X B-X "
+        )
+
+    def test_export_config_fixed_records(self):
+        export_config = self.env["aeat.model.export.config"].create(
+            {
+                "name": "Test Export Config",
+                "model_number": "000",
+                "config_line_ids": [
+                    (0, 0, vals)
+                    for vals in [
+                        {
+                            "sequence": 1,
+                            "name": "Name",
+                            "expression": "${object.name}",
+                            "export_type": "string",
+                            "size": 4,
+                            "alignment": "right",
+                        },
+                        {
+                            "sequence": 2,
+                            "name": "Amount",
+                            "fixed_value": "-1.5",
+                            "export_type": "float",
+                            "size": 6,
+                            "decimal_size": 2,
+                            "apply_sign": True,
+                        },
+                        {
+                            "sequence": 3,
+                            "name": "Conditional",
+                            "fixed_value": "A",
+                            "conditional_expression": "True",
+                            "export_type": "string",
+                            "size": 2,
+                        },
+                        {
+                            "sequence": 4,
+                            "name": "Flag",
+                            "fixed_value": "1",
+                            "export_type": "boolean",
+                            "size": 1,
+                        },
+                    ]
+                ],
+            }
+        )
+        layout = export_config._get_compiled_layout(export_config._get_layout_version())
+        # Lines always written with their size are grouped in a record
+        self.assertEqual(
+            [
+                (size, [(x.offset, x.size) for x in layout_fields])
+                for size, layout_fields in layout.records
+            ],
+            [(10, [(0, 4), (4, 6)]), (None, [(0, 2)]), (1, [(0, 1)])],
+        )
+        export_to_boe = self.env["l10n.es.aeat.report.export_to_boe"].create(
+            {"name": "test_export_to_boe.txt"}
+        )
+        partner = self.env["res.partner"].create({"name": "ab"})
+        self.assertEqual(
+            export_to_boe._export_config(partner, export_config), b"  ABN00150A X"
+        )
@@ -6,12 +6,24 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 import base64
+import io
 import re
 
 from odoo import exceptions, fields, models
 from odoo.tools.safe_eval import safe_eval
 
-EXPRESSION_PATTERN = re.compile(r"(\$\{.+?\})")
+from ..models.l10n_es_aeat_export_config import format_number, format_string
+
+# Methods that modules can override to change how the lines are exported,
+# in which case the records are not written from the compiled layout
+EXPORT_LINE_HOOKS = (
+    "_export_line_process",
+    "_export_simple_record",
+    "_format_string",
+    "_format_alphabetic_string",
+    "_format_number",
+    "_format_boolean",
+)
 
 
 class L10nEsAeatReportExportToBoe(models.TransientModel):
@@ -38,32 +50,9 @@ class L10nEsAeatReportExportToBoe(models.TransientModel):
         """
         if not text:
             return fill * length
-        # Replace accents and convert to upper
-        from unidecode import unidecode
-
-        text = text.upper()
-        text = "".join([unidecode(x) if x not in ("Ñ", "Ç") else x for x in text])
-        text = re.sub(
-            r"[^A-Z0-9\s\.,-_&'´\\:;/\(\)ÑÇ]", "", text, flags=re.UNICODE | re.X
-        )
-        ascii_string = text.encode("iso-8859-1")
-        # Cut the string if it is too long
-        if len(ascii_string) > length:
-            ascii_string = ascii_string[:length]
-        # Format the string
-        ascii_fill = fill.encode("iso-8859-1")
-        if align == "<":
-            ascii_string = ascii_string.ljust(length, ascii_fill)
-        elif align == ">":
-            ascii_string = ascii_string.rjust(length, ascii_fill)
-        else:
+        if align not in ("<", ">"):
             raise AssertionError(self.env._("Wrong align option. It should be < or >"))
-        # Sanity-check
-        assert len(ascii_string) == length, self.env._(
-            "The formated string must match the given length"
-        )
-        # Return string
-        return ascii_string
+        return format_string(text, length, fill=fill, align=align)
 
     def _format_alphabetic_string(self, text, length, fill=" ", align="<"):
         """Format the string into a fixed length ASCII (iso-8859-1) record
@@ -91,31 +80,19 @@ class L10nEsAeatReportExportToBoe(models.TransientModel):
             y rellenos a ceros por la izquierda sin signos y sin empaquetar.'
             (http://www.boe.es/boe/dias/2008/10/23/pdfs/A42154-42190.pdf)
         """
-        #
-        # Separate the number parts (-55.23 => int_part=55,
-        # dec_part=0.23, sign='N')
-        #
-        if number == "":
-            number = 0.0
-        number = float(number)
-        sign = number >= 0 and positive_sign or negative_sign
-        number = abs(number)
-        int_part = int(number)
-        # Format the string
-        ascii_string = ""
-        if include_sign:
-            ascii_string += sign
-        if dec_length > 0:
-            ascii_string += "%0*.*f" % (int_length + dec_length + 1, dec_length, number)
-            ascii_string = ascii_string.replace(".", "")
-        elif int_length > 0:
-            ascii_string += "%.*d" % (int_length, int_part)
+        ascii_string = format_number(
+            number,
+            int_length,
+            dec_length=dec_length,
+            include_sign=include_sign,
+            positive_sign=positive_sign,
+            negative_sign=negative_sign,
+        )
         # Sanity-check
         assert (
             len(ascii_string) == (include_sign and 1 or 0) + int_length + dec_length
         ), self.env._("The formated string must match the given length")
-        # Return the string assuring that is not unicode
-        return str(ascii_string)
+        return ascii_string
 
     def _format_boolean(self, value, yes="X", no=" "):
         """Format a boolean value into a fixed length ASCII (iso-8859-1) record."""
@@ -136,9 +113,8 @@ class L10nEsAeatReportExportToBoe(models.TransientModel):
         if not active_id or not active_model:
             return False
         report = self.env[active_model].browse(active_id)
-        contents = b""
         if report.export_config_id:
-            contents += self.action_get_file_from_config(report)
+            contents = self.action_get_file_from_config(report)
         else:
             raise exceptions.UserError(self.env._("No export configuration selected."))
         # Generate the file and save as attachment
@@ -180,52 +156,126 @@ class L10nEsAeatReportExportToBoe(models.TransientModel):
 
     def _export_config(self, obj, export_config):
         self.ensure_one()
-        contents = b""
-        for line in export_config.config_line_ids:
-            contents += self._export_line_process(obj, line)
-        return contents
+        buffer = io.BytesIO()
+        self._write_config(buffer, obj, export_config, layouts={})
+        return buffer.getvalue()
 
-    def _export_line_process(self, obj, line):
-        # usar esta variable para resolver las expresiones
-        obj_merge = obj
-
-        def merge_eval(exp):
-            return safe_eval(
-                exp,
-                {
-                    "user": self.env.user,
-                    "object": obj_merge,
-                    # copy context to prevent side-effects of eval
-                    "context": self.env.context.copy(),
-                },
+    def _has_export_line_hooks(self):
+        """Whether any module overrides how the lines are exported."""
+        cls = type(self)
+        return any(
+            getattr(cls, name) is not getattr(L10nEsAeatReportExportToBoe, name)
+            for name in EXPORT_LINE_HOOKS
+        )
+
+    def _get_export_layout(self, export_config, layouts=None):
+        """Get the compiled layout of the configuration, checking its version
+        once per export."""
+        if layouts is not None and export_config.id in layouts:
+            return layouts[export_config.id]
+        layout = export_config._get_compiled_layout(export_config._get_layout_version())
+        if layouts is not None:
+            layouts[export_config.id] = layout
+        return layout
+
+    def _write_config(self, buffer, obj, export_config, layouts=None):
+        """Write the records of the export configuration into the buffer,
+        following its compiled layout: each run of lines with a fixed size is
+        formatted into a single preallocated record.
+
+        :param layouts: Dictionary of the layouts already compiled during the
+          export, by configuration ID.
+        """
+        if self._has_export_line_hooks():
+            lines = self.env["aeat.model.export.config.line"].browse(
+                list(self._get_export_layout(export_config, layouts).fields)
             )
+            for line in lines:
+                buffer.write(self._export_line_process(obj, line))
+            return
+        for size, layout_fields in self._get_export_layout(
+            export_config, layouts
+        ).records:
+            if size is None:
+                self._write_layout_field(buffer, obj, layout_fields[0], layouts)
+                continue
+            record = bytearray(size)
+            for field in layout_fields:
+                value = field.formatter(self._get_layout_field_value(field, obj))
+                if len(value) != field.size:
+                    raise AssertionError(
+                        self.env._("The formated string must match the given length")
+                    )
+                record[field.offset : field.offset + field.size] = value
+            buffer.write(record)
 
-        def merge(match):
-            exp = str(match.group()[2:-1]).strip()
-            result = merge_eval(exp)
-            return result and str(result) or ""
-
-        val = b""
-        if line.conditional_expression:
-            if not merge_eval(line.conditional_expression):
-                return val
-        if line.repeat_expression:
-            obj_list = merge_eval(line.repeat_expression)
-        else:
-            obj_list = [obj]
+    def _eval_export_expression(self, expression, obj):
+        return safe_eval(
+            expression,
+            {
+                "user": self.env.user,
+                "object": obj,
+                # copy context to prevent side-effects of eval
+                "context": self.env.context.copy(),
+            },
+        )
+
+    def _get_layout_field_value(self, field, obj):
+        if field.expression_parts:
+            return "".join(
+                self._export_expression_value(part, obj) if is_expression else part
+                for is_expression, part in field.expression_parts
+            )
+        return field.fixed_value
+
+    def _get_layout_field_objects(self, field, obj):
+        """Objects the line is exported for, none if its condition fails."""
+        if field.conditional_expression and not self._eval_export_expression(
+            field.conditional_expression, obj
+        ):
+            return []
+        if field.repeat_expression:
+            return self._eval_export_expression(field.repeat_expression, obj)
+        return [obj]
+
+    def _write_layout_field(self, buffer, obj, field, layouts=None):
+        """Write the records of a line whose output size varies."""
+        obj_list = self._get_layout_field_objects(field, obj)
+        if field.export_type == "subconfig":
+            subconfig = self.env["aeat.model.export.config"].browse(field.subconfig_id)
+            for obj_merge in obj_list:
+                self._write_config(buffer, obj_merge, subconfig, layouts)
+            return
         for obj_merge in obj_list:
-            if line.export_type == "subconfig":
-                val += self._export_config(obj_merge, line.subconfig_id)
-            else:
-                if line.expression:
-                    field_val = EXPRESSION_PATTERN.sub(merge, line.expression)
-                else:
-                    field_val = line.fixed_value
-                record = self._export_simple_record(line, field_val)
-                if isinstance(record, str):
-                    record = record.encode("iso-8859-1")
-                val += record
-        return val
+            buffer.write(
+                field.formatter(self._get_layout_field_value(field, obj_merge))
+            )
+
+    def _export_line_process(self, obj, line):
+        """Export the records of the configuration line for the object. Only
+        used when a module overrides how the lines are exported.
+
+        :return: The records as bytes.
+        """
+        field = self._get_export_layout(line.export_config_id).fields[line.id]
+        buffer = io.BytesIO()
+        obj_list = self._get_layout_field_objects(field, obj)
+        if field.export_type == "subconfig":
+            for obj_merge in obj_list:
+                self._write_config(buffer, obj_merge, line.subconfig_id)
+            return buffer.getvalue()
+        for obj_merge in obj_list:
+            record = self._export_simple_record(
+                line, self._get_layout_field_value(field, obj_merge)
+            )
+            if isinstance(record, str):
+                record = record.encode("iso-8859-1")
+            buffer.write(record)
+        return buffer.getvalue()
+
+    def _export_expression_value(self, expression, obj):
+        result = self._eval_export_expression(expression, obj)
+        return result and str(result) or ""
 
     def _export_simple_record(self, line, val):
         if line.export_type == "string":
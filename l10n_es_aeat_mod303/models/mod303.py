@@ -580,37 +580,25 @@ class L10nEsAeatMod303Report(models.Model):
                 )
             )
 
-    def _get_tax_lines(self, date_start, date_end, map_line):
+    def _get_tax_line_period(self, map_line):
         """Don't populate results for fields 79-99 for reports different from
-        last of the year one or when not exonerated of presenting model 390.
+        last of the year one or when not exonerated of presenting model 390,
+        and use the full year for them otherwise.
         """
+        period = super()._get_tax_line_period(map_line)
         if 79 <= map_line.field_number <= 99 or map_line.field_number == 125:
             if (
                 self.exonerated_390 == "2"
                 or not self.has_operation_volume
                 or self.period_type not in ("4T", "12")
             ):
-                return self.env["account.move.line"]
-        return super()._get_tax_lines(
-            date_start,
-            date_end,
-            map_line,
-        )
-
-    def _get_move_line_domain(self, date_start, date_end, map_line):
-        """Changes dates to full year when the summary on last report of the
-        year for the corresponding fields. Only field number is checked as
-        the complete check for not bringing results is done on
-        `_get_tax_lines`.
-        """
-        if 79 <= map_line.field_number <= 99 or map_line.field_number == 125:
-            date_start = date_start.replace(day=1, month=1)
-            date_end = date_end.replace(day=31, month=12)
-        return super()._get_move_line_domain(
-            date_start,
-            date_end,
-            map_line,
-        )
+                return None
+            date_start, date_end = period
+            period = (
+                date_start.replace(day=1, month=1),
+                date_end.replace(day=31, month=12),
+            )
+        return period
 
     def _prepare_regularization_extra_move_lines(self):
         """Include behavior for the regularization of the fees to compensate."""
@@ -574,6 +574,65 @@ class TestL10nEsAeatMod303(TestL10nEsAeatMod303Base):
         self.model303_4t.period_type = "1T"
         self.assertEqual(self.model303_4t.exonerated_390, "2")
 
+    def test_model_303_single_scan(self):
+        """Tax lines computed scanning the period once are the same as the ones
+        got from the move lines searched for each mapping line."""
+        self.model303.button_calculate()
+        self.assertTrue(sum(self.model303.tax_line_ids.mapped("move_line_count")))
+        for tax_line in self.model303.tax_line_ids:
+            move_lines = self.env["account.move.line"].search(
+                tax_line._get_move_line_domain()
+            )
+            self.assertEqual(tax_line.move_line_ids, move_lines)
+            self.assertEqual(tax_line.move_line_count, len(move_lines))
+            self.assertAlmostEqual(
+                tax_line.move_line_balance, sum(move_lines.mapped("balance")), 2
+            )
+            self.assertAlmostEqual(
+                tax_line.amount,
+                tax_line.map_line_id._get_amount_from_moves(move_lines),
+                2,
+            )
+
+    def test_model_303_incremental_recalculation(self):
+        """Recalculating only with the changed journal entries gives the same
+        tax lines as a full calculation."""
+        self.model303.button_calculate()
+        sale = self._invoice_sale_create("2024-01-14")
+        self._invoice_purchase_create("2024-01-15")
+        sale.button_draft()
+        changes = self.env["l10n.es.aeat.move.change"].search(
+            [("id", "not in", self.model303.applied_move_change_ids)]
+        )
+        self.assertEqual(changes.mapped("sign"), [1, 1, -1])
+        # The tax lines don't match their journal items until recalculated
+        with self.assertRaises(exceptions.UserError):
+            self.model303.tax_line_ids.get_calculated_move_lines()
+        self.model303.button_recalculate()
+        self.model303.tax_line_ids._check_move_lines_unchanged()
+        self.assertTrue(
+            set(changes.ids) <= set(self.model303.applied_move_change_ids)
+        )
+        values = {
+            tax_line.map_line_id: (tax_line.amount, tax_line.move_line_count)
+            for tax_line in self.model303.tax_line_ids
+        }
+        self.model303.with_context(aeat_full_recalculation=True).button_recalculate()
+        for tax_line in self.model303.tax_line_ids:
+            amount, count = values[tax_line.map_line_id]
+            self.assertAlmostEqual(tax_line.amount, amount, 2)
+            self.assertEqual(tax_line.move_line_count, count)
+        # Reports calculated before recording the changes are scanned again
+        map_lines = self.model303.tax_line_ids.map_line_id
+        self.assertTrue(self.model303._can_recalculate_incrementally(map_lines))
+        self.env.cr.execute(
+            f"UPDATE {self.model303._table} SET applied_move_change_ids = NULL "
+            "WHERE id = %s",
+            (self.model303.id,),
+        )
+        self.model303.invalidate_recordset(["applied_move_change_ids"])
+        self.assertFalse(self.model303._can_recalculate_incrementally(map_lines))
+
     @classmethod
     def change_taxes_negative_special_case(cls):
         cls.taxes_sale = {
@@ -3,13 +3,19 @@
 {
     "name": "Base report xlsx",
     "summary": "Base module to create xlsx report",
-    "author": "ACSONE SA/NV," "Creu Blanca," "OCA (OCA)",
+    "author": "ACSONE SA/NV,Creu Blanca,OCA (OCA)",
     "website": "https://github.com/OCA/reporting-engine",
     "category": "Reporting",
-    "version": "18.0.1.1.2",
+    "version": "18.0.1.2.0",
     "development_status": "Mature",
     "license": "AGPL-3",
     "depends": ["base", "web"],
+    "data": [
+        "security/ir.model.access.csv",
+        "security/report_xlsx_security.xml",
+        "data/ir_cron.xml",
+        "views/report_xlsx_job_views.xml",
+    ],
     "demo": ["demo/report.xml"],
     "installable": True,
     "assets": {
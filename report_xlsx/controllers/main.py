@@ -50,6 +50,58 @@ class ReportController(ReportController):
             return request.make_response(xlsx, headers=xlsxhttpheaders)
         return super().report_routes(reportname, docids, converter, **data)
 
+    def _get_xlsx_report_params(self, url, context=None):
+        """Parse the url of a xlsx report download request into the report
+        name, the record ids, the report data and the rendering context."""
+        reportname = url.split("/report/xlsx/")[1].split("?")[0]
+        docids = None
+        data = {}
+        if "/" in reportname:
+            reportname, docids = reportname.split("/")
+            docids = [int(i) for i in docids.split(",")]
+        else:
+            data = dict(url_decode(url.split("?")[1]).items())
+        if data.get("options"):
+            data.update(json.loads(data.pop("options")))
+        context = dict(request.env.context, **json.loads(context or "{}"))
+        if data.get("context"):
+            data["context"] = json.loads(data["context"])
+            context.update(data["context"])
+        return reportname, docids, data, context
+
+    @route("/report/xlsx/enqueue", type="json", auth="user")
+    def report_xlsx_enqueue(self, data, context=None):
+        """Queue the rendering of a xlsx report, returning the status of the
+        job, which is already done when identical results are cached."""
+        url = json.loads(data)[0]
+        reportname, docids, data, context = self._get_xlsx_report_params(url, context)
+        report = request.env["ir.actions.report"]._get_report_from_name(reportname)
+        name = context.get("report_file") or report.name or reportname
+        if docids and report.print_report_name and len(docids) == 1:
+            obj = request.env[report.model].browse(docids)
+            name = safe_eval(report.print_report_name, {"object": obj, "time": time})
+        job = (
+            request.env["report.xlsx.job"]
+            .with_context(**context)
+            ._enqueue(reportname, docids, data, name=name)
+        )
+        return job._get_status()
+
+    @route("/report/xlsx/job/<int:job_id>/status", type="json", auth="user")
+    def report_xlsx_job_status(self, job_id):
+        return request.env["report.xlsx.job"].browse(job_id)._get_status()
+
+    @route("/report/xlsx/job/<int:job_id>/download", type="http", auth="user")
+    def report_xlsx_job_download(self, job_id, **kwargs):
+        job = request.env["report.xlsx.job"].browse(job_id)
+        if job.state != "done":
+            return request.not_found()
+        return (
+            request.env["ir.binary"]
+            ._get_stream_from(job.attachment_id)
+            .get_response(as_attachment=True)
+        )
+
     @route()
     def report_download(self, data, context=None, token=None, readonly=True):
         requestcontent = json.loads(data)
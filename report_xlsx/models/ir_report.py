@@ -15,6 +15,15 @@ class ReportAction(models.Model):
     report_type = fields.Selection(
         selection_add=[("xlsx", "XLSX")], ondelete={"xlsx": "set default"}
     )
+    xlsx_background = fields.Boolean(
+        string="Render in Background",
+        help="Render the XLSX report in a background job instead of the "
+        "HTTP request. The generated file is reused for identical requests "
+        "until the reported records change.",
+    )
+
+    def _get_readable_fields(self):
+        return super()._get_readable_fields() | {"xlsx_background"}
 
     @api.model
     def _render_xlsx(self, report_ref, docids, data):
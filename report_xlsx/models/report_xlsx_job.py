@@ -0,0 +1,289 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
+
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from psycopg2 import errors
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# Advisory lock class held by the worker rendering a job for as long as it
+# runs, so that the jobs of workers killed meanwhile can be told apart
+JOB_LOCK_KEY = 0x584C5358
+# Renders of a job interrupted by the death of its worker, like when the
+# time or memory limits are hit, before it is flagged as failed
+JOB_MAX_ATTEMPTS = 3
+
+
+class ReportXlsxJob(models.Model):
+    """XLSX report rendered in the background.
+
+    Done jobs keep the generated file as an attachment and act as a cache
+    for identical requests (same report, records, options and user) for as
+    long as the records the report depends on are left unchanged.
+    """
+
+    _name = "report.xlsx.job"
+    _description = "XLSX Report Job"
+    _order = "id desc"
+
+    name = fields.Char(required=True)
+    report_name = fields.Char(required=True, index=True)
+    docids = fields.Json()
+    data = fields.Json()
+    context = fields.Json()
+    cache_key = fields.Char(required=True, index=True, copy=False)
+    cache_fingerprint = fields.Char(copy=False)
+    state = fields.Selection(
+        selection=[
+            ("pending", "Pending"),
+            ("running", "Running"),
+            ("done", "Done"),
+            ("failed", "Failed"),
+        ],
+        default="pending",
+        required=True,
+        index=True,
+        copy=False,
+    )
+    progress = fields.Float(copy=False)
+    attempts = fields.Integer(readonly=True, copy=False)
+    error = fields.Text(copy=False)
+    attachment_id = fields.Many2one(
+        comodel_name="ir.attachment", readonly=True, copy=False
+    )
+    date_done = fields.Datetime(readonly=True, copy=False)
+    user_id = fields.Many2one(
+        comodel_name="res.users",
+        required=True,
+        default=lambda self: self.env.user,
+        index=True,
+    )
+    company_id = fields.Many2one(
+        comodel_name="res.company",
+        required=True,
+        default=lambda self: self.env.company,
+    )
+
+    @api.model
+    def _get_report_model(self, report_name):
+        report = self.env["ir.actions.report"]._get_report_from_name(report_name)
+        return self.env[f"report.{report_name}"].with_context(
+            active_model=report.model or self.env.context.get("active_model")
+        )
+
+    @api.model
+    def _get_cache_key(self, report_name, docids, data):
+        report_model = self._get_report_model(report_name)
+        key_values = {
+            "report_name": report_name,
+            "uid": self.env.uid,
+            "lang": self.env.context.get("lang"),
+            "company_ids": self.env.companies.ids,
+            "values": report_model._get_report_cache_key_values(docids, data),
+        }
+        return hashlib.sha256(
+            json.dumps(key_values, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    @api.model
+    def _enqueue(self, report_name, docids, data, name=None):
+        """Return the job rendering the requested report.
+
+        An up to date job for the same request is returned as is, so that
+        repeated requests are served from its attachment, or wait for the
+        render that is already in progress.
+        """
+        cache_key = self._get_cache_key(report_name, docids, data)
+        jobs = self.search(
+            [
+                ("cache_key", "=", cache_key),
+                ("user_id", "=", self.env.uid),
+                ("state", "in", ("pending", "running", "done")),
+            ]
+        )
+        jobs.filtered(lambda j: j.state == "running")._requeue_dead()
+        for job in jobs:
+            if job.state != "done" or job._is_cache_valid():
+                return job
+        job = self.create(
+            {
+                "name": name or report_name,
+                "report_name": report_name,
+                "docids": docids,
+                "data": data,
+                "context": dict(self.env.context),
+                "cache_key": cache_key,
+            }
+        )
+        self.env.ref("report_xlsx.ir_cron_report_xlsx_job").sudo()._trigger()
+        return job
+
+    def _get_render_env(self):
+        self.ensure_one()
+        context = dict(self.context or {}, report_xlsx_job_id=self.id)
+        return self.env(user=self.user_id.id, context=context, su=False)
+
+    def _compute_cache_fingerprint(self):
+        self.ensure_one()
+        env = self._get_render_env()
+        return (
+            env["report.xlsx.job"]
+            ._get_report_model(self.report_name)
+            ._get_report_cache_fingerprint(self.docids, self.data)
+        )
+
+    def _is_cache_valid(self):
+        self.ensure_one()
+        return bool(
+            self.attachment_id
+            and self.cache_fingerprint == self._compute_cache_fingerprint()
+        )
+
+    def _set_progress(self, progress):
+        """Publish the rendering progress while the job transaction is still
+        running."""
+        self.ensure_one()
+        with self.env.registry.cursor() as cr:
+            cr.execute(
+                SQL(
+                    "UPDATE report_xlsx_job SET progress = %s WHERE id = %s",
+                    progress,
+                    self.id,
+                )
+            )
+
+    def _render(self):
+        self.ensure_one()
+        env = self._get_render_env()
+        report = env["ir.actions.report"]._get_report_from_name(self.report_name)
+        return report.with_context(report_name=self.report_name)._render_xlsx(
+            self.report_name, self.docids, self.data
+        )[0]
+
+    def _process(self):
+        for job in self:
+            # Taken before rendering so that any change done in the meantime
+            # invalidates the result
+            fingerprint = job._compute_cache_fingerprint()
+            try:
+                with self.env.cr.savepoint():
+                    content = job._render()
+            except Exception as e:
+                _logger.exception("Error while generating report %s", job.name)
+                job.write({"state": "failed", "error": str(e)})
+                continue
+            attachment = self.env["ir.attachment"].create(
+                {
+                    "name": f"{job.name}.xlsx",
+                    "raw": content,
+                    "res_model": job._name,
+                    "res_id": job.id,
+                    "mimetype": "application/vnd.openxmlformats-"
+                    "officedocument.spreadsheetml.sheet",
+                }
+            )
+            job.write(
+                {
+                    "state": "done",
+                    "progress": 100.0,
+                    "attachment_id": attachment.id,
+                    "cache_fingerprint": fingerprint,
+                    "date_done": fields.Datetime.now(),
+                }
+            )
+
+    def _requeue_dead(self):
+        """Give the running jobs whose worker died back to the queue, or flag
+        them as failed once they have been tried `JOB_MAX_ATTEMPTS` times."""
+        requeued = False
+        for job in self.sudo().filtered(lambda j: j.state == "running"):
+            try:
+                with self.env.cr.savepoint():
+                    # Only granted when no worker holds the lock of the job
+                    self.env.cr.execute(
+                        "SELECT pg_try_advisory_xact_lock(%s, %s)",
+                        (JOB_LOCK_KEY, job.id),
+                    )
+                    if not self.env.cr.fetchone()[0]:
+                        continue
+                    _logger.warning("Worker rendering report %s died", job.name)
+                    if job.attempts >= JOB_MAX_ATTEMPTS:
+                        job.write(
+                            {
+                                "state": "failed",
+                                "error": self.env._(
+                                    "The report rendering was interrupted %s "
+                                    "times.",
+                                    job.attempts,
+                                ),
+                            }
+                        )
+                    else:
+                        job.write({"state": "pending", "progress": 0.0})
+                        requeued = True
+            except errors.SerializationFailure:
+                # Its worker just finished it
+                continue
+        if requeued:
+            self.env.ref("report_xlsx.ir_cron_report_xlsx_job").sudo()._trigger()
+
+    @api.model
+    def _cron_process_jobs(self):
+        self.search([("state", "=", "running")])._requeue_dead()
+        self.env.cr.commit()  # pylint: disable=invalid-commit
+        while True:
+            self.env.cr.execute(
+                """
+                SELECT id FROM report_xlsx_job
+                WHERE state = 'pending'
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+                """
+            )
+            row = self.env.cr.fetchone()
+            if not row:
+                break
+            job = self.browse(row[0])
+            # Held across the commits until the job is processed, and released
+            # by the database if the worker dies
+            self.env.cr.execute(
+                "SELECT pg_advisory_lock(%s, %s)", (JOB_LOCK_KEY, job.id)
+            )
+            try:
+                job.write({"state": "running", "attempts": job.attempts + 1})
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+                job._process()
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+            finally:
+                self.env.cr.rollback()
+                self.env.cr.execute(
+                    "SELECT pg_advisory_unlock(%s, %s)", (JOB_LOCK_KEY, job.id)
+                )
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+
+    def _get_status(self):
+        self.ensure_one()
+        if self.state == "running":
+            self._requeue_dead()
+        return {
+            "id": self.id,
+            "name": self.name,
+            "state": self.state,
+            "progress": self.progress,
+            "error": self.error,
+        }
+
+    @api.autovacuum
+    def _gc_jobs(self):
+        """Drop the jobs older than a week, with their files."""
+        limit_date = fields.Datetime.now() - timedelta(days=7)
+        jobs = self.sudo().search([("create_date", "<", limit_date)])
+        jobs.attachment_id.unlink()
+        jobs.unlink()
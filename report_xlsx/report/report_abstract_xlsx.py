@@ -1,11 +1,13 @@
 # Copyright 2015 ACSONE SA/NV (<http://acsone.eu>)
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
+import json
 import logging
 import re
 from io import BytesIO
 
 from odoo import models
+from odoo.tools import SQL
 
 _logger = logging.getLogger(__name__)
 
@@ -98,6 +100,46 @@ class ReportXlsxAbstract(models.AbstractModel):
         s_after = f" {currency.symbol}" if currency.position == "after" else ""
         return f"{f'{s_before}'}#,##0.{'0' * currency.decimal_places}{f'{s_after}'}"
 
+    def _get_report_cache_key_values(self, docids, data):
+        """Values identifying a report request when rendered in the background.
+        Reports working on transient records (wizards) should return the
+        options of the wizard instead of its ids."""
+        return {"docids": sorted(docids or []), "data": data}
+
+    def _get_report_cache_dependencies(self, docids, data):
+        """Return a list of ``(model_name, ids)`` the report content depends on,
+        ``ids`` being ``None`` for the whole table. A cached report is
+        rendered again as soon as one of these records is created, modified or
+        deleted."""
+        objs = self._get_objs_for_report(docids, data)
+        return [(objs._name, objs.ids)]
+
+    def _get_report_cache_fingerprint(self, docids, data):
+        fingerprint = []
+        for model_name, ids in self._get_report_cache_dependencies(docids, data):
+            model = self.env[model_name]
+            model.flush_model()
+            # Rows are counted for deletions, and every write moves the write
+            # date of its row forward, as a row can't be updated by a
+            # transaction started before its last update was committed
+            query = SQL(
+                "SELECT COUNT(*), MAX(write_date), "
+                "SUM(EXTRACT(EPOCH FROM write_date)) FROM %s",
+                SQL.identifier(model._table),
+            )
+            if ids is not None:
+                query = SQL("%s WHERE id = ANY(%s)", query, list(ids))
+            self.env.cr.execute(query)
+            fingerprint.append([model_name, *self.env.cr.fetchone()])
+        return json.dumps(fingerprint, default=str)
+
+    def _report_xlsx_progress(self, progress):
+        """Report the progress, as a percentage, of a report rendered in the
+        background."""
+        job_id = self.env.context.get("report_xlsx_job_id")
+        if job_id:
+            self.env["report.xlsx.job"].browse(job_id)._set_progress(progress)
+
     def create_xlsx_report(self, docids, data):
         objs = self._get_objs_for_report(docids, data)
         file_data = BytesIO()
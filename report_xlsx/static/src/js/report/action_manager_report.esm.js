@@ -1,7 +1,26 @@
+import {_t} from "@web/core/l10n/translation";
 import {download} from "@web/core/network/download";
 import {registry} from "@web/core/registry";
+import {rpc} from "@web/core/network/rpc";
 import {user} from "@web/core/user";
 
+const JOB_POLL_DELAY = 2000;
+
+async function downloadXlsxJob(job, env) {
+    while (job.state === "pending" || job.state === "running") {
+        await new Promise((resolve) => setTimeout(resolve, JOB_POLL_DELAY));
+        job = await rpc(`/report/xlsx/job/${job.id}/status`);
+    }
+    if (job.state === "failed") {
+        env.services.notification.add(job.error || job.name, {
+            title: _t("The report could not be generated"),
+            type: "danger",
+        });
+        return;
+    }
+    await download({url: `/report/xlsx/job/${job.id}/download`, data: {}});
+}
+
 registry
     .category("ir.actions.report handlers")
     .add("xlsx_handler", async function (action, options, env) {
@@ -24,17 +43,33 @@ registry
                     url += `?context=${context}`;
                 }
             }
-            env.services.ui.block();
-            try {
-                await download({
-                    url: "/report/download",
-                    data: {
-                        data: JSON.stringify([url, action.report_type]),
-                        context: JSON.stringify(user.context),
-                    },
+            if (action.xlsx_background || actionContext.report_xlsx_background) {
+                const job = await rpc("/report/xlsx/enqueue", {
+                    data: JSON.stringify([url, action.report_type]),
+                    context: JSON.stringify(user.context),
                 });
-            } finally {
-                env.services.ui.unblock();
+                if (job.state !== "done") {
+                    env.services.notification.add(
+                        _t(
+                            "The report is being generated in the background, it will be downloaded when ready."
+                        ),
+                        {type: "info"}
+                    );
+                }
+                downloadXlsxJob(job, env);
+            } else {
+                env.services.ui.block();
+                try {
+                    await download({
+                        url: "/report/download",
+                        data: {
+                            data: JSON.stringify([url, action.report_type]),
+                            context: JSON.stringify(user.context),
+                        },
+                    });
+                } finally {
+                    env.services.ui.unblock();
+                }
             }
             const onClose = options.onClose;
             if (action.close_on_report_download) {
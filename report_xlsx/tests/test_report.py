@@ -73,3 +73,26 @@ class TestReport(common.TransactionCase):
         self.assertEqual(
             self.xlsx_report._report_xlsx_currency_format(eur), "#,##0.00 €"
         )
+
+    def test_background_job(self):
+        self.report.xlsx_background = True
+        job_model = self.env["report.xlsx.job"]
+        job = job_model._enqueue(self.report_name, self.docs.ids, {})
+        self.assertEqual(job.state, "pending")
+        # An identical request waits for the same job
+        self.assertEqual(job_model._enqueue(self.report_name, self.docs.ids, {}), job)
+        job._process()
+        self.assertEqual(job.state, "done")
+        wb = open_workbook(file_contents=job.attachment_id.raw)
+        self.assertEqual(wb.sheet_by_index(0).cell(0, 0).value, self.docs.name)
+        # Served from cache until the reported records change
+        self.assertEqual(job_model._enqueue(self.report_name, self.docs.ids, {}), job)
+        self.docs.write({"name": "Changed name"})
+        new_job = job_model._enqueue(self.report_name, self.docs.ids, {})
+        self.assertNotEqual(new_job, job)
+        self.assertEqual(new_job.state, "pending")
+        # A job left running by a dead worker is queued again, then failed
+        new_job.write({"state": "running", "attempts": 1})
+        self.assertEqual(new_job._get_status()["state"], "pending")
+        new_job.write({"state": "running", "attempts": 3})
+        self.assertEqual(new_job._get_status()["state"], "failed")
@@ -18,12 +18,14 @@ class ReportXlsxAbstract(models.AbstractModel):
 
     def generate_xlsx_report(self, workbook, data, objects):
         self._define_formats(workbook)
-        for ws_params in self._get_ws_params(workbook, data, objects):
+        ws_params_list = self._get_ws_params(workbook, data, objects)
+        for i, ws_params in enumerate(ws_params_list):
             ws_name = ws_params.get("ws_name")
             ws_name = self._check_ws_name(ws_name)
             ws = workbook.add_worksheet(ws_name)
             generate_ws_method = getattr(self, ws_params["generate_ws_method"])
             generate_ws_method(workbook, ws, ws_params, data, objects)
+            self._report_xlsx_progress(100.0 * (i + 1) / len(ws_params_list))
 
     def _check_ws_name(self, name, sanitize=True):
         pattern = re.compile(r"[/\\*\[\]:?]")  # invalid characters: /\*[]:?
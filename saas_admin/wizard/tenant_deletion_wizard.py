@@ -38,30 +38,25 @@ class TenantDeletionWizard(models.TransientModel):
         if not self.confirm_deletion:
             raise UserError(_('Please confirm the deletion by checking the confirmation box'))
         
-        try:
-            # Call provisioning service to delete tenant
-            provisioning_service = self.env['saas.provisioning.service']
-            provisioning_service.delete_tenant(
-                subscription_id=self.subscription_id.id,
-                backup=self.create_backup
+        if not self.subscription_id.database_name:
+            raise UserError(_('Deletion failed: %s') % _('No database to delete'))
+        
+        # Deleted by a tenant job, retried if the backup or the drop fails
+        self.env['saas.tenant.job']._enqueue(self.subscription_id, 'delete', backup=self.create_backup)
+        
+        # Log deletion reason
+        if self.deletion_reason:
+            self.subscription_id.message_post(
+                body=_('Manual deletion. Reason: %s') % self.deletion_reason
             )
-            
-            # Log deletion reason
-            if self.deletion_reason:
-                self.subscription_id.message_post(
-                    body=_('Manual deletion. Reason: %s') % self.deletion_reason
-                )
-            
-            return {
-                'type': 'ir.actions.client',
-                'tag': 'display_notification',
-                'params': {
-                    'title': _('Success'),
-                    'message': _('Tenant deleted successfully'),
-                    'type': 'success',
-                    'sticky': False,
-                }
+        
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Success'),
+                'message': _('Tenant deletion scheduled'),
+                'type': 'success',
+                'sticky': False,
             }
-            
-        except Exception as e:
-            raise UserError(_('Deletion failed: %s') % str(e))
+        }
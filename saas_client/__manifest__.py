@@ -19,6 +19,8 @@
     'website': 'https://abc.com',
     'depends': ['base', 'odoo_url_replacer', 'sales_team', 'web', 'portal', 'mail', 'account', 'l10n_es'],
     'data': [
+        'security/ir.model.access.csv',
+        'data/ir_cron.xml',
         'views/res_config_settings_views.xml',
         'views/login_templates.xml',
         'views/onboarding_templates.xml',
@@ -4,3 +4,4 @@ from . import ir_attachment
 from . import res_config_settings
 from . import ir_http
 from . import res_company
+from . import saas_usage_counter
@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
-from odoo import models
+from odoo import models, api, tools
 from odoo.http import request
 from werkzeug.utils import redirect
 import logging
+import re
 
 _logger = logging.getLogger(__name__)
 
@@ -50,15 +51,48 @@ class IrHttp(models.AbstractModel):
 
     SAAS_RESTRICTED_ACTION_IDS = {'1', '2', '30'}
 
+    # Paths never redirected, to avoid parse errors on JSON-RPC and assets
+    SAAS_BYPASS_PATHS = ('/jsonrpc', '/web/dataset/call_kw', '/web/session/', '/web/webclient/translations', '/website/translations', '/web/static', '/website/static')
+
     # ---------------------------------------------------------------------------
     # Helpers
     # ---------------------------------------------------------------------------
 
+    @classmethod
+    def _get_saas_restriction_matcher(cls):
+        """
+        Single regex matching every restricted path, compiled once per
+        registry (each registry has its own ir.http class). The name of the
+        matched group tells which rule blocked the path:
+
+            prefix   SAAS_RESTRICTED_PREFIXES, as the whole path or a parent
+            segment  any segment in SAAS_RESTRICTED_SEGMENTS
+            action   any action-<token> segment
+        """
+        matcher = cls.__dict__.get('_saas_restriction_matcher')
+        if matcher is None:
+            prefixes = '|'.join(re.escape(p) for p in cls.SAAS_RESTRICTED_PREFIXES)
+            segments = '|'.join(re.escape(s) for s in cls.SAAS_RESTRICTED_SEGMENTS)
+            # Every action-* segment is blocked, so the explicit action sets
+            # don't need to be part of the pattern
+            matcher = re.compile(
+                rf'(?P<prefix>^(?:{prefixes})(?:/|$))'
+                rf'|(?P<segment>(?:^|/)(?:{segments})(?:/|$))'
+                rf'|(?P<action>(?:^|/)action-)'
+            )
+            cls._saas_restriction_matcher = matcher
+        return matcher
+
+    @classmethod
+    def _get_saas_restriction(cls, path):
+        """Return the rule blocking the path ('prefix', 'segment' or 'action'), or None."""
+        match = cls._get_saas_restriction_matcher().search(path)
+        return match.lastgroup if match else None
+
     @classmethod
     def _path_has_restricted_segment(cls, path):
         """
-        Split the URL path by '/' and check whether ANY segment matches a
-        restricted keyword.
+        Check whether ANY segment of the URL path matches a restricted keyword.
 
         Examples that are all caught:
             /odoo/system-parameters
@@ -68,14 +102,12 @@ class IrHttp(models.AbstractModel):
             /odoo/apps
             /odoo/crm/apps
         """
-        segments = set(path.strip('/').split('/'))
-        return bool(segments & cls.SAAS_RESTRICTED_SEGMENTS)
+        return cls._get_saas_restriction(path) == 'segment'
 
     @classmethod
     def _path_has_restricted_action(cls, path):
         """
-        Check every segment of the path for the pattern  'action-<token>'
-        and return True if that token is blocked.
+        Check every segment of the path for the pattern  'action-<token>'.
 
         Catches both:
             /odoo/action-30
@@ -84,20 +116,23 @@ class IrHttp(models.AbstractModel):
 
         Using a catch-all: every action-* segment is blocked because
         tenants should not access any technical actions directly via URL.
-        Remove the catch-all `return True` at the bottom and rely only on the
-        explicit sets if you need to whitelist some actions later.
+        Restrict the `action` group of the matcher to SAAS_RESTRICTED_ACTION_IDS
+        and SAAS_RESTRICTED_ACTION_XMLIDS if you need to whitelist some
+        actions later.
+        """
+        return cls._get_saas_restriction(path) == 'action'
+
+    @api.model
+    @tools.ormcache()
+    def _get_saas_subscription_status(self):
         """
-        for segment in path.strip('/').split('/'):
-            if not segment.startswith('action-'):
-                continue
-            token = segment[len('action-'):]   # everything after "action-"
-            if token in cls.SAAS_RESTRICTED_ACTION_IDS:
-                return True
-            if token in cls.SAAS_RESTRICTED_ACTION_XMLIDS:
-                return True
-            # Catch-all: block ANY action-* segment
-            return True
-        return False
+        Subscription status pushed by the SaaS Manager, cached in the worker.
+
+        The manager pushes the status with set_param, which clears the caches
+        of the registry and signals it to the other workers of the tenant,
+        so the cache is invalidated on every push.
+        """
+        return self.env['ir.config_parameter'].sudo().get_param('saas.subscription_status', 'active')
 
     # ---------------------------------------------------------------------------
     # Main dispatch override
@@ -113,34 +148,19 @@ class IrHttp(models.AbstractModel):
                 # --------------------------------------------------------------
                 # 0. Bypass redirects for JSON-RPC and specific frontend paths to avoid parse errors
                 # --------------------------------------------------------------
-                bypass_paths = ('/jsonrpc', '/web/dataset/call_kw', '/web/session/', '/web/webclient/translations', '/website/translations', '/web/static', '/website/static')
-                
-                if request.httprequest.mimetype == 'application/json' or any(path.startswith(bp) for bp in bypass_paths):
+                if request.httprequest.mimetype == 'application/json' or path.startswith(cls.SAAS_BYPASS_PATHS):
                     return super(IrHttp, cls)._dispatch(endpoint)
 
 
                 # --------------------------------------------------------------
-                # 1. Fixed prefix block (legacy / web routes)
-                # --------------------------------------------------------------
-                for rp in cls.SAAS_RESTRICTED_PREFIXES:
-                    if path == rp or path.startswith(rp + '/'):
-                        _logger.info("SaaS: blocked restricted prefix '%s'", path)
-                        return redirect('/odoo')
-
-                # --------------------------------------------------------------
-                # 2. Segment-based block  — catches nested paths like
-                #    /odoo/crm/system-parameters  or  /odoo/sale/apps
-                # --------------------------------------------------------------
-                if cls._path_has_restricted_segment(path):
-                    _logger.info("SaaS: blocked restricted segment in '%s'", path)
-                    return redirect('/odoo')
-
-                # --------------------------------------------------------------
-                # 3. Action-URL block  — catches /odoo/action-30 AND
-                #    nested variants like /odoo/crm/action-30
+                # 1-3. Restricted paths, matched by a single compiled regex:
+                #    fixed prefixes (legacy / web routes), segments in nested
+                #    paths like /odoo/crm/system-parameters or /odoo/sale/apps,
+                #    and action URLs like /odoo/action-30 or /odoo/crm/action-30
                 # --------------------------------------------------------------
-                if cls._path_has_restricted_action(path):
-                    _logger.info("SaaS: blocked restricted action URL '%s'", path)
+                restriction = cls._get_saas_restriction(path)
+                if restriction:
+                    _logger.info("SaaS: blocked restricted %s in '%s'", restriction, path)
                     return redirect('/odoo')
 
                 # --------------------------------------------------------------
@@ -164,9 +184,7 @@ class IrHttp(models.AbstractModel):
                 # 5. Subscription suspended check
                 # --------------------------------------------------------------
                 if not path.startswith('/web/static'):
-                    status = request.env['ir.config_parameter'].sudo().get_param(
-                        'saas.subscription_status', 'active'
-                    )
+                    status = request.env['ir.http']._get_saas_subscription_status()
                     if status == 'suspended' and not path.startswith('/suspended'):
                         return redirect('/suspended')
 
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+
+# Counter of the size in bytes of all the attachments
+STORAGE_BYTES = 'storage_bytes'
+
+
+class SaaSUsageCounter(models.Model):
+    """
+    Usage counters of the tenant, kept as rows of deltas so that concurrent
+    transactions never update the same row. The value of a counter is the sum
+    of its rows, which a cron compacts back to a single exact row.
+
+    The SaaS Manager reads this table with plain SQL, without loading the
+    tenant registry.
+    """
+    _name = 'saas.usage.counter'
+    _description = 'SaaS Usage Counter'
+    _auto = False
+    _log_access = False
+
+    key = fields.Char(string='Counter', readonly=True)
+    value = fields.Integer(string='Value', readonly=True)
+
+    def init(self):
+        # bigint column, as storage counters exceed the integer range
+        self.env.cr.execute("""
+            CREATE TABLE IF NOT EXISTS saas_usage_counter (
+                id SERIAL PRIMARY KEY,
+                key VARCHAR NOT NULL,
+                value BIGINT NOT NULL
+            )
+        """)
+        self.env.cr.execute("CREATE INDEX IF NOT EXISTS saas_usage_counter_key_index ON saas_usage_counter (key)")
+        self.env.cr.execute("SELECT 1 FROM saas_usage_counter WHERE key = %s LIMIT 1", (STORAGE_BYTES,))
+        if not self.env.cr.fetchone():
+            self._compact(STORAGE_BYTES)
+
+    @api.model
+    def _get_exact_values(self):
+        """Queries computing the exact value of each counter"""
+        return {
+            STORAGE_BYTES: "SELECT COALESCE(SUM(file_size), 0) FROM ir_attachment",
+        }
+
+    @api.model
+    def _add(self, key, delta):
+        if delta:
+            self.env.cr.execute("INSERT INTO saas_usage_counter (key, value) VALUES (%s, %s)", (key, delta))
+
+    @api.model
+    def _get(self, key):
+        self.env.cr.execute("SELECT COALESCE(SUM(value), 0) FROM saas_usage_counter WHERE key = %s", (key,))
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _compact(self, key):
+        """
+        Replace the deltas of the counter by its exact value.
+
+        Deltas committed by concurrent transactions are neither deleted nor
+        included in the exact value, as both statements see the same snapshot.
+        """
+        self.env.cr.execute("DELETE FROM saas_usage_counter WHERE key = %s", (key,))
+        self.env.cr.execute(
+            "INSERT INTO saas_usage_counter (key, value) SELECT %s, (" + self._get_exact_values()[key] + ")",
+            (key,),
+        )
+
+    @api.model
+    def _cron_compact(self):
+        for key in self._get_exact_values():
+            self._compact(key)
@@ -32,6 +32,7 @@
         'views/saas_addon_views.xml',
         'views/saas_promo_code_views.xml',
         'views/saas_suggestion_views.xml',
+        'views/saas_fleet_run_views.xml',
         'views/saas_subscription_portal_templates.xml',
         'wizards/saas_upgrade_wizard.xml',
     ],
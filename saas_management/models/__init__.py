@@ -6,3 +6,4 @@ from . import saas_subscription
 from . import saas_promo_code
 from . import saas_addon
 from . import saas_suggestion
+from . import saas_fleet_run
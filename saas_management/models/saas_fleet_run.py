@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, _, SUPERUSER_ID
+from odoo.exceptions import UserError
+from odoo.modules.registry import Registry
+from multiprocessing.connection import wait
+from datetime import timedelta
+import odoo.sql_db
+import multiprocessing
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Advisory lock class used for running each fleet run in a single process
+FLEET_RUN_LOCK_KEY = 0x5AA5F1EE
+# Unfinished runs are resumed for this long, older ones are given up on
+FLEET_RUN_RESUME_HOURS = 24
+
+
+def _fleet_worker(db_name, item_id, conn):
+    """Entry point of the process running the operation of one tenant, on
+    its own cursor, committed when the operation succeeds. The result is
+    sent back through `conn`."""
+    # The connections inherited from the parent process are still in use
+    # there: the loaded registries get new ones instead, and the inherited
+    # ones are left untouched, as the process ends without closing them
+    odoo.sql_db._Pool = None
+    for name in list(Registry.registries.keys()):
+        Registry.registries[name]._db = odoo.sql_db.db_connect(name)
+    try:
+        with Registry(db_name).cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            result = env['saas.fleet.run.item'].browse(item_id)._run_operation()
+        conn.send(('done', result or ''))
+    except Exception as e:
+        _logger.exception('Fleet operation failed for item %s', item_id)
+        conn.send(('failed', str(e)))
+    finally:
+        conn.close()
+
+
+class SaaSFleetRun(models.Model):
+    _name = 'saas.fleet.run'
+    _description = 'SaaS Fleet Operation Run'
+    _order = 'id desc'
+
+    name = fields.Char(string='Name', required=True)
+    operation = fields.Selection([
+        ('sync_modules', 'Module Sync'),
+        ('sync_ai_usage', 'Usage Pull'),
+    ], string='Operation', required=True, readonly=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('cancelled', 'Cancelled'),
+    ], string='Status', default='pending', required=True, readonly=True, index=True)
+    item_ids = fields.One2many('saas.fleet.run.item', 'run_id', string='Tenants', readonly=True)
+    max_workers = fields.Integer(
+        string='Parallel Tenants',
+        default=lambda self: int(self.env['ir.config_parameter'].sudo().get_param('saas.fleet_max_workers', 4)),
+        help='Number of tenants processed at the same time, each one in its own process and cursor.',
+    )
+    timeout = fields.Integer(
+        string='Timeout per Tenant (s)',
+        default=lambda self: int(self.env['ir.config_parameter'].sudo().get_param('saas.fleet_timeout', 900)),
+        help='Tenants taking longer are stopped and flagged as timed out.',
+    )
+    date_start = fields.Datetime(string='Started', readonly=True)
+    date_done = fields.Datetime(string='Finished', readonly=True)
+    item_count = fields.Integer(string='Tenants', compute='_compute_item_counts')
+    done_count = fields.Integer(string='Succeeded', compute='_compute_item_counts')
+    failed_count = fields.Integer(string='Failed', compute='_compute_item_counts')
+    progress = fields.Float(string='Progress', compute='_compute_item_counts')
+
+    @api.depends('item_ids.state')
+    def _compute_item_counts(self):
+        for run in self:
+            states = run.item_ids.mapped('state')
+            run.item_count = len(states)
+            run.done_count = states.count('done')
+            run.failed_count = states.count('failed') + states.count('timeout')
+            finished = run.done_count + run.failed_count
+            run.progress = 100.0 * finished / len(states) if states else 0.0
+
+    @api.model
+    def _launch(self, operation, subscriptions, name=None):
+        """Get the run of the operation for the given subscriptions.
+
+        An unfinished run of the same operation on the same tenants is
+        resumed instead of starting a new one, so that interrupted runs
+        don't redo the tenants already processed. Runs unfinished for longer
+        than `FLEET_RUN_RESUME_HOURS` are cancelled instead.
+        """
+        runs = self.search([('operation', '=', operation), ('state', 'in', ('pending', 'running'))])
+        stale = runs.filtered(
+            lambda r: r.create_date < fields.Datetime.now() - timedelta(hours=FLEET_RUN_RESUME_HOURS))
+        stale.action_cancel()
+        for run in runs - stale:
+            if set(run.item_ids.subscription_id.ids) == set(subscriptions.ids):
+                return run
+        operation_label = dict(self._fields['operation']._description_selection(self.env))[operation]
+        return self.create({
+            'name': name or _('%s (%s)') % (operation_label, fields.Datetime.now()),
+            'operation': operation,
+            'item_ids': [(0, 0, {
+                'subscription_id': sub.id,
+                'database_name': sub.database_name,
+            }) for sub in subscriptions],
+        })
+
+    def action_resume(self):
+        self.filtered(lambda r: r.state in ('pending', 'running')).write({'state': 'pending'})
+        self.env.ref('saas_management.cron_fleet_run_process').sudo()._trigger()
+
+    def action_cancel(self):
+        self.filtered(lambda r: r.state in ('pending', 'running')).write({
+            'state': 'cancelled',
+            'date_done': fields.Datetime.now(),
+        })
+
+    @api.model
+    def _cron_process_runs(self):
+        for run in self.search([('state', 'in', ('pending', 'running'))], order='id'):
+            run._execute()
+
+    def _execute(self):
+        """Process the pending tenants of the run, each one in a process with
+        its own cursor, with at most `max_workers` at the same time.
+
+        The state of every tenant is committed as soon as it changes, so that
+        operators can follow the run and an interrupted run can be resumed.
+        """
+        self.ensure_one()
+        cr = self.env.cr
+        # The lock is held on a cursor of its own, that nothing else uses, so
+        # that it can always be released whatever happens to the run cursor
+        lock_cr = self.env.registry.cursor()
+        try:
+            lock_cr.execute('SELECT pg_try_advisory_lock(%s, %s)', (FLEET_RUN_LOCK_KEY, self.id))
+            locked = lock_cr.fetchone()[0]
+            lock_cr.commit()
+            if not locked:
+                _logger.info('Fleet run %s is already being processed', self.id)
+                return
+            try:
+                # Tenants left running by an interrupted execution are redone
+                self.item_ids.filtered(lambda i: i.state == 'running').write({'state': 'pending'})
+                self.write({'state': 'running', 'date_start': self.date_start or fields.Datetime.now()})
+                cr.commit()
+                self._execute_items(self.item_ids.filtered(lambda i: i.state == 'pending'))
+                self.invalidate_recordset(['state'])
+                if self.state == 'running':
+                    self.write({'state': 'done', 'date_done': fields.Datetime.now()})
+                cr.commit()
+            finally:
+                lock_cr.execute('SELECT pg_advisory_unlock(%s, %s)', (FLEET_RUN_LOCK_KEY, self.id))
+                lock_cr.commit()
+        finally:
+            lock_cr.close()
+
+    def _execute_items(self, items):
+        """Run the tenants in at most `max_workers` processes at the same time.
+        The process of a tenant over the timeout is killed, which also ends its
+        database connection, and its slot is only reused once it has exited.
+        """
+        self.ensure_one()
+        cr = self.env.cr
+        pending = list(items)
+        running = {}
+        # Forked, so that the processes reuse the registries already loaded
+        context = multiprocessing.get_context('fork')
+        while pending or running:
+            while pending and len(running) < max(self.max_workers, 1):
+                item = pending.pop(0)
+                item.write({'state': 'running', 'date_start': fields.Datetime.now(), 'error': False})
+                cr.commit()
+                parent_conn, child_conn = context.Pipe(duplex=False)
+                process = context.Process(
+                    target=_fleet_worker,
+                    args=(cr.dbname, item.id, child_conn),
+                    name='fleet_run_%s_item_%s' % (self.id, item.id),
+                    daemon=True,
+                )
+                process.start()
+                child_conn.close()
+                running[item.id] = (process, parent_conn, time.monotonic())
+            ready = wait([conn for process, conn, started in running.values()], timeout=0.2)
+            finished = {}
+            for item_id, (process, conn, started) in running.items():
+                if conn in ready:
+                    try:
+                        status, message = conn.recv()
+                        finished[item_id] = {'state': status, 'result': message if status == 'done' else False,
+                                             'error': message if status != 'done' else False}
+                    except EOFError:
+                        finished[item_id] = {'state': 'failed', 'error': _('The tenant process ended unexpectedly.')}
+                elif self.timeout and time.monotonic() - started > self.timeout:
+                    process.kill()
+                    finished[item_id] = {'state': 'timeout', 'error': _('Stopped after %s seconds.') % self.timeout}
+            for item_id, vals in finished.items():
+                process, conn, started = running.pop(item_id)
+                # Waited for, so that no more processes than allowed ever exist
+                process.join()
+                conn.close()
+                vals['date_done'] = fields.Datetime.now()
+                self.env['saas.fleet.run.item'].browse(item_id).write(vals)
+                cr.commit()
+            # Stop launching new tenants when the run is cancelled meanwhile
+            self.invalidate_recordset(['state'])
+            if self.state == 'cancelled':
+                pending = []
+
+
+class SaaSFleetRunItem(models.Model):
+    _name = 'saas.fleet.run.item'
+    _description = 'SaaS Fleet Operation Tenant'
+    _order = 'id'
+
+    run_id = fields.Many2one('saas.fleet.run', string='Run', required=True, ondelete='cascade', index=True)
+    subscription_id = fields.Many2one('saas.subscription', string='Subscription', ondelete='cascade')
+    database_name = fields.Char(string='Database', readonly=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+        ('timeout', 'Timed Out'),
+    ], string='Status', default='pending', required=True, readonly=True, index=True)
+    date_start = fields.Datetime(string='Started', readonly=True)
+    date_done = fields.Datetime(string='Finished', readonly=True)
+    result = fields.Text(string='Result', readonly=True)
+    error = fields.Text(string='Error', readonly=True)
+
+    def action_retry(self):
+        self.filtered(lambda i: i.state in ('failed', 'timeout')).write({'state': 'pending'})
+        self.run_id.filtered(lambda r: r.state == 'done').write({'state': 'pending', 'date_done': False})
+        self.run_id.action_resume()
+
+    def _run_operation(self):
+        """Run the operation of the run on the tenant. Called in the process
+        of the tenant, on its own cursor.
+
+        :return: Text summarizing the result.
+        """
+        self.ensure_one()
+        if not self.subscription_id:
+            raise UserError(_('The subscription no longer exists.'))
+        return getattr(self.subscription_id, '_fleet_%s' % self.run_id.operation)()
@@ -2,11 +2,15 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.tools import split_every
 from datetime import datetime, timedelta
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Subscriptions processed between two commits of the billing crons
+BILLING_CHUNK_SIZE = 50
+
 
 class SaaSSubscription(models.Model):
 	_name = 'saas.subscription'
@@ -109,6 +113,11 @@ class SaaSSubscription(models.Model):
 	ai_assistant_module = fields.Boolean(string='Módulo asistente de IA', default=False)
 	ai_credits_limit = fields.Integer(string='AI Messages Limit', default=0)
 	ai_credits_used = fields.Integer(string='AI Messages Used', default=0, readonly=True)
+
+	# Usage pulled from the tenant
+	users_used = fields.Integer(string='Users Used', readonly=True, copy=False)
+	storage_used_mb = fields.Float(string='Storage Used (MB)', readonly=True, copy=False, digits=(10, 1))
+	usage_sync_date = fields.Datetime(string='Usage Updated On', readonly=True, copy=False)
 	
 	# Payment Email Status
 	payment_email_sent = fields.Boolean(string='Payment Confirmation Sent', default=False, copy=False)
@@ -154,15 +163,31 @@ class SaaSSubscription(models.Model):
 		# if not self.is_renewable and not self.env.user.has_group('saas_management.group_saas_manager'):
 		# 	raise UserError(_("This subscription cannot be renewed."))
 
-		# Create Sale Order
-		order = self.env['sale.order'].create({
-			'partner_id': self.partner_id.id,
-			'saas_company_name': self.company_name,
-			'saas_plan_id': self.plan_id.id,
-			'saas_billing_cycle': self.billing_cycle,
-			'saas_subscription_origin_id': self.id,
-			'auto_renew': self.auto_renew,
-		})
+		order = self._create_renewal_orders()[self.id]
+		return {
+			'type': 'ir.actions.act_window',
+			'res_model': 'sale.order',
+			'res_id': order.id,
+			'view_mode': 'form',
+			'target': 'current',
+		}
+
+	def _create_renewal_orders(self):
+		"""
+		Create the renewal quotations of the subscriptions, all at once.
+
+		:return: dict of the order of each subscription, by its id
+		"""
+		orders = self.env['sale.order'].create([sub._prepare_renewal_order() for sub in self])
+		for sub, order in zip(self, orders):
+			order.message_subscribe(partner_ids=[sub.partner_id.id])
+		orders.write({'state': 'sent'})  # Visible in portal
+		return dict(zip(self.ids, orders))
+
+	def _prepare_renewal_order(self):
+		"""Values of the renewal quotation, with its lines"""
+		self.ensure_one()
+		lines = []
 
 		# ── Base Plan Product ────────────────────────────────────────────────
 		product = self.plan_id.product_id
@@ -177,13 +202,12 @@ class SaaSSubscription(models.Model):
 			if not product:
 				raise UserError(_('Product not found for plan "%s". Please configure the Linked Product on the Plan settings.') % self.plan_id.name)
 
-		self.env['sale.order.line'].create({
-			'order_id': order.id,
+		lines.append((0, 0, {
 			'product_id': product.id,
 			'name': f"Renewal: {self.plan_id.name} ({self.billing_cycle.capitalize()})",
 			'product_uom_qty': 1,
 			'price_unit': self.price,  # Preserves early adopter / current pricing
-		})
+		}))
 
 		# ── Active Add-ons — Cycle-Aware filtering ────────
 		# Monthly: Add-ons are NOT bundled with the main subscription renewal (independent billing).
@@ -205,14 +229,13 @@ class SaaSSubscription(models.Model):
 					addon_product = self.env['product.product'].sudo().search([('default_code', '=', code)], limit=1)
 				
 				if addon_product:
-					self.env['sale.order.line'].create({
-						'order_id': order.id,
+					lines.append((0, 0, {
 						'product_id': addon_product.id,
 						'name': f"Renewal: {addon_product.name} (x{addon.quantity})",
 						'product_uom_qty': addon.quantity,
 						'price_unit': addon_product.list_price, # Use price from the product itself
 						'saas_renewed_addon_id': addon.id,
-					})
+					}))
 			elif addon.addon_type == 'storage':
 				suffix = '_annual' if cycle == 'annual' else ''
 				storage_map = [
@@ -231,14 +254,13 @@ class SaaSSubscription(models.Model):
 							storage_product = self.env['product.product'].sudo().search([('default_code', '=', code)], limit=1)
 							
 						if storage_product:
-							self.env['sale.order.line'].create({
-								'order_id': order.id,
+							lines.append((0, 0, {
 								'product_id': storage_product.id,
 								'name': f"Renewal: {storage_product.name}",
 								'product_uom_qty': count,
 								'price_unit': storage_product.list_price, # Always pull direct from product record
 								'saas_renewed_addon_id': addon.id,
-							})
+							}))
 							remaining -= count * size
 
 		# ── Module Add-ons ───────────────────────────────────────────────────
@@ -247,22 +269,22 @@ class SaaSSubscription(models.Model):
 			xml_id = 'saas_plans.product_accounting_monthly' if self.billing_cycle == 'monthly' else 'saas_plans.product_accounting_annual'
 			module_product = self.env.ref(xml_id, raise_if_not_found=False)
 			if module_product:
-				self._create_renewal_line(order, module_product)
+				lines.append((0, 0, self._prepare_renewal_line(module_product)))
 
 
 
 		# ────────────────────────────────────────────────────────────────────
-		
-		order.message_subscribe(partner_ids=[self.partner_id.id])
-		order.write({'state': 'sent'})  # Visible in portal
-		
+
 		return {
-			'type': 'ir.actions.act_window',
-			'res_model': 'sale.order',
-			'res_id': order.id,
-			'view_mode': 'form',
-			'target': 'current',
+			'partner_id': self.partner_id.id,
+			'saas_company_name': self.company_name,
+			'saas_plan_id': self.plan_id.id,
+			'saas_billing_cycle': self.billing_cycle,
+			'saas_subscription_origin_id': self.id,
+			'auto_renew': self.auto_renew,
+			'order_line': lines,
 		}
+
 	def action_sync_modules(self):
 		"""Install missing modules based on the subscription plan and configuration"""
 		self.ensure_one()
@@ -298,59 +320,18 @@ class SaaSSubscription(models.Model):
 		active_subs = self.search([('state', 'in', ('active', 'trial')), ('database_name', '!=', False)])
 		if not active_subs:
 			return
-			
-		import odoo
-		import logging
-		_logger = logging.getLogger('cron_mass_sync')
-		
-		db_name = self.env.cr.dbname
-		try:
-			registry = odoo.registry(db_name)
-			with registry.cursor() as cr:
-				env = api.Environment(cr, odoo.SUPERUSER_ID, {})
-				subs = env['saas.subscription'].browse(active_subs.ids)
-				for sub in subs:
-					try:
-						expected_modules = env['saas.provisioning.service']._get_modules_for_plan(sub)
-						if expected_modules:
-							env['saas.database.service'].install_modules(sub.database_name, expected_modules)
-					except Exception as e:
-						_logger.error(f"Cron failed to sync {sub.database_name}: {e}")
-		except Exception as e:
-			_logger.error(f"Cron thread failed: {e}")
+		self.env['saas.fleet.run']._launch('sync_modules', active_subs)._execute()
 
 	def action_mass_sync_modules(self):
 		"""Trigger module sync for multiple subscriptions in the background"""
 		active_subs = self.filtered(lambda s: s.database_name and s.state in ('active', 'trial'))
 		if not active_subs:
 			return {'type': 'ir.actions.client', 'tag': 'display_notification', 'params': {'message': 'No valid active databases selected.', 'type': 'warning'}}
-		
-		# Define background thread
-		def sync_thread(subscription_ids, db_name):
-			import odoo
-			from odoo import api
-			import logging
-			_logger = logging.getLogger('mass_sync')
-			try:
-				registry = odoo.registry(db_name)
-				with registry.cursor() as cr:
-					env = api.Environment(cr, odoo.SUPERUSER_ID, {})
-					subs = env['saas.subscription'].browse(subscription_ids)
-					for sub in subs:
-						_logger.info(f"Background syncing modules for {sub.database_name}")
-						try:
-							expected_modules = env['saas.provisioning.service']._get_modules_for_plan(sub)
-							if expected_modules:
-								env['saas.database.service'].install_modules(sub.database_name, expected_modules)
-								sub.message_post(body=f"Background Sync: Modules synchronized successfully.")
-						except Exception as e:
-							_logger.error(f"Failed to sync {sub.database_name}: {e}")
-			except Exception as e:
-				_logger.error(f"Thread failed: {e}")
 
-		import threading
-		thread = threading.Thread(target=sync_thread, args=(active_subs.ids, self.env.cr.dbname))
-		thread.start()
+		# The fleet run cron processes the tenants in parallel worker processes
+		run = self.env['saas.fleet.run'].sudo()._launch(
+			'sync_modules', active_subs, name=_('Module Sync (%d databases)') % len(active_subs))
+		run.action_resume()
 
 		return {
 			'type': 'ir.actions.client',
@@ -363,14 +344,223 @@ class SaaSSubscription(models.Model):
 			}
 		}
 
-	def _create_renewal_line(self, order, product, qty=1):
-		self.env['sale.order.line'].create({
-			'order_id': order.id,
+	# ─── Fleet operations ────────────────────────────────────────────────
+	# Run by saas.fleet.run in a dedicated process and cursor for each tenant.
+
+	def _fleet_sync_modules(self):
+		self.ensure_one()
+		_logger.info(f"Background syncing modules for {self.database_name}")
+		expected_modules = self.env['saas.provisioning.service']._get_modules_for_plan(self)
+		if not expected_modules:
+			return _("No modules to synchronize.")
+		if self.env['saas.database.service'].install_modules(self.database_name, expected_modules) is False:
+			raise UserError(_("Failed to install modules on %s.") % self.database_name)
+		self.message_post(body=_("Background Sync: Modules synchronized successfully."))
+		return _("Modules synchronized: %s") % ", ".join(expected_modules)
+
+	def _fleet_sync_ai_usage(self):
+		self.ensure_one()
+		usage = self._read_tenant_usage()
+		vals = {
+			'users_used': usage['users'],
+			'storage_used_mb': usage['storage_bytes'] / (1024 * 1024),
+			'usage_sync_date': fields.Datetime.now(),
+		}
+		if self.ai_assistant_module and usage['ai_messages'] is not None:
+			vals['ai_credits_used'] = usage['ai_messages']
+		self.write(vals)
+		return _("Users: %d, Storage: %.1f MB, AI messages: %s") % (
+			usage['users'], vals['storage_used_mb'], usage['ai_messages'])
+
+	def _read_tenant_usage(self):
+		"""
+		Read the usage counters of the tenant database with plain SQL on a
+		pooled connection, without loading its registry.
+		"""
+		self.ensure_one()
+		import odoo.sql_db
+		with odoo.sql_db.db_connect(self.database_name).cursor() as cr:
+			# Metering table of ai_assistant, falling back to the count kept in
+			# the system parameters on tenants not updated yet
+			cr.execute("SELECT to_regclass('ai_usage')")
+			if cr.fetchone()[0]:
+				cr.execute("SELECT COALESCE(SUM(messages), 0) FROM ai_usage")
+				ai_messages = cr.fetchone()[0]
+			else:
+				cr.execute("SELECT value FROM ir_config_parameter WHERE key = 'ai_assistant.message_count'")
+				row = cr.fetchone()
+				try:
+					ai_messages = int(row[0]) if row else 0
+				except ValueError:
+					_logger.warning(f"Invalid AI message count in {self.database_name}: {row[0]}")
+					ai_messages = None
+			# Counter kept by saas_client, falling back to the full sum on
+			# tenants not updated yet
+			cr.execute("SELECT to_regclass('saas_usage_counter')")
+			if cr.fetchone()[0]:
+				cr.execute("SELECT COALESCE(SUM(value), 0) FROM saas_usage_counter WHERE key = 'storage_bytes'")
+			else:
+				cr.execute("SELECT COALESCE(SUM(file_size), 0) FROM ir_attachment")
+			storage_bytes = cr.fetchone()[0]
+			cr.execute("SELECT COUNT(*) FROM res_users WHERE active AND NOT share")
+			users = cr.fetchone()[0]
+		return {
+			'ai_messages': ai_messages,
+			'storage_bytes': storage_bytes,
+			'users': users,
+		}
+
+	def _prepare_renewal_line(self, product, qty=1):
+		return {
 			'product_id': product.id,
 			'name': f"Renewal: {product.name}",
 			'product_uom_qty': qty,
-		})
+		}
         
+	# ─── Batched billing ─────────────────────────────────────────────────
+
+	@api.model
+	def _billing_run(self, records, process, chunk_size=BILLING_CHUNK_SIZE):
+		"""
+		Run `process` on chunks of records, each chunk committed on its own, so
+		that a long run doesn't hold row locks until its end and a failure only
+		rolls back the record it happened on.
+
+		:param process: function called with each chunk of records. When it
+			fails, the chunk is rolled back and processed again one record at
+			a time, through `_billing_run_records`. Payments never go through
+			it, see `_billing_run_payments`.
+		"""
+		for ids in split_every(chunk_size, records.ids):
+			chunk = records.browse(ids)
+			try:
+				with self.env.cr.savepoint():
+					process(chunk)
+			except Exception as e:
+				_logger.warning(f"Billing run failed for {records._name} {list(ids)}, "
+								f"processing them one by one: {str(e)}")
+				self._billing_run_records(chunk, process)
+			self._billing_commit()
+
+	@api.model
+	def _billing_run_records(self, records, process):
+		"""Call `process` on each record in its own savepoint, logging failures"""
+		for record in records:
+			try:
+				with self.env.cr.savepoint():
+					process(record)
+			except Exception as e:
+				_logger.error(f"Billing run failed for {record.display_name}: {str(e)}")
+				try:
+					with self.env.cr.savepoint():
+						record.message_post(body=_("Billing run encountered an error: %s") % str(e))
+				except Exception:
+					pass
+
+	@api.model
+	def _get_payment_tokens(self, partners):
+		"""Saved payment token of each partner, read in a single query"""
+		tokens = {}
+		for token in self.env['payment.token'].search([
+			('partner_id', 'in', partners.ids),
+			('active', '=', True)
+		]):
+			tokens.setdefault(token.partner_id.id, token)
+		return tokens
+
+	@api.model
+	def _create_token_transaction(self, order, token):
+		"""Create the offline payment of the order with a saved token, not sent yet"""
+		return self.env['payment.transaction'].sudo().create({
+			'provider_id': token.provider_id.id,
+			'payment_method_id': token.payment_method_id.id if hasattr(token, 'payment_method_id') else False,
+			'reference': self.env['payment.transaction']._compute_reference(token.provider_id.code, prefix=order.name),
+			'amount': order.amount_total,
+			'currency_id': order.currency_id.id,
+			'partner_id': order.partner_id.id,
+			'token_id': token.id,
+			'operation': 'offline',
+			'sale_order_ids': [(6, 0, [order.id])],
+		})
+
+	@api.model
+	def _billing_create_orders(self, records, create):
+		"""
+		Create the orders of the records at once, calling `create` with them.
+		When it fails, nothing is created, and the orders are then created one
+		by one as each record is charged.
+
+		:param create: function called with the records, returning a dict of
+			the order of each record, by its id
+		:return: dict of the orders created, by record id
+		"""
+		if not records:
+			return {}
+		try:
+			with self.env.cr.savepoint():
+				return create(records)
+		except Exception as e:
+			_logger.warning(f"Batch order creation failed for {records._name} {records.ids}: {str(e)}")
+			return {}
+
+	@api.model
+	def _billing_commit(self):
+		if not self.env.registry.in_test_mode():
+			self.env.cr.commit()
+
+	@api.model
+	def _billing_run_payments(self, records, prepare, finalize):
+		"""
+		Charge each record with a saved token, one record at a time. The order
+		and its transaction are committed before the payment request is sent,
+		and the transaction again right after it, so that once the provider
+		has taken the money no later failure can roll the payment back.
+
+		:param prepare: function called with a record, returning the (order,
+			token) to charge, or None to skip the record
+		:param finalize: function called with the record, the order and the
+			transaction once the payment is committed
+		:return: list of (order, transaction) of the payments done and finalized
+		"""
+		charged = []
+		for record in records:
+			try:
+				with self.env.cr.savepoint():
+					payment = prepare(record)
+					if payment:
+						order, token = payment
+						tx_sudo = self._create_token_transaction(order, token)
+			except Exception as e:
+				_logger.error(f"Billing run failed for {record.display_name}: {str(e)}")
+				try:
+					with self.env.cr.savepoint():
+						record.message_post(body=_("Billing run encountered an error: %s") % str(e))
+				except Exception:
+					pass
+				self._billing_commit()
+				continue
+			if not payment:
+				continue
+			self._billing_commit()
+
+			try:
+				with self.env.cr.savepoint():
+					tx_sudo._send_payment_request()
+			except Exception as e:
+				# The transaction is kept, to be checked against the provider
+				_logger.error(f"Payment request of transaction {tx_sudo.reference} failed: {str(e)}")
+			self._billing_commit()
+
+			try:
+				with self.env.cr.savepoint():
+					finalize(record, order, tx_sudo)
+				if tx_sudo.state == 'done':
+					charged.append((order, tx_sudo))
+			except Exception as e:
+				_logger.error(f"Billing run failed after the payment {tx_sudo.reference} of {record.display_name}: {str(e)}")
+			self._billing_commit()
+		return charged
+
 	@api.model
 	def _cron_auto_renew_subscriptions(self):
 		"""
@@ -381,55 +571,51 @@ class SaaSSubscription(models.Model):
 			('state', 'in', ['grace_period', 'suspended']),
 			('auto_renew', '=', True)
 		])
-		
-		for sub in subscriptions:
-			try:
-				# Check if customer has a valid saved token for Redsys (or any provider)
-				token = self.env['payment.token'].search([
-					('partner_id', '=', sub.partner_id.id),
-					('active', '=', True)
-				], limit=1)
-				
-				if not token:
-					_logger.info(f"Auto-Renew skipped for subscription {sub.id}: No saved payment token found for partner {sub.partner_id.name}.")
-					continue
-					
-				# Generate the renewal quotation
-				action = sub.action_renew_subscription()
-				order_id = action.get('res_id')
-				if not order_id:
-					continue
-					
-				order = self.env['sale.order'].browse(order_id)
-				_logger.info(f"Auto-Renew processing Order {order.name} for Subscription {sub.id} using token {token.id}")
-				
-				# Create a transaction for the order using the saved token
-				tx_sudo = self.env['payment.transaction'].sudo().create({
-					'provider_id': token.provider_id.id,
-					'payment_method_id': token.payment_method_id.id if hasattr(token, 'payment_method_id') else False,
-					'reference': self.env['payment.transaction']._compute_reference(token.provider_id.code, prefix=order.name),
-					'amount': order.amount_total,
-					'currency_id': order.currency_id.id,
-					'partner_id': order.partner_id.id,
-					'token_id': token.id,
-					'operation': 'offline',
-					'sale_order_ids': [(6, 0, [order.id])],
-				})
-				
-				# Send the S2S request
-				tx_sudo._send_payment_request()
-				
-				# Handle result immediately
-				if tx_sudo.state == 'done':
-					# The sale.order's automatic confirmation will trigger subscription reactivation (handled in sale.order action_confirm)
-					sub.message_post(body=_("Auto-renewal successful. Charged order %s via saved card.") % order.name)
-				else:
-					sub.message_post(body=_("Auto-renewal failed. Payment transaction %s resulted in state: %s") % (tx_sudo.reference, tx_sudo.state))
-			
-			except Exception as e:
-				_logger.error(f"Error during auto-renew for subscription {sub.id}: {str(e)}")
-				sub.message_post(body=_("Auto-renewal encountered an error: %s") % str(e))
-	
+		if not subscriptions:
+			return
+		# Check if customers have a valid saved token for Redsys (or any provider)
+		tokens = self._get_payment_tokens(subscriptions.partner_id)
+		orders = {}
+
+		def prepare(sub):
+			token = tokens.get(sub.partner_id.id)
+			if not token:
+				_logger.info(f"Auto-Renew skipped for subscription {sub.id}: No saved payment token found for partner {sub.partner_id.name}.")
+				return None
+			order = orders.pop(sub.id, None)
+			if order:
+				return order, token
+			return sub._prepare_auto_renew_order(token)
+
+		def finalize(sub, order, tx_sudo):
+			# Handle result immediately
+			if tx_sudo.state == 'done':
+				# The sale.order's automatic confirmation will trigger subscription reactivation (handled in sale.order action_confirm)
+				sub.message_post(body=_("Auto-renewal successful. Charged order %s via saved card.") % order.name)
+			else:
+				sub.message_post(body=_("Auto-renewal failed. Payment transaction %s resulted in state: %s") % (tx_sudo.reference, tx_sudo.state))
+
+		for ids in split_every(BILLING_CHUNK_SIZE, subscriptions.ids):
+			chunk = subscriptions.browse(ids)
+			# The renewal quotations of the chunk are generated at once
+			orders.update(self._billing_create_orders(
+				chunk.filtered(lambda sub: sub.partner_id.id in tokens),
+				lambda subs: subs._create_renewal_orders(),
+			))
+			self._billing_run_payments(chunk, prepare, finalize)
+
+	def _prepare_auto_renew_order(self, token):
+		"""Generate the renewal quotation to charge with the token, if any"""
+		self.ensure_one()
+		action = self.action_renew_subscription()
+		order_id = action.get('res_id')
+		if not order_id:
+			return None
+
+		order = self.env['sale.order'].browse(order_id)
+		_logger.info(f"Auto-Renew processing Order {order.name} for Subscription {self.id} using token {token.id}")
+		return order, token
+
 	def action_upgrade_subscription(self):
 		"""Open wizard to upgrade subscription"""
 		# For now, just clear the plan in a new order so they can pick? 
@@ -458,30 +644,37 @@ class SaaSSubscription(models.Model):
 		today = fields.Date.today()
 		now = fields.Datetime.now()
 		
-		# 1. Active -> Grace Period
+		# 1. Active -> Grace Period, written per chunk at once
 		expired_active = self.search([
 			('state', '=', 'active'),
 			('expiration_date', '<', now)
 		])
-		for sub in expired_active:
-			sub.write({
+
+		def start_grace_period(chunk):
+			chunk.write({
 				'state': 'grace_period',
 				'grace_period_start': now,
 				'grace_period_end': now + timedelta(days=7),  # 7 Days Grace
 			})
-			sub.message_post(body=_("Subscription expired. Entering 7-day grace period."))
+			for sub in chunk:
+				sub.message_post(body=_("Subscription expired. Entering 7-day grace period."))
 			# TODO: Send email
+
+		self._billing_run(expired_active, start_grace_period)
 			
 		# 2. Grace Period -> Suspended
 		expired_grace = self.search([
 			('state', '=', 'grace_period'),
 			('grace_period_end', '<', now)
 		])
-		for sub in expired_grace:
+
+		def suspend(sub):
 			sub.action_suspend_subscription()
 			sub.message_post(body=_("Grace period ended. Subscription suspended."))
 			# TODO: Send email
 
+		self._billing_run(expired_grace, lambda chunk: self._billing_run_records(chunk, suspend))
+
 	@api.model
 	def _cron_process_trial_warning(self):
 		"""Send warning email exactly 1 day before trial expiration"""
@@ -496,15 +689,22 @@ class SaaSSubscription(models.Model):
 			('trial_end_date', '>', now)
 		])
 		
-		for sub in trials_to_warn:
-			# Send the email template
-			template = self.env.ref('saas_management.mail_template_trial_warning_es', raise_if_not_found=False)
-			if template:
-				template.send_mail(sub.id, force_send=True)
-				sub.write({'trial_warning_sent': True})
+		if not trials_to_warn:
+			return
+		template = self.env.ref('saas_management.mail_template_trial_warning_es', raise_if_not_found=False)
+		if not template:
+			_logger.error("Could not find mail_template_trial_warning_es")
+			return
+
+		def warn(chunk):
+			# Emails are queued and sent by the mail queue cron
+			for sub in chunk:
+				template.send_mail(sub.id)
+			chunk.write({'trial_warning_sent': True})
+			for sub in chunk:
 				sub.message_post(body=_("Sent 1-day trial expiration warning email."))
-			else:
-				_logger.error("Could not find mail_template_trial_warning_es")
+
+		self._billing_run(trials_to_warn, warn)
 
 	@api.model
 	def _cron_process_trial_expiration(self):
@@ -746,18 +946,19 @@ class SaaSSubscription(models.Model):
 			('grace_period_end', '<=', deletion_limit)
 		])
 		
-		for subscription in expired_subscriptions:
+		def schedule_deletion(subscription):
 			try:
-				subscription.write({
-					'state': 'pending_deletion',
-					'deletion_scheduled_date': now
-				})
-				
-				# Cleanup all addons for deleted subscription
-				subscription.addon_ids.write({'state': 'expired'})
-				
-				# Schedule deletion (will be handled by provisioning module)
-				subscription._schedule_tenant_deletion()
+				with self.env.cr.savepoint():
+					subscription.write({
+						'state': 'pending_deletion',
+						'deletion_scheduled_date': now
+					})
+					
+					# Cleanup all addons for deleted subscription
+					subscription.addon_ids.write({'state': 'expired'})
+					
+					# Schedule deletion (will be handled by provisioning module)
+					subscription._schedule_tenant_deletion()
 				
 				_logger.info(f'Subscription {subscription.name} scheduled for deletion')
 				
@@ -767,6 +968,12 @@ class SaaSSubscription(models.Model):
 					'state': 'error',
 					'error_message': str(e)
 				})
+
+		def schedule_deletions(chunk):
+			for subscription in chunk:
+				schedule_deletion(subscription)
+
+		self._billing_run(expired_subscriptions, schedule_deletions)
 	
 	@api.model
 	def _cron_expire_cancelled_addons(self):
@@ -839,94 +1046,106 @@ class SaaSSubscription(models.Model):
 		
 		if not due_addons:
 			return
-			
-		by_sub = {}
+
+		by_sub = due_addons.grouped('subscription_id')
+		# Check for payment tokens and products of all the add-ons at once
+		tokens = self._get_payment_tokens(due_addons.subscription_id.partner_id)
+		codes = set()
 		for addon in due_addons:
-			sub = addon.subscription_id
-			if sub.id not in by_sub:
-				by_sub[sub.id] = self.env['saas.addon']
-			by_sub[sub.id] |= addon
-			
-		for sub_id, addons in by_sub.items():
-			subscription = self.env['saas.subscription'].browse(sub_id)
+			codes.add(self._get_addon_renewal_code(addon, addon.subscription_id.billing_cycle))
+		codes.discard(False)
+		products = {
+			product.default_code: product
+			for product in self.env['product.product'].sudo().search([('default_code', 'in', list(codes))])
+		}
+
+		orders = {}
+
+		def create_orders(subscriptions):
+			created = self.env['sale.order'].sudo().create([
+				self._prepare_addon_renewal_order(subscription, by_sub[subscription], products)
+				for subscription in subscriptions
+			])
+			return dict(zip(subscriptions.ids, created))
+
+		def prepare(subscription):
+			# One Sale Order per subscription, so that a bad one only skips itself
+			token = tokens.get(subscription.partner_id.id)
+			if not token:
+				_logger.info(f"Add-on Auto-Renew skipped for {subscription.name}: No token.")
+				return None
+			order = orders.pop(subscription.id, None) or self.env['sale.order'].sudo().create(
+				self._prepare_addon_renewal_order(subscription, by_sub[subscription], products)
+			)
+			return order, token
+
+		def finalize(subscription, order, tx_sudo):
+			if tx_sudo.state == 'done':
+				# Only confirm if not already handled by payment post-processing
+				if order.state in ['draft', 'sent']:
+					order.action_confirm()
+				_logger.info("Add-on billing successful for %s", subscription.name)
+			else:
+				_logger.warning("Add-on billing FAILED for %s (TX state: %s)", subscription.name, tx_sudo.state)
+				subscription.message_post(body=_("Monthly add-on renewal payment failed. Please check your payment method."))
+
+		subscriptions = self.env['saas.subscription'].concat(*by_sub.keys())
+		for ids in split_every(BILLING_CHUNK_SIZE, subscriptions.ids):
+			chunk = subscriptions.browse(ids)
+			# The orders of the chunk are created at once
+			orders.update(self._billing_create_orders(
+				chunk.filtered(lambda subscription: subscription.partner_id.id in tokens), create_orders,
+			))
+			charged = self._billing_run_payments(chunk, prepare, finalize)
+			if not charged:
+				continue
+			paid_orders = self.env['sale.order'].concat(*(order for order, tx_sudo in charged))
 			try:
-				# 2. Check for payment token
-				token = self.env['payment.token'].search([
-					('partner_id', '=', subscription.partner_id.id),
-					('active', '=', True)
-				], limit=1)
-				
-				if not token:
-					_logger.info(f"Add-on Auto-Renew skipped for {subscription.name}: No token.")
-					continue
-
-				# 3. Create Sale Order
-				order = self.env['sale.order'].sudo().create({
-					'partner_id': subscription.partner_id.id,
-					'saas_company_name': subscription.company_name,
-					'saas_plan_id': subscription.plan_id.id,
-					'saas_subscription_id': subscription.id,
-					'origin': f"Add-on Renewal: {subscription.name}",
-				})
-				
-				for addon in addons:
-					product = False
-					billing_cycle = subscription.billing_cycle
-					
-					if addon.addon_type == 'users':
-						user_code = 'SAAS_EXTRA_USER_ANNUAL' if billing_cycle == 'annual' else 'SAAS_EXTRA_USER'
-						product = self.env['product.product'].sudo().search([('default_code', '=', user_code)], limit=1)
-					elif addon.addon_type == 'storage':
-						storage_code = f'SAAS_STORAGE_{addon.quantity}GB'
-						if billing_cycle == 'annual':
-							storage_code += '_ANNUAL'
-						product = self.env['product.product'].sudo().search([
-							('default_code', '=', storage_code)
-						], limit=1)
-						
-					if product:
-						self.env['sale.order.line'].sudo().create({
-							'order_id': order.id,
-							'product_id': product.id,
-							'name': f"{billing_cycle.capitalize()} Renewal: {product.name}",
-							'product_uom_qty': addon.quantity if addon.addon_type == 'users' else 1,
-							'price_unit': product.list_price,
-							'saas_renewed_addon_id': addon.id,
-							'saas_addon_billing_cycle': billing_cycle,
-						})
-				
-				# 4. Trigger Payment via Redsys Token
-				tx_sudo = self.env['payment.transaction'].sudo().create({
-					'provider_id': token.provider_id.id,
-					'payment_method_id': token.payment_method_id.id if hasattr(token, 'payment_method_id') else False,
-					'reference': self.env['payment.transaction']._compute_reference(token.provider_id.code, prefix=order.name),
-					'amount': order.amount_total,
-					'currency_id': order.currency_id.id,
-					'partner_id': order.partner_id.id,
-					'token_id': token.id,
-					'operation': 'offline',
-					'sale_order_ids': [(6, 0, [order.id])],
-				})
-				
-				tx_sudo._send_payment_request()
-				
-				if tx_sudo.state == 'done':
-					# Only confirm if not already handled by payment post-processing
-					if order.state in ['draft', 'sent']:
-						order.action_confirm() 
-					
-					invoices = order._create_invoices()
-					for inv in invoices:
-						inv.action_post()
-						# Attempt to reconcile with the transaction payment if any
+				with self.env.cr.savepoint():
+					# Invoice the paid orders of the chunk at once
+					paid_orders._create_invoices().action_post()
+					# Attempt to reconcile with the transaction payments if any
+					for order, tx_sudo in charged:
 						tx_sudo._reconcile_after_done()
-					_logger.info("Add-on billing successful for %s", subscription.name)
-				else:
-					_logger.warning("Add-on billing FAILED for %s (TX state: %s)", subscription.name, tx_sudo.state)
-					subscription.message_post(body=_("Monthly add-on renewal payment failed. Please check your payment method."))
-				
 			except Exception as e:
-				_logger.error("Cron: Failed to auto-renew addons for sub %s: %s", subscription.name, str(e))
+				_logger.error("Cron: Failed to invoice renewed addons of orders %s: %s", paid_orders.mapped('name'), str(e))
+			self._billing_commit()
+
+	@api.model
+	def _get_addon_renewal_code(self, addon, billing_cycle):
+		"""Default code of the product renewing the add-on"""
+		if addon.addon_type == 'users':
+			return 'SAAS_EXTRA_USER_ANNUAL' if billing_cycle == 'annual' else 'SAAS_EXTRA_USER'
+		if addon.addon_type == 'storage':
+			storage_code = f'SAAS_STORAGE_{addon.quantity}GB'
+			if billing_cycle == 'annual':
+				storage_code += '_ANNUAL'
+			return storage_code
+		return False
+
+	@api.model
+	def _prepare_addon_renewal_order(self, subscription, addons, products):
+		billing_cycle = subscription.billing_cycle
+		lines = []
+		for addon in addons:
+			product = products.get(self._get_addon_renewal_code(addon, billing_cycle))
+			if product:
+				lines.append((0, 0, {
+					'product_id': product.id,
+					'name': f"{billing_cycle.capitalize()} Renewal: {product.name}",
+					'product_uom_qty': addon.quantity if addon.addon_type == 'users' else 1,
+					'price_unit': product.list_price,
+					'saas_renewed_addon_id': addon.id,
+					'saas_addon_billing_cycle': billing_cycle,
+				}))
+		return {
+			'partner_id': subscription.partner_id.id,
+			'saas_company_name': subscription.company_name,
+			'saas_plan_id': subscription.plan_id.id,
+			'saas_subscription_id': subscription.id,
+			'origin': f"Add-on Renewal: {subscription.name}",
+			'order_line': lines,
+		}
 
 	def _send_cancellation_email(self):
 		"""Send email when subscription is cancelled"""
@@ -983,25 +1202,12 @@ class SaaSSubscription(models.Model):
 	@api.model
 	def _cron_sync_ai_usage(self):
 		"""
-		Daily cron: pulls AI message count from tenant databases to update ai_credits_used
+		Daily cron: pulls the usage counters (users, storage and AI messages) from tenant databases
 		"""
 		active_subs = self.search([
-			('state', 'in', ['active', 'grace_period']),
-			('ai_assistant_module', '=', True),
+			('state', 'in', ['active', 'trial', 'grace_period']),
 			('database_name', '!=', False)
 		])
-		
-		for sub in active_subs:
-			try:
-				import odoo
-				registry = odoo.registry(sub.database_name)
-				with registry.cursor() as cr:
-					env = api.Environment(cr, odoo.SUPERUSER_ID, {})
-					count_str = env['ir.config_parameter'].sudo().get_param("ai_assistant.message_count", "0")
-					try:
-						count = int(count_str)
-						sub.ai_credits_used = count
-					except ValueError:
-						pass
-			except Exception as e:
-				_logger.error(f"Failed to sync AI usage from tenant {sub.database_name}: {str(e)}")
+		if not active_subs:
+			return
+		self.env['saas.fleet.run']._launch('sync_ai_usage', active_subs)._execute()
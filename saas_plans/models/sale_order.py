@@ -222,31 +222,8 @@ class SaleOrder(models.Model):
 					subscription._push_limits_to_tenant()
 					subscription._push_status_to_tenant('active')
 					# Ensure any newly purchased modules (like AI Assistant) are installed
-					# We use a post-commit thread to avoid blocking the payment checkout flow for the tenant
-					import threading
-					import odoo
-					from odoo import api
-					
-					sub_id = subscription.id
-					db_name = self.env.cr.dbname
-					
-					def sync_task():
-						try:
-							registry = odoo.registry(db_name)
-							with registry.cursor() as cr:
-								env = api.Environment(cr, odoo.SUPERUSER_ID, {})
-								sub_sudo = env['saas.subscription'].browse(sub_id)
-								sub_sudo.action_sync_modules()
-						except Exception as e:
-							import logging
-							logging.getLogger(__name__).error(f"Failed to auto-sync modules async for {sub_id}: {str(e)}")
-							
-					def spawn_sync_thread():
-						thread = threading.Thread(target=sync_task)
-						thread.daemon = True
-						thread.start()
-						
-					self.env.cr.postcommit.add(spawn_sync_thread)
+					# in a queued job, to avoid blocking the payment checkout flow for the tenant
+					self.env['saas.tenant.job']._enqueue(subscription, 'sync_modules')
 				
 				if not self.saas_subscription_id:
 					self.write({'saas_subscription_id': subscription.id})
@@ -23,6 +23,8 @@
         'data/config_parameters.xml',
         'data/mail_template.xml',
         'data/invoice_automation.xml',
+        'data/tenant_pool.xml',
+        'data/tenant_jobs.xml',
     ],
     'installable': True,
     'application': False,
@@ -1,3 +1,6 @@
 # -*- coding: utf-8 -*-
 
 from . import saas_subscription_extend
+from . import saas_tenant_pool
+from . import saas_template_snapshot
+from . import saas_tenant_job
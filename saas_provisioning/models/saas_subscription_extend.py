@@ -20,7 +20,27 @@ class SaaSSubscription(models.Model):
     provisioning_error = fields.Text(string='Provisioning Error', readonly=True)
     admin_password = fields.Char(string='Admin Password', readonly=True, copy=False,
                                   help='Initial admin password for the tenant database')
-    
+    tenant_module_state = fields.Json(string='Tenant Module State', readonly=True, copy=False,
+                                      help='Modules of the tenant database as of the last module sync, '
+                                           'with the fingerprint they were read with')
+    template_snapshot_id = fields.Many2one('saas.template.snapshot', string='Template Version', readonly=True,
+                                           copy=False, ondelete='set null',
+                                           help='Snapshot of the template the tenant database was cloned from')
+    tenant_job_ids = fields.One2many('saas.tenant.job', 'subscription_id', string='Tenant Jobs', readonly=True)
+    tenant_job_id = fields.Many2one('saas.tenant.job', string='Current Job', compute='_compute_tenant_job')
+    tenant_job_step = fields.Char(string='Job Step', compute='_compute_tenant_job')
+    tenant_job_progress = fields.Float(string='Job Progress', compute='_compute_tenant_job')
+
+    @api.depends('tenant_job_ids.state', 'tenant_job_ids.step')
+    def _compute_tenant_job(self):
+        for sub in self:
+            # Latest job still to be done, or else the latest one
+            jobs = sub.sudo().tenant_job_ids.sorted('id', reverse=True)
+            job = jobs.filtered(lambda j: j.state in ('pending', 'running'))[:1] or jobs[:1]
+            sub.tenant_job_id = job
+            sub.tenant_job_step = job.step
+            sub.tenant_job_progress = job.progress
+
     def write(self, vals):
         # Call super first
         res = super(SaaSSubscription, self).write(vals)
@@ -54,7 +74,9 @@ class SaaSSubscription(models.Model):
                 import odoo
                 registry = odoo.registry(sub.database_name)
                 
-                with registry.cursor() as cr:
+                # The other workers of the tenant are signaled once committed,
+                # for them to drop their cached parameters and status
+                with registry.manage_changes(), registry.cursor() as cr:
                     env = api.Environment(cr, odoo.SUPERUSER_ID, {})
                     env['ir.config_parameter'].set_param('saas.subscription_status', status)
                     
@@ -79,7 +101,9 @@ class SaaSSubscription(models.Model):
                 import odoo
                 registry = odoo.registry(sub.database_name)
                 
-                with registry.cursor() as cr:
+                # The other workers of the tenant are signaled once committed,
+                # for them to drop their cached parameters and status
+                with registry.manage_changes(), registry.cursor() as cr:
                     env = api.Environment(cr, odoo.SUPERUSER_ID, {})
                     
                     # atomic update of parameters
@@ -132,36 +156,9 @@ class SaaSSubscription(models.Model):
             'provisioning_error': False
         })
         
-        # We will spawn the thread ONLY AFTER the current transaction commits
-        import threading
-        import odoo
-        from odoo import api
-        
-        sub_id = self.id
-        db_name = self.env.cr.dbname
-        
-        def provision_task():
-            try:
-                registry = odoo.registry(db_name)
-                with registry.cursor() as cr:
-                    env = api.Environment(cr, odoo.SUPERUSER_ID, {})
-                    provisioning_service = env['saas.provisioning.service']
-                    result = provisioning_service.provision_tenant(sub_id)
-                    
-                    if result:
-                        # Push initial limits
-                        subscription = env['saas.subscription'].browse(sub_id)
-                        subscription._push_limits_to_tenant()
-            except Exception as e:
-                _logger.error(f"Async provisioning thread failed: {str(e)}")
-                
-        def spawn_thread():
-            thread = threading.Thread(target=provision_task)
-            thread.daemon = True
-            thread.start()
-            
-        # Hook into the postcommit phase so it is guaranteed to exist
-        self.env.cr.postcommit.add(spawn_thread)
+        # Run by the tenant job workers once the current transaction commits,
+        # and retried from its last step if it fails
+        self.env['saas.tenant.job']._enqueue(self, 'provision')
         
         return {
             'type': 'ir.actions.client',
@@ -177,20 +174,29 @@ class SaaSSubscription(models.Model):
     def _schedule_tenant_deletion(self):
         """Override from saas_management to actually delete tenant"""
         _logger.info(f'Scheduling tenant deletion for {self.name}')
+        if not self.database_name:
+            return
         
-        # Call deletion service
-        provisioning_service = self.env['saas.provisioning.service']
-        try:
-            provisioning_service.delete_tenant(
-                subscription_id=self.id,
-                backup=True
-            )
-        except Exception as e:
-            _logger.error(f'Tenant deletion failed for {self.name}: {str(e)}')
-            self.write({
-                'state': 'error',
-                'error_message': f'Deletion failed: {str(e)}'
-            })
+        # Backup and drop in a tenant job, which flags the subscription
+        # as in error if it still fails after its retries
+        self.env['saas.tenant.job']._enqueue(self, 'delete', backup=True)
+
+    def action_sync_modules(self):
+        """Install missing modules in a tenant job instead of within the request"""
+        self.ensure_one()
+        if not self.database_name or self.state not in ('active', 'trial'):
+            raise UserError(_('Database is not active.'))
+        self.env['saas.tenant.job']._enqueue(self, 'sync_modules')
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Module Sync Scheduled'),
+                'message': _('Modules will be installed/synchronized on the tenant database in the background.'),
+                'type': 'success',
+                'sticky': False,
+            }
+        }
 
     @api.model
     def sync_training_videos(self, videos=None):
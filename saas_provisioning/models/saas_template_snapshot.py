@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from .saas_tenant_pool import POOL_TEMPLATES
+import hashlib
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class SaaSTemplateSnapshot(models.Model):
+    _name = 'saas.template.snapshot'
+    _description = 'SaaS Template Database Snapshot'
+    _order = 'template_db, version desc'
+
+    template_db = fields.Char(string='Template', required=True, readonly=True, index=True)
+    version = fields.Integer(string='Version', required=True, readonly=True)
+    database_name = fields.Char(string='Snapshot Database', required=True, readonly=True)
+    fingerprint = fields.Char(string='Fingerprint', readonly=True,
+                              help='State of the template database when the snapshot was taken')
+    subscription_ids = fields.One2many('saas.subscription', 'template_snapshot_id', string='Subscriptions')
+
+    _sql_constraints = [
+        ('template_version_uniq', 'unique(template_db, version)', 'Template snapshot versions must be unique!'),
+    ]
+
+    @api.model
+    def _get_current(self, template_db):
+        """Get the last snapshot of the template, which new tenants are cloned from"""
+        return self.search([('template_db', '=', template_db)], order='version desc', limit=1)
+
+    @api.model
+    def _read_template_fingerprint(self, template_db):
+        """
+        Fingerprint of the template database, changing with the versions of
+        its modules and with its data: the last write date and the number of
+        rows of each table with a write date, so that deleted rows count too.
+        """
+        import odoo.sql_db
+        from odoo.tools import SQL
+        module_fingerprint = self.env['saas.database.service']._read_tenant_module_state(template_db)['fingerprint']
+        with odoo.sql_db.db_connect(template_db).cursor() as cr:
+            cr.execute("""
+                SELECT table_name FROM information_schema.columns
+                 WHERE table_schema = 'public' AND column_name = 'write_date'
+                 ORDER BY table_name
+            """)
+            tables = [row[0] for row in cr.fetchall()]
+            data = []
+            if tables:
+                cr.execute(SQL(" UNION ALL ").join(
+                    SQL("SELECT %s, MAX(write_date)::text, COUNT(*) FROM %s", table, SQL.identifier(table))
+                    for table in tables
+                ))
+                data = sorted(cr.fetchall())
+        return hashlib.md5(f'{module_fingerprint}:{data}'.encode()).hexdigest()
+
+    @api.model
+    def _create_snapshot(self, template_db):
+        """
+        Take a new immutable version of the template: a copy of its database
+        that is never opened, and of its filestore that new tenants hard-link.
+        """
+        db_service = self.env['saas.database.service']
+        if not db_service._db_exists_direct(template_db):
+            raise UserError(_('Template database %s does not exist') % template_db)
+        current = self._get_current(template_db)
+        version = current.version + 1 if current else 1
+        fingerprint = self._read_template_fingerprint(template_db)
+        db_name = f'saas_snapshot_{template_db}_v{version}'
+        _logger.info(f'Taking snapshot {db_name} of {template_db}')
+        db_service._clone_database(template_db, db_name)
+        try:
+            db_service._link_filestore(template_db, db_name)
+        except Exception:
+            db_service.delete_database(db_name, backup=False)
+            raise
+        return self.create({
+            'template_db': template_db,
+            'version': version,
+            'database_name': db_name,
+            'fingerprint': fingerprint,
+        })
+
+    @api.model
+    def _cron_refresh_snapshots(self):
+        """Snapshot the templates changed since their last snapshot, and drop
+        the oldest snapshots"""
+        for template_db in POOL_TEMPLATES:
+            try:
+                current = self._get_current(template_db)
+                if current and current.fingerprint == self._read_template_fingerprint(template_db):
+                    continue
+                self._create_snapshot(template_db)
+                self.env.cr.commit()
+            except Exception as e:
+                self.env.cr.rollback()
+                _logger.error(f'Snapshot of template {template_db} failed: {str(e)}')
+        self._gc_snapshots()
+
+    @api.model
+    def _gc_snapshots(self):
+        """
+        Drop the snapshots older than the last ones kept. The tenants cloned
+        from them keep their files, as hard links outlive the snapshot ones.
+        """
+        keep = int(self.env['ir.config_parameter'].sudo().get_param('saas.template_snapshot_keep', 2))
+        db_service = self.env['saas.database.service']
+        for template_db in POOL_TEMPLATES:
+            for snapshot in self.search([('template_db', '=', template_db)], order='version desc')[max(keep, 1):]:
+                try:
+                    db_service.delete_database(snapshot.database_name, backup=False)
+                    snapshot.unlink()
+                    self.env.cr.commit()
+                except Exception as e:
+                    self.env.cr.rollback()
+                    _logger.error(f'Could not drop snapshot {snapshot.database_name}: {str(e)}')
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, _, SUPERUSER_ID
+from odoo.modules.registry import Registry
+from odoo.tools import config
+from ..services.provisioning_service import TENANT_JOB_STEPS
+from contextlib import contextmanager
+from datetime import timedelta
+import threading
+import socket
+import time
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Time a cron run keeps taking new jobs, before handing over to a new run,
+# at most; it is also kept under the time limit of the cron workers
+JOB_RUN_BUDGET = 600
+# Seconds between two heartbeats of a running job
+JOB_HEARTBEAT_INTERVAL = 30
+# Running jobs without a heartbeat for this long belong to a dead worker
+JOB_STALE_TIMEOUT = timedelta(minutes=2)
+
+
+class SaaSTenantJob(models.Model):
+    _name = 'saas.tenant.job'
+    _description = 'SaaS Tenant Job'
+    _order = 'id desc'
+
+    subscription_id = fields.Many2one('saas.subscription', string='Subscription', required=True,
+                                      ondelete='cascade', index=True)
+    job_type = fields.Selection([
+        ('provision', 'Provisioning'),
+        ('delete', 'Deletion'),
+        ('backup', 'Backup'),
+        ('sync_modules', 'Module Sync'),
+    ], string='Job', required=True, readonly=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='Status', default='pending', required=True, readonly=True, index=True)
+    step = fields.Char(string='Last Step Done', readonly=True,
+                       help='Checkpoint the job resumes after when it is retried')
+    progress = fields.Float(string='Progress', compute='_compute_progress')
+    data = fields.Json(string='Data', readonly=True, copy=False,
+                       help='Options of the job and values kept between its steps')
+    attempts = fields.Integer(string='Attempts', readonly=True)
+    max_attempts = fields.Integer(
+        string='Max Attempts',
+        default=lambda self: int(self.env['ir.config_parameter'].sudo().get_param('saas.tenant_job_max_attempts', 3)),
+    )
+    next_attempt = fields.Datetime(string='Next Attempt', readonly=True)
+    host = fields.Char(string='Host', readonly=True, help='Host running the job')
+    heartbeat = fields.Datetime(string='Last Heartbeat', readonly=True,
+                                help='Refreshed while the job runs, to tell the jobs of dead workers apart')
+    date_start = fields.Datetime(string='Started', readonly=True)
+    date_done = fields.Datetime(string='Finished', readonly=True)
+    error = fields.Text(string='Error', readonly=True)
+
+    @api.depends('job_type', 'step', 'state')
+    def _compute_progress(self):
+        for job in self:
+            steps = [step for step, _method in TENANT_JOB_STEPS.get(job.job_type, [])]
+            if job.state == 'done':
+                job.progress = 100.0
+            elif job.step in steps:
+                job.progress = 100.0 * (steps.index(job.step) + 1) / len(steps)
+            else:
+                job.progress = 0.0
+
+    @api.model
+    def _enqueue(self, subscription, job_type, **options):
+        """Queue a job on the subscription tenant and wake a worker up"""
+        job = self.sudo().create({
+            'subscription_id': subscription.id,
+            'job_type': job_type,
+            'data': options,
+        })
+        self.env.ref('saas_provisioning.cron_run_tenant_jobs').sudo()._trigger()
+        return job
+
+    # ─── Workers ──────────────────────────────────────────────────────────
+
+    @api.model
+    def _get_host_limit(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param('saas.tenant_jobs_per_host', 2))
+
+    @api.model
+    def _get_run_budget(self):
+        """Seconds a cron run keeps taking new jobs: half the time limit of
+        the cron workers at most, so that it is done before the watchdog
+        kills it"""
+        limit = config['limit_time_real_cron']
+        if limit is None or limit < 0:
+            limit = config['limit_time_real']
+        return min(JOB_RUN_BUDGET, limit / 2) if limit and limit > 0 else JOB_RUN_BUDGET
+
+    @api.model
+    def _cron_run_jobs(self):
+        """
+        Run the queued jobs with at most `saas.tenant_jobs_per_host` worker
+        threads on this host, each one with its own cursor and taking jobs
+        until the queue is empty or the run budget is spent.
+        """
+        self._requeue_stale()
+        self.env.cr.commit()
+        deadline = time.monotonic() + self._get_run_budget()
+        acquired = []
+        workers = [
+            threading.Thread(target=self._worker, args=(self.env.cr.dbname, deadline, acquired), daemon=True)
+            for _i in range(max(self._get_host_limit(), 1))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        # Wake up again for the jobs left over or waiting for a retry. When
+        # no job could be taken, the host is busy: the run ending the jobs
+        # of the host wakes up again, or else the next scheduled one
+        pending = self.search([('state', '=', 'pending')])
+        if pending:
+            now = fields.Datetime.now()
+            when = min(job.next_attempt or now for job in pending)
+            if acquired or when > now:
+                self.env.ref('saas_provisioning.cron_run_tenant_jobs')._trigger(when)
+
+    @api.model
+    def _worker(self, db_name, deadline, acquired):
+        try:
+            with Registry(db_name).cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                while time.monotonic() < deadline:
+                    job = env['saas.tenant.job']._acquire()
+                    if not job:
+                        break
+                    acquired.append(job.id)
+                    job._run()
+        except Exception:
+            _logger.exception('Tenant job worker failed')
+
+    @api.model
+    def _acquire(self):
+        """Take the next due job, unless this host already runs its limit"""
+        cr = self.env.cr
+        host = socket.gethostname()
+        # Serialize the acquisitions of the host, so the limit holds
+        cr.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f'saas.tenant.job:{host}',))
+        # Jobs without a recent heartbeat belong to a dead worker and free their slot
+        cr.execute("""
+            SELECT COUNT(*) FROM saas_tenant_job
+             WHERE state = 'running' AND host = %s
+               AND heartbeat >= NOW() AT TIME ZONE 'UTC' - %s
+        """, (host, JOB_STALE_TIMEOUT))
+        if cr.fetchone()[0] >= self._get_host_limit():
+            cr.commit()
+            return self.browse()
+        cr.execute("""
+            SELECT id FROM saas_tenant_job
+             WHERE state = 'pending' AND (next_attempt IS NULL OR next_attempt <= NOW() AT TIME ZONE 'UTC')
+             ORDER BY id
+             LIMIT 1
+               FOR UPDATE SKIP LOCKED
+        """)
+        row = cr.fetchone()
+        job = self.browse(row[0]) if row else self.browse()
+        if job:
+            job.write({
+                'state': 'running',
+                'host': host,
+                'heartbeat': fields.Datetime.now(),
+                'attempts': job.attempts + 1,
+                'date_start': fields.Datetime.now(),
+                'error': False,
+            })
+        cr.commit()
+        return job
+
+    @api.model
+    def _requeue_stale(self):
+        """Give the jobs of dead workers back to the queue, resuming at their checkpoint"""
+        self.search([
+            ('state', '=', 'running'),
+            '|', ('heartbeat', '=', False),
+            ('heartbeat', '<', fields.Datetime.now() - JOB_STALE_TIMEOUT),
+        ]).write({'state': 'pending', 'host': False})
+
+    @contextmanager
+    def _heartbeat(self):
+        """
+        Refresh the heartbeat of the job from a thread with its own cursor,
+        as long as the context lasts.
+
+        :return: lock to hold from the start of each transaction writing the
+            job until its commit: a heartbeat committed in between would make
+            the write fail to serialize
+        """
+        self.ensure_one()
+        lock = threading.Lock()
+        stop = threading.Event()
+        db_name = self.env.cr.dbname
+        job_id = self.id
+
+        def beat():
+            while not stop.wait(JOB_HEARTBEAT_INTERVAL):
+                try:
+                    with lock, Registry(db_name).cursor() as cr:
+                        cr.execute("UPDATE saas_tenant_job SET heartbeat = NOW() AT TIME ZONE 'UTC' WHERE id = %s",
+                                   (job_id,))
+                except Exception:
+                    _logger.exception(f'Heartbeat of tenant job {job_id} failed')
+
+        thread = threading.Thread(target=beat, name=f'tenant_job_{job_id}_heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield lock
+        finally:
+            stop.set()
+            thread.join()
+
+    def _run(self):
+        """Run the steps after the checkpoint, committing after each one"""
+        self.ensure_one()
+        cr = self.env.cr
+        service = self.env['saas.provisioning.service']
+        steps = TENANT_JOB_STEPS[self.job_type]
+        done = [step for step, _method in steps]
+        start = done.index(self.step) + 1 if self.step in done else 0
+        data = dict(self.data or {})
+        with self._heartbeat() as lock:
+            try:
+                for step, method in steps[start:]:
+                    _logger.info(f'Tenant job {self.id} ({self.job_type}): {step}')
+                    getattr(service, method)(self.subscription_id, data)
+                    # The step is committed before its checkpoint is written in
+                    # a transaction of its own; a step whose checkpoint is lost
+                    # is run again, as after any failure
+                    with lock:
+                        cr.commit()
+                        self.write({'step': step, 'data': data})
+                        cr.commit()
+                with lock:
+                    self.write({'state': 'done', 'host': False, 'date_done': fields.Datetime.now()})
+                    cr.commit()
+            except Exception as e:
+                _logger.exception(f'Tenant job {self.id} ({self.job_type}) failed')
+                with lock:
+                    cr.rollback()
+                    # Values set by the failed step, like generated names, are kept
+                    vals = {'data': data, 'error': str(e), 'host': False}
+                    if self.attempts < self.max_attempts:
+                        vals.update({
+                            'state': 'pending',
+                            'next_attempt': fields.Datetime.now() + timedelta(minutes=2 ** self.attempts),
+                        })
+                    else:
+                        vals['state'] = 'failed'
+                    self.write(vals)
+                    if self.state == 'failed':
+                        self._on_failure(e)
+                    cr.commit()
+
+    def _on_failure(self, error):
+        self.ensure_one()
+        if self.job_type == 'provision':
+            self.env['saas.provisioning.service']._provisioning_failed(self.subscription_id, error)
+        elif self.job_type == 'delete':
+            self.subscription_id.write({
+                'state': 'error',
+                'error_message': f'Deletion failed: {str(error)}'
+            })
+        else:
+            self.subscription_id.message_post(body=_('%s failed: %s') % (
+                dict(self._fields['job_type']._description_selection(self.env))[self.job_type], error))
+
+    def action_retry(self):
+        self.filtered(lambda j: j.state == 'failed').write({
+            'state': 'pending',
+            'attempts': 0,
+            'next_attempt': False,
+        })
+        self.env.ref('saas_provisioning.cron_run_tenant_jobs').sudo()._trigger()
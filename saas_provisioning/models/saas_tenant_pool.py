@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, _
+from datetime import timedelta
+import secrets
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Templates the warm pool keeps spare databases of
+POOL_TEMPLATES = ['template_basic', 'template_premium']
+# Spare databases still being prepared after this delay were interrupted
+POOL_PREPARATION_TIMEOUT = timedelta(hours=1)
+
+
+class SaaSTenantPool(models.Model):
+    _name = 'saas.tenant.pool'
+    _description = 'SaaS Spare Tenant Database'
+    _order = 'id'
+
+    database_name = fields.Char(string='Database', required=True, readonly=True)
+    template_db = fields.Char(string='Template', required=True, readonly=True, index=True)
+    snapshot_id = fields.Many2one('saas.template.snapshot', string='Template Version', readonly=True,
+                                  ondelete='set null')
+    state = fields.Selection([
+        ('preparing', 'Preparing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ], string='Status', default='preparing', required=True, readonly=True, index=True)
+    error = fields.Text(string='Error', readonly=True)
+
+    @api.model
+    def _get_target_size(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param('saas.tenant_pool_size', 0))
+
+    @api.model
+    def _claim(self, template_db):
+        """
+        Take a ready spare database cloned from the template, locking it so
+        that concurrent provisionings take different ones.
+
+        :return: the spare database record, to be unlinked once used, or an
+            empty recordset when the pool is empty.
+        """
+        if not self._get_target_size():
+            return self.browse()
+        self.env.cr.execute("""
+            SELECT id FROM saas_tenant_pool
+             WHERE state = 'ready' AND template_db = %s
+             ORDER BY id
+             LIMIT 1
+               FOR UPDATE SKIP LOCKED
+        """, (template_db,))
+        row = self.env.cr.fetchone()
+        # Refill the pool in the background
+        self.env.ref('saas_provisioning.cron_replenish_tenant_pool').sudo()._trigger()
+        return self.browse(row[0]) if row else self.browse()
+
+    @api.model
+    def _cron_replenish(self):
+        """Keep a number of ready spare databases of each template"""
+        self._cleanup()
+        target = self._get_target_size()
+        for template_db in POOL_TEMPLATES:
+            count = self.search_count([('template_db', '=', template_db), ('state', 'in', ('preparing', 'ready'))])
+            for _i in range(target - count):
+                self._prepare_spare(template_db)
+
+    @api.model
+    def _cleanup(self):
+        """Drop the spare databases that failed, were interrupted or are
+        outdated, and forget the ready ones that no longer exist"""
+        db_service = self.env['saas.database.service']
+        self.search([
+            ('state', '=', 'preparing'),
+            ('create_date', '<', fields.Datetime.now() - POOL_PREPARATION_TIMEOUT),
+        ]).write({'state': 'failed', 'error': _('Preparation interrupted.')})
+        # Spares of a previous version of their template are replaced
+        snapshot_model = self.env['saas.template.snapshot']
+        for template_db in POOL_TEMPLATES:
+            self.search([
+                ('template_db', '=', template_db),
+                ('state', '=', 'ready'),
+                ('snapshot_id', '!=', snapshot_model._get_current(template_db).id),
+            ]).write({'state': 'failed', 'error': _('Outdated template version.')})
+        for spare in self.search([('state', '=', 'failed')]):
+            try:
+                db_service.delete_database(spare.database_name, backup=False)
+                spare.unlink()
+            except Exception as e:
+                _logger.error(f'Could not drop spare database {spare.database_name}: {str(e)}')
+        for spare in self.search([('state', '=', 'ready')]):
+            if not db_service._db_exists_direct(spare.database_name):
+                spare.unlink()
+        self.env.cr.commit()
+
+    @api.model
+    def _prepare_spare(self, template_db):
+        """
+        Clone the template into a new spare database, with the modules and
+        language shared by all its tenants, so that provisioning only needs to
+        rename and personalise it.
+        """
+        # Underscores keep spare databases out of the subdomain based dbfilter
+        db_name = f'saas_pool_{template_db}_{secrets.token_hex(4)}'
+        spare = self.create({
+            'database_name': db_name,
+            'template_db': template_db,
+            'snapshot_id': self.env['saas.template.snapshot']._get_current(template_db).id,
+        })
+        self.env.cr.commit()
+        db_service = self.env['saas.database.service']
+        provisioning_service = self.env['saas.provisioning.service']
+        try:
+            _logger.info(f'Preparing spare database {db_name}')
+            db_service.create_database(
+                db_name, provisioning_service._generate_secure_password(), template_db=template_db
+            )
+            if db_service.install_modules(db_name, provisioning_service._get_modules_for_template(template_db)) is False:
+                raise Exception(_('Module installation failed'))
+            spare.state = 'ready'
+        except Exception as e:
+            _logger.error(f'Spare database {db_name} preparation failed: {str(e)}')
+            self.env.cr.rollback()
+            spare.write({'state': 'failed', 'error': str(e)})
+        self.env.cr.commit()
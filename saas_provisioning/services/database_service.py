@@ -8,6 +8,9 @@ import logging
 
 _logger = logging.getLogger(__name__)
 
+# Language installed and set as default on the tenant databases
+TENANT_LANG = 'es_ES'
+
 
 class SaaSDatabaseService(models.AbstractModel):
     _name = 'saas.database.service'
@@ -51,29 +54,29 @@ class SaaSDatabaseService(models.AbstractModel):
             # Step 1: Clone the template database
             template_db = self.env['ir.config_parameter'].sudo().get_param('saas.template_db', template_db)
             
-            _logger.info(f'Duplicating template {template_db} to {db_name}')
-            
-            # Temporarily bypass list_db=False restriction for the cloning process
-            original_list_db = odoo.tools.config.get('list_db')
-            odoo.tools.config['list_db'] = True
-            try:
-                exp_duplicate_database(template_db, db_name)
-            finally:
-                odoo.tools.config['list_db'] = original_list_db
+            # Clone the last snapshot of the template if there is one, whose
+            # filestore is hard-linked instead of copied
+            snapshot = self.env['saas.template.snapshot']._get_current(template_db)
+            if snapshot:
+                _logger.info(f'Cloning snapshot {snapshot.database_name} to {db_name}')
+                self._clone_database(snapshot.database_name, db_name)
+                self._link_filestore(snapshot.database_name, db_name)
+                self._reset_database_identity(db_name)
+            else:
+                _logger.info(f'Duplicating template {template_db} to {db_name}')
+
+                # Temporarily bypass list_db=False restriction for the cloning process
+                original_list_db = odoo.tools.config.get('list_db')
+                odoo.tools.config['list_db'] = True
+                try:
+                    exp_duplicate_database(template_db, db_name)
+                finally:
+                    odoo.tools.config['list_db'] = original_list_db
 
             _logger.info(f'Template duplicated successfully to {db_name}. Updating password...')
 
             # Step 2: set admin password on the cloned database
-            registry = odoo.registry(db_name)
-            with registry.cursor() as cr:
-                env = api.Environment(cr, odoo.SUPERUSER_ID, {})
-                admin_user = env['res.users'].search([('login', '=', 'admin')], limit=1)
-                if not admin_user:
-                    admin_user = env.ref('base.user_admin', raise_if_not_found=False)
-                if admin_user:
-                    admin_user.write({'password': admin_password})
-                    _logger.info(f"Password updated for user {admin_user.login}")
-                cr.commit()
+            self.set_admin_password(db_name, admin_password)
 
             _logger.info(f'Database {db_name} created successfully from template')
             return True
@@ -84,6 +87,97 @@ class SaaSDatabaseService(models.AbstractModel):
             _logger.error(f'Database creation failed for {db_name}: {str(e)}')
             raise UserError(_('Database creation failed: %s') % str(e))
     
+    @api.model
+    def _clone_database(self, template_db, db_name):
+        """Create a database as a copy of another one, done by PostgreSQL"""
+        import odoo.sql_db
+        from odoo.service.db import _drop_conn
+        from odoo.tools import SQL
+        odoo.sql_db.close_db(template_db)
+        with odoo.sql_db.db_connect('postgres').cursor() as cr:
+            # database-altering operations cannot be executed inside a transaction
+            cr._cnx.autocommit = True
+            _drop_conn(cr, template_db)
+            cr.execute(SQL(
+                "CREATE DATABASE %s ENCODING 'unicode' TEMPLATE %s",
+                SQL.identifier(db_name),
+                SQL.identifier(template_db),
+            ))
+
+    @api.model
+    def _link_filestore(self, template_db, db_name):
+        """
+        Give a database the filestore of another one by hard-linking its files.
+
+        Attachment files are never modified in place, so both databases can
+        share them. Files are copied when they can't be linked, like across
+        filesystems.
+        """
+        import odoo
+        import shutil
+
+        def link_or_copy(src, dst):
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+
+        template_filestore = odoo.tools.config.filestore(template_db)
+        if os.path.exists(template_filestore):
+            shutil.copytree(template_filestore, odoo.tools.config.filestore(db_name), copy_function=link_or_copy)
+
+    @api.model
+    def _reset_database_identity(self, db_name):
+        """Generate the uuid and secret of a cloned database again, as a database duplication does"""
+        import odoo
+        registry = odoo.registry(db_name)
+        with registry.cursor() as cr:
+            env = api.Environment(cr, odoo.SUPERUSER_ID, {})
+            env['ir.config_parameter'].init(force=True)
+
+    @api.model
+    def set_admin_password(self, db_name, admin_password):
+        """Set the password of the admin user of a tenant database"""
+        import odoo
+        registry = odoo.registry(db_name)
+        with registry.cursor() as cr:
+            env = api.Environment(cr, odoo.SUPERUSER_ID, {})
+            admin_user = env['res.users'].search([('login', '=', 'admin')], limit=1)
+            if not admin_user:
+                admin_user = env.ref('base.user_admin', raise_if_not_found=False)
+            if admin_user:
+                admin_user.write({'password': admin_password})
+                _logger.info(f"Password updated for user {admin_user.login}")
+            cr.commit()
+
+    @api.model
+    def rename_database(self, db_name, new_name):
+        """
+        Rename a tenant database along with its filestore.
+        """
+        try:
+            _logger.info(f'Renaming database {db_name} to {new_name}')
+
+            if self._db_exists_direct(new_name):
+                raise UserError(_('Database %s already exists') % new_name)
+
+            import odoo
+
+            # Same list_db=False bypass as for duplicating and dropping
+            original_list_db = odoo.tools.config.get('list_db')
+            odoo.tools.config['list_db'] = True
+            try:
+                odoo.service.db.exp_rename(db_name, new_name)
+            finally:
+                odoo.tools.config['list_db'] = original_list_db
+            return True
+
+        except UserError:
+            raise
+        except Exception as e:
+            _logger.error(f'Database rename failed for {db_name}: {str(e)}')
+            raise UserError(_('Database rename failed: %s') % str(e))
+
     @api.model
     def delete_database(self, db_name, backup=True):
         """
@@ -158,12 +252,82 @@ class SaaSDatabaseService(models.AbstractModel):
             # Don't fail the whole operation if backup fails
             return None
     
+    # ─── Tenant module state ──────────────────────────────────────────────
+
+    @api.model
+    def _read_tenant_module_state(self, db_name, cached=None):
+        """
+        Read the modules and language of a tenant database with plain SQL,
+        without loading its registry.
+
+        The module list is only read again when the fingerprint of the
+        tenant modules differs from the one of the cached state.
+        """
+        import odoo.sql_db
+        with odoo.sql_db.db_connect(db_name).cursor() as cr:
+            cr.execute("""
+                SELECT md5(string_agg(name || ':' || state || ':' || COALESCE(latest_version, ''), ',' ORDER BY name))
+                  FROM ir_module_module
+            """)
+            fingerprint = cr.fetchone()[0]
+            cr.execute("""
+                SELECT (SELECT value FROM ir_config_parameter WHERE key = 'base.lang'),
+                       (SELECT active FROM res_lang WHERE code = %s)
+            """, (TENANT_LANG,))
+            lang, lang_active = cr.fetchone()
+            if cached and cached.get('fingerprint') == fingerprint:
+                modules = cached['modules']
+            else:
+                cr.execute("SELECT name, state, latest_version FROM ir_module_module")
+                modules = {name: [state, version] for name, state, version in cr.fetchall()}
+        return {
+            'fingerprint': fingerprint,
+            'modules': modules,
+            'lang': lang if lang_active else False,
+            'lang_available': lang_active is not None,
+        }
+
+    @api.model
+    def _get_tenant_module_state(self, db_name):
+        """Get the module state of a tenant database, cached on its subscription"""
+        subscription = self.env['saas.subscription'].sudo().search([('database_name', '=', db_name)], limit=1)
+        state = self._read_tenant_module_state(db_name, cached=subscription.tenant_module_state)
+        if subscription and subscription.tenant_module_state != state:
+            subscription.tenant_module_state = state
+        return state
+
+    @api.model
+    def _get_tenant_module_changes(self, db_name, module_list):
+        """
+        Diff the tenant database against the expected modules.
+
+        :return: tuple with the expected modules that can be installed but
+            aren't, and whether the tenant language can and must be set up.
+        """
+        state = self._get_tenant_module_state(db_name)
+        to_install = [
+            name for name in module_list
+            if state['modules'].get(name, [None])[0] == 'uninstalled'
+        ]
+        return to_install, state['lang_available'] and state['lang'] != TENANT_LANG
+
     @api.model
     def install_modules(self, db_name, module_list):
         """
         Install modules in a specific database
         """
         try:
+            # Most syncs find the tenant already up to date, which is checked
+            # without the cost of loading its registry
+            try:
+                to_install, lang_missing = self._get_tenant_module_changes(db_name, module_list)
+            except Exception as e:
+                _logger.warning(f'Could not read module state of {db_name}, syncing it anyway: {e}')
+            else:
+                if not to_install and not lang_missing:
+                    _logger.info(f'All required modules are already installed in {db_name}')
+                    return True
+
             _logger.info(f'Installing modules {module_list} in database {db_name}')
             
             import odoo
@@ -187,19 +351,19 @@ class SaaSDatabaseService(models.AbstractModel):
                 
                 # --- INSTALL SPANISH LANGUAGE AND SET AS DEFAULT ---
                 try:
-                    lang = env['res.lang'].with_context(active_test=False).search([('code', '=', 'es_ES')], limit=1)
+                    lang = env['res.lang'].with_context(active_test=False).search([('code', '=', TENANT_LANG)], limit=1)
                     if lang:
                         lang.active = True
                         installer = env['base.language.install'].create({'lang_ids': [(6, 0, lang.ids)]})
                         installer.lang_install()
-                        env['ir.config_parameter'].sudo().set_param('base.lang', 'es_ES')
+                        env['ir.config_parameter'].sudo().set_param('base.lang', TENANT_LANG)
                         
                         # Set it as default for admin and company
-                        env.company.partner_id.lang = 'es_ES'
+                        env.company.partner_id.lang = TENANT_LANG
                         admin_user = env.ref('base.user_admin', raise_if_not_found=False)
                         if admin_user:
-                            admin_user.lang = 'es_ES'
-                            admin_user.partner_id.lang = 'es_ES'
+                            admin_user.lang = TENANT_LANG
+                            admin_user.partner_id.lang = TENANT_LANG
                             
                         _logger.info("Spanish language installed and set as default.")
                 except Exception as e:
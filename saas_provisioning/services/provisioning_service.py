@@ -7,6 +7,46 @@ import logging
 
 _logger = logging.getLogger(__name__)
 
+# Base modules for all plans
+BASE_MODULES = [
+	'sale_management', 'account', 'hr', 'crm', 'calendar', 'muk_web_appsbar',
+	'crm_base', 'crm_automation_engine', 'crm_client_kanban', 'dashboard',
+	'odoo_url_replacer', 'saas_client','client_document_management','crm_file_management',
+	'saas_training','custom_title'
+]
+
+# Accounting modules (Early Adopter gets them automatically, or if checkbox is checked)
+ACCOUNTING_MODULES = [
+	'hr_expense', 'account_tax_balance', 'l10n_es_aeat', 'om_account_accountant',
+	'l10n_es_account_asset', 'account_reconcile_oca', 'account_bank_sync_yapily',
+	'l10n_es_edi_verifactu','l10n_es_aeat_mod130','l10n_es_aeat_mod303'
+]
+
+# AI modules
+AI_MODULES = [
+	'ai_assistant', 'saas_ocr_client'
+]
+
+# Steps of each tenant job type, as (checkpoint, method of the service)
+TENANT_JOB_STEPS = {
+	'provision': [
+		('clone', '_provision_clone'),
+		('install', '_provision_install'),
+		('configure', '_provision_configure'),
+		('email', '_provision_email'),
+	],
+	'delete': [
+		('backup', '_delete_backup'),
+		('drop', '_delete_drop'),
+	],
+	'backup': [
+		('backup', '_backup_tenant'),
+	],
+	'sync_modules': [
+		('install', '_sync_tenant_modules'),
+	],
+}
+
 
 class SaaSProvisioningService(models.AbstractModel):
 	_name = 'saas.provisioning.service'
@@ -30,57 +70,98 @@ class SaaSProvisioningService(models.AbstractModel):
 				'provisioning_error': False
 			})
 			
-			# Step 1: Generate database name and subdomain
-			db_name, subdomain = self._generate_tenant_identifiers(subscription.company_name)
-			
-			# Step 2: Create database
-			db_service = self.env['saas.database.service']
-			admin_password = self._generate_secure_password()
-			
-			# Determine which template to clone based on plan/addons
-			plan_name = subscription.plan_id.name.lower() if subscription.plan_id else ''
-			is_premium = subscription.is_early_adopter or 'early' in plan_name or subscription.accounting_module
-			template_db = 'template_premium' if is_premium else 'template_basic'
-			
-			db_service.create_database(db_name, admin_password, template_db=template_db)
-			
-			# Step 3: Install base modules based on plan
-			modules_to_install = self._get_modules_for_plan(subscription)
-			if modules_to_install:
-				db_service.install_modules(db_name, modules_to_install)
-			
-			# Step 4: Post-Install Configuration (Company Name, etc.)
-			self._post_provisioning_setup(db_name, subscription, subdomain)
-			
-			# Step 5: Update subscription with tenant info
-			vals = {
-				'database_name': db_name,
-				'subdomain': subdomain,
-				'provisioning_status': 'completed',
-				'admin_password': admin_password,  # Store password
-			}
-			# Don't overwrite state if it was created as a 'trial'
-			if subscription.state == 'pending':
-				vals['state'] = 'active'
-				
-			subscription.write(vals)
-			
-			# Step 6: Send welcome email (TODO)
-			self._send_welcome_email(subscription, admin_password)
-			
-			_logger.info(f'Tenant provisioned successfully: {db_name}')
+			data = {}
+			for step, method in TENANT_JOB_STEPS['provision']:
+				getattr(self, method)(subscription, data)
 			return True
 			
 		except Exception as e:
-			_logger.error(f'Provisioning failed for subscription {subscription_id}: {str(e)}')
-			subscription.write({
-				'provisioning_status': 'failed',
-				'provisioning_error': str(e),
-				'state': 'error',
-				'error_message': f'Provisioning failed: {str(e)}'
-			})
+			self._provisioning_failed(subscription, e)
 			raise
-	
+
+	@api.model
+	def _provisioning_failed(self, subscription, error):
+		_logger.error(f'Provisioning failed for subscription {subscription.id}: {str(error)}')
+		subscription.write({
+			'provisioning_status': 'failed',
+			'provisioning_error': str(error),
+			'state': 'error',
+			'error_message': f'Provisioning failed: {str(error)}'
+		})
+
+	# ─── Provisioning steps ──────────────────────────────────────────────
+	# Each step reads and stores what the next ones need in `data`, which
+	# tenant jobs persist so that a retried job resumes after the last step
+	# done.
+
+	@api.model
+	def _provision_clone(self, subscription, data):
+		db_service = self.env['saas.database.service']
+
+		# Step 1: Generate database name and subdomain, kept by retries
+		if not data.get('db_name'):
+			data['db_name'], data['subdomain'] = self._generate_tenant_identifiers(subscription.company_name)
+			data['admin_password'] = self._generate_secure_password()
+		elif db_service._db_exists_direct(data['db_name']):
+			# Leftover of an interrupted attempt
+			db_service.delete_database(data['db_name'], backup=False)
+		db_name = data['db_name']
+		admin_password = data['admin_password']
+		
+		# Step 2: Create database
+		# Determine which template to clone based on plan/addons
+		template_db = self._get_template_for_plan(subscription)
+		
+		# Take a spare database of the warm pool if there is one, which
+		# already has the modules of the template installed
+		spare = self.env['saas.tenant.pool']._claim(template_db)
+		if spare:
+			_logger.info(f'Using pooled database {spare.database_name} for {db_name}')
+			template_snapshot = spare.snapshot_id
+			db_service.rename_database(spare.database_name, db_name)
+			spare.unlink()
+			db_service.set_admin_password(db_name, admin_password)
+		else:
+			template_snapshot = self.env['saas.template.snapshot']._get_current(template_db)
+			db_service.create_database(db_name, admin_password, template_db=template_db)
+		data['template_snapshot_id'] = template_snapshot.id
+
+	@api.model
+	def _provision_install(self, subscription, data):
+		# Step 3: Install base modules based on plan
+		modules_to_install = self._get_modules_for_plan(subscription)
+		if modules_to_install:
+			self.env['saas.database.service'].install_modules(data['db_name'], modules_to_install)
+
+	@api.model
+	def _provision_configure(self, subscription, data):
+		# Step 4: Post-Install Configuration (Company Name, etc.)
+		self._post_provisioning_setup(data['db_name'], subscription, data['subdomain'])
+		
+		# Step 5: Update subscription with tenant info
+		vals = {
+			'database_name': data['db_name'],
+			'subdomain': data['subdomain'],
+			'provisioning_status': 'completed',
+			'admin_password': data['admin_password'],  # Store password
+			'template_snapshot_id': data.get('template_snapshot_id') or False,
+		}
+		# Don't overwrite state if it was created as a 'trial'
+		if subscription.state == 'pending':
+			vals['state'] = 'active'
+			
+		subscription.write(vals)
+
+		# Push initial limits
+		subscription._push_limits_to_tenant()
+
+	@api.model
+	def _provision_email(self, subscription, data):
+		# Step 6: Send welcome email
+		self._send_welcome_email(subscription, data['admin_password'])
+		
+		_logger.info(f'Tenant provisioned successfully: {data["db_name"]}')
+
 	@api.model
 	def _post_provisioning_setup(self, db_name, subscription, subdomain):
 		"""
@@ -154,34 +235,61 @@ class SaaSProvisioningService(models.AbstractModel):
 			return True
 		
 		try:
-			db_service = self.env['saas.database.service']
-			
-			# Delete database (with optional backup)
-			backup_path = db_service.delete_database(
-				subscription.database_name,
-				backup=backup
-			)
-			
-			# Update subscription
-			subscription.write({
-				'state': 'deleted',
-			})
-			
-			# Log deletion
-			subscription.message_post(
-				body=_('Tenant deleted. Database: %s. Backup: %s') % (
-					subscription.database_name,
-					backup_path or 'None'
-				)
-			)
-			
-			_logger.info(f'Tenant deleted: {subscription.database_name}')
+			data = {'backup': backup}
+			for step, method in TENANT_JOB_STEPS['delete']:
+				getattr(self, method)(subscription, data)
 			return True
 			
 		except Exception as e:
 			_logger.error(f'Tenant deletion failed: {str(e)}')
 			raise
-	
+
+	# ─── Deletion, backup and module sync steps ──────────────────────────
+
+	@api.model
+	def _delete_backup(self, subscription, data):
+		db_service = self.env['saas.database.service']
+		if data.get('backup', True) and db_service._db_exists_direct(subscription.database_name):
+			data['backup_path'] = db_service._backup_database(subscription.database_name)
+
+	@api.model
+	def _delete_drop(self, subscription, data):
+		# Delete database, already backed up if requested, unless a previous
+		# attempt dropped it already
+		db_service = self.env['saas.database.service']
+		if db_service._db_exists_direct(subscription.database_name):
+			db_service.delete_database(subscription.database_name, backup=False)
+		
+		# Update subscription
+		subscription.write({
+			'state': 'deleted',
+		})
+		
+		# Log deletion
+		subscription.message_post(
+			body=_('Tenant deleted. Database: %s. Backup: %s') % (
+				subscription.database_name,
+				data.get('backup_path') or 'None'
+			)
+		)
+		
+		_logger.info(f'Tenant deleted: {subscription.database_name}')
+
+	@api.model
+	def _backup_tenant(self, subscription, data):
+		backup_path = self.env['saas.database.service']._backup_database(subscription.database_name)
+		if not backup_path:
+			raise UserError(_('Backup of %s failed') % subscription.database_name)
+		data['backup_path'] = backup_path
+		subscription.message_post(body=_('Tenant backup created: %s') % backup_path)
+
+	@api.model
+	def _sync_tenant_modules(self, subscription, data):
+		expected_modules = self._get_modules_for_plan(subscription)
+		if expected_modules and self.env['saas.database.service'].install_modules(subscription.database_name, expected_modules) is False:
+			raise UserError(_('Failed to install modules on %s.') % subscription.database_name)
+		subscription.message_post(body=_('Modules synchronized successfully: %s') % ', '.join(expected_modules))
+
 	@api.model
 	def _generate_tenant_identifiers(self, company_name):
 		"""
@@ -230,40 +338,37 @@ class SaaSProvisioningService(models.AbstractModel):
 		
 		return db_name, subdomain
 	
+	@api.model
+	def _has_accounting(self, subscription):
+		"""Early Adopter gets accounting automatically, or if plan name implies it, or if the checkbox is checked"""
+		plan_name = subscription.plan_id.name.lower() if subscription.plan_id else ''
+		return subscription.is_early_adopter or 'early' in plan_name or subscription.accounting_module
+
+	@api.model
+	def _get_template_for_plan(self, subscription):
+		"""Get the template database cloned for the subscription"""
+		return 'template_premium' if self._has_accounting(subscription) else 'template_basic'
+
+	@api.model
+	def _get_modules_for_template(self, template_db):
+		"""Get the modules shared by all the subscriptions cloned from the template"""
+		modules = list(BASE_MODULES)
+		if template_db == 'template_premium':
+			modules.extend(ACCOUNTING_MODULES)
+		return modules
+
 	@api.model
 	def _get_modules_for_plan(self, subscription):
 		"""Get list of modules to install based on subscription plan and add-ons"""
-		plan_name = subscription.plan_id.name.lower() if subscription.plan_id else ''
-		
-		# Base modules for all plans
-		base_modules = [
-			'sale_management', 'account', 'hr', 'crm', 'calendar', 'muk_web_appsbar',
-			'crm_base', 'crm_automation_engine', 'crm_client_kanban', 'dashboard',
-			'odoo_url_replacer', 'saas_client','client_document_management','crm_file_management',
-            'saas_training','custom_title'
-		]
-		
-		# Accounting modules (Early Adopter gets them automatically, or if checkbox is checked)
-		accounting_modules = [
-			'hr_expense', 'account_tax_balance', 'l10n_es_aeat', 'om_account_accountant',
-			'l10n_es_account_asset', 'account_reconcile_oca', 'account_bank_sync_yapily',
-			'l10n_es_edi_verifactu','l10n_es_aeat_mod130','l10n_es_aeat_mod303'
-		]
-
-		# AI modules
-		ai_modules = [
-			'ai_assistant', 'saas_ocr_client'
-		]
-		
-		modules = list(base_modules)
+		modules = list(BASE_MODULES)
 		
 		# Add accounting modules if early adopter, if plan name implies it, or if accounting addon is checked
-		if subscription.is_early_adopter or 'early' in plan_name or subscription.accounting_module:
-			modules.extend(accounting_modules)
+		if self._has_accounting(subscription):
+			modules.extend(ACCOUNTING_MODULES)
 
 		# Add AI modules
 		if subscription.ai_assistant_module:
-			modules.extend(ai_modules)
+			modules.extend(AI_MODULES)
 					
 		return modules
 	